@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+# Startup Benchmark
+#
+# To the extent possible under law, the author(s) have dedicated all
+# copyright and related and neighboring rights to this software to the
+# public domain worldwide. This software is distributed without any
+# warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication
+# along with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+"""
+Measure how long it takes to import the SGE and to create a game with
+different sets of SDL subsystems.  Each case runs in a fresh Python
+process so that nothing is already loaded, and the median time of
+several runs is reported.
+
+Usage: startup_benchmark.py [runs]
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import subprocess
+import sys
+
+
+# Each case is a name, code to run first without timing it, and the
+# code to time.
+CASES = [
+    ("import pygame", "", "import pygame"),
+    ("import sge", "import pygame", "import sge"),
+    ("import sge.dsp", "import sge", "import sge.dsp"),
+    ("Game(subsystems=())", "import sge.dsp",
+     "sge.dsp.Game(headless=True, subsystems=())"),
+    ("Game(subsystems=['font'])", "import sge.dsp",
+     "sge.dsp.Game(headless=True, subsystems=['font'])"),
+    ("Game()", "import sge.dsp", "sge.dsp.Game(headless=True)"),
+    ("Game(), one frame, and quit", "import sge.dsp",
+     "class Game(sge.dsp.Game):\n"
+     "    def event_step(self, time_passed, delta_mult):\n"
+     "        self.end()\n"
+     "game = Game(headless=True)\n"
+     "game.start_room = sge.dsp.Room()\n"
+     "game.start()"),
+    ]
+
+TEMPLATE = """\
+import os, time
+{}
+t = time.time()
+{}
+os.write(1, repr(time.time() - t).encode("ascii"))
+os._exit(0)
+"""
+
+
+def run_case(setup, code):
+    env = dict(os.environ)
+    env.setdefault("SDL_VIDEODRIVER", "dummy")
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+    env["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+    path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(
+        [path] + [p for p in [env.get("PYTHONPATH")] if p])
+    output = subprocess.check_output(
+        [sys.executable, "-c", TEMPLATE.format(setup, code)], env=env,
+        stderr=subprocess.STDOUT)
+    return float(output.decode("ascii").strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for name, setup, code in CASES:
+        times = sorted(run_case(setup, code) for i in range(runs))
+        print("{:<30} {:8.1f} ms".format(name, times[len(times) // 2] * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -97,7 +97,7 @@ general game loop structure::
         # Input events
         sge.game.pump_input()
         while sge.game.input_events:
-            event = sge.game.input_events.pop(0)
+            event = sge.game.input_events.popleft()
 
             # Handle event
 
@@ -237,6 +237,7 @@ from __future__ import unicode_literals
 
 __version__ = "1.5a0"
 
+import importlib
 import sys
 import os
 
@@ -345,8 +346,24 @@ MOUSE_BUTTON_NAMES = {}
 for pair in MOUSE_BUTTONS.items():
     MOUSE_BUTTON_NAMES[pair[1]] = pair[0]
 
-from sge import (collision, dsp, gfx, input, joystick, keyboard, mouse, snd, s,
-                 r)
+_SUBMODULES = ("collision", "dsp", "gfx", "input", "joystick", "keyboard",
+               "mouse", "snd", "s", "r")
+
+if sys.version_info >= (3, 7):
+    # Submodules are imported the first time they are used, so that
+    # programs which only need part of the SGE don't have to wait for
+    # all of it to load.
+    def __getattr__(name):
+        if name in _SUBMODULES:
+            return importlib.import_module("sge." + name)
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+
+    def __dir__():
+        return sorted(set(globals()) | set(_SUBMODULES))
+else:
+    from sge import (collision, dsp, gfx, input, joystick, keyboard, mouse,
+                     snd, s, r)
 
 
 __all__ = [
@@ -32,11 +32,11 @@ import six
 
 import sge
 from sge import r
-from sge.r import s_get_precise_mask
 
 
 __all__ = ["rectangles_collide", "masks_collide", "rectangle", "ellipse",
-           "circle", "line"]
+           "circle", "line", "raycast", "raycast_all", "sweep_rectangle",
+           "sweep_circle"]
 
 
 def rectangles_collide(x1, y1, w1, h1, x2, y2, w2, h2):
@@ -112,7 +112,7 @@ def rectangle(x, y, w, h, other=None):
       information.
     """
     room = sge.game.current_room
-    others = room.get_objects_at(x, y, w, h)
+    others = r.r_iter_objects_at(room, x, y, w, h, other)
     collisions = []
     mask_id = ("rectangle_masks", x, y, w, h)
 
@@ -153,7 +153,7 @@ def ellipse(x, y, w, h, other=None):
       information.
     """
     room = sge.game.current_room
-    others = room.get_objects_at(x, y, w, h)
+    others = r.r_iter_objects_at(room, x, y, w, h, other)
     collisions = []
     mask_id = ("ellipse_masks", x, y, w, h)
 
@@ -195,7 +195,8 @@ def circle(x, y, radius, other=None):
     """
     room = sge.game.current_room
     diameter = radius * 2
-    others = room.get_objects_at(x - radius, y - radius, diameter, diameter)
+    others = r.r_iter_objects_at(room, x - radius, y - radius, diameter,
+                                 diameter, other)
     collisions = []
     mask_id = ("circle_masks", x, y, radius)
 
@@ -238,32 +239,159 @@ def line(x1, y1, x2, y2, other=None):
     - ``other`` -- What to check for collisions with.  See the
       documentation for :meth:`sge.dsp.Object.collision` for more
       information.
+
+    Both endpoints are included: an object is reported if the pixel at
+    (``x2``, ``y2``) is inside of it, even if the line segment only
+    reaches its edge.
     """
-    room = sge.game.current_room
-    x = min(x1, x2)
-    y = min(y1, y2)
-    w = abs(x2 - x1) + 1
-    h = abs(y2 - y1) + 1
+    collisions = [hit[0] for hit in raycast_all(x1, y1, x2, y2, other)]
+    found = set(collisions)
+    for obj in rectangle(x2, y2, 1, 1, other):
+        if obj not in found:
+            collisions.append(obj)
 
-    if w <= 1 or h <= 1:
-        return rectangle(x, y, w, h)
+    return collisions
 
-    others = room.get_objects_at(x, y, w, h)
-    collisions = []
-    mask_id = ("line_masks", x1 - x, y1 - y, x2 - x, y2 - y, w, h)
 
-    mask = r.cache.get(mask_id)
+def raycast(x1, y1, x2, y2, other=None):
+    """
+    Return the first object a line segment touches, going from the
+    first endpoint to the second, or :const:`None` if it doesn't touch
+    any objects.
 
-    if mask is None:
-        sp = sge.gfx.Sprite(width=w, height=h)
-        sp.draw_line(x1 - x, y1 - y, x2 - x, y2 - y, sge.gfx.Color("white"))
-        mask = s_get_precise_mask(sp, 0, 1, 1, 0)
+    Arguments:
 
-    r.cache.add(mask_id, mask)
+    - ``x1`` -- The horizontal position of the start of the line
+      segment.
+    - ``y1`` -- The vertical position of the start of the line segment.
+    - ``x2`` -- The horizontal position of the end of the line segment.
+    - ``y2`` -- The vertical position of the end of the line segment.
+    - ``other`` -- What to check for collisions with.  See the
+      documentation for :meth:`sge.dsp.Object.collision` for more
+      information.
 
-    for obj in others:
-        if (obj.tangible and r.o_is_other(obj, other) and
-                masks_collide(x, y, mask, obj.mask_x, obj.mask_y, obj.mask)):
-            collisions.append(obj)
+    The object is returned as a tuple in the form
+    ``(obj, x, y, xnormal, ynormal)``, where ``obj`` is the object, ``x``
+    and ``y`` are the position where the line segment touches it, and
+    ``xnormal`` and ``ynormal`` are the direction the side of the object
+    touched faces, e.g. ``(-1, 0)`` for the left side.  If the line
+    segment starts inside of the object, both ``xnormal`` and
+    ``ynormal`` are ``0``.
+
+    Only the object areas the line segment passes through are searched,
+    in order, and the search stops as soon as an object is found, so
+    this is fast even for long line segments.  Precise and ellipse
+    collision detection are used where the object uses them.  Objects
+    using a :class:`sge.gfx.TileGrid` with solid tiles are only touched
+    at their solid tiles.
+    """
+    hits = _raycast(x1, y1, x2, y2, other, True)
+    return hits[0] if hits else None
 
-    return collisions
+
+def raycast_all(x1, y1, x2, y2, other=None):
+    """
+    Return a list of all objects a line segment touches, sorted from
+    the nearest to the first endpoint to the farthest.
+
+    Each object is returned as a tuple in the form
+    ``(obj, x, y, xnormal, ynormal)``.  See the documentation for
+    :func:`sge.collision.raycast` for more information.
+    """
+    return _raycast(x1, y1, x2, y2, other, False)
+
+
+def sweep_rectangle(x, y, w, h, xdest, ydest, other=None):
+    """
+    Return the first object a rectangle touches while moving in a
+    straight line, or :const:`None` if it doesn't touch any objects.
+
+    Arguments:
+
+    - ``x`` -- The starting horizontal position of the rectangle.
+    - ``y`` -- The starting vertical position of the rectangle.
+    - ``w`` -- The width of the rectangle.
+    - ``h`` -- The height of the rectangle.
+    - ``xdest`` -- The horizontal position the rectangle moves to.
+    - ``ydest`` -- The vertical position the rectangle moves to.
+    - ``other`` -- What to check for collisions with.  See the
+      documentation for :meth:`sge.dsp.Object.collision` for more
+      information.
+
+    The object is returned as a tuple in the form
+    ``(obj, x, y, xnormal, ynormal)``, where ``x`` and ``y`` are the
+    position of the rectangle when it first touches the object.  See
+    the documentation for :func:`sge.collision.raycast` for more
+    information.
+
+    .. note::
+
+       Only bounding boxes are checked; neither precise collision
+       detection nor ellipse collision detection is used.
+    """
+    room = sge.game.current_room
+    hw = w / 2
+    hh = h / 2
+    dx = xdest - x
+    dy = ydest - y
+    hits = r.r_sweep(room, x + hw, y + hh, dx, dy, hw, hh, other=other,
+                     first=True)
+    if hits:
+        t, obj, xnormal, ynormal, tile = hits[0]
+        return (obj, x + dx * t, y + dy * t, xnormal, ynormal)
+    else:
+        return None
+
+
+def sweep_circle(x, y, radius, xdest, ydest, other=None):
+    """
+    Return the first object a circle touches while moving in a straight
+    line, or :const:`None` if it doesn't touch any objects.
+
+    Arguments:
+
+    - ``x`` -- The starting horizontal position of the center of the
+      circle.
+    - ``y`` -- The starting vertical position of the center of the
+      circle.
+    - ``radius`` -- The radius of the circle.
+    - ``xdest`` -- The horizontal position the center of the circle
+      moves to.
+    - ``ydest`` -- The vertical position the center of the circle moves
+      to.
+    - ``other`` -- What to check for collisions with.  See the
+      documentation for :meth:`sge.dsp.Object.collision` for more
+      information.
+
+    The object is returned as a tuple in the form
+    ``(obj, x, y, xnormal, ynormal)``, where ``x`` and ``y`` are the
+    position of the center of the circle when it first touches the
+    object.  If the circle touches a corner of the object, the normal
+    points from the corner to the center of the circle.  See the
+    documentation for :func:`sge.collision.raycast` for more
+    information.
+
+    .. note::
+
+       Only bounding boxes are checked; neither precise collision
+       detection nor ellipse collision detection is used.
+    """
+    room = sge.game.current_room
+    dx = xdest - x
+    dy = ydest - y
+    hits = r.r_sweep(room, x, y, dx, dy, radius=radius, other=other,
+                     first=True)
+    if hits:
+        t, obj, xnormal, ynormal, tile = hits[0]
+        return (obj, x + dx * t, y + dy * t, xnormal, ynormal)
+    else:
+        return None
+
+
+def _raycast(x1, y1, x2, y2, other, first):
+    room = sge.game.current_room
+    dx = x2 - x1
+    dy = y2 - y1
+    hits = r.r_sweep(room, x1, y1, dx, dy, other=other, first=first)
+    return [(obj, x1 + dx * t, y1 + dy * t, xnormal, ynormal)
+            for t, obj, xnormal, ynormal, tile in hits]
@@ -24,6 +24,7 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import collections
 import math
 import os
 import sys
@@ -37,20 +38,22 @@ import sge
 from sge import gfx, r
 from sge.r import (
     _check_color, _scale, _get_blend_flags, _screen_blend, _set_mode,
-    _handle_music, _get_dot_sprite, _get_line_sprite, _get_rectangle_sprite,
-    _get_ellipse_sprite, _get_circle_sprite, _get_polygon_sprite, bl_update,
-    bl_get_image, o_update, o_detect_collisions, o_update_collision_lists,
-    o_update_object_areas, o_is_other, o_get_origin_offset, o_set_speed,
+    _InputEventQueue, _handle_input_event, _handle_music, _handle_sounds,
+    _skip_refresh, _get_dot_sprite,
+    _get_line_sprite, _get_rectangle_sprite, _get_ellipse_sprite,
+    _get_circle_sprite, _get_polygon_sprite, bl_update,
+    bl_get_image, o_update, o_detect_collisions,
+    o_detect_continuous_collision, o_get_touching_tiles,
+    o_update_collision_lists,
+    o_update_object_areas, o_is_other, o_get_regulated_origin, o_set_speed,
     s_get_image, s_get_precise_mask, s_from_text, tg_blit,
-    r_get_rectangle_object_areas, r_set_object_areas, r_update_fade,
-    r_update_dissolve, r_update_pixelate, r_update_wipe_left,
-    r_update_wipe_right, r_update_wipe_up, r_update_wipe_down,
-    r_update_wipe_upleft, r_update_wipe_upright, r_update_wipe_downleft,
-    r_update_wipe_downright, r_update_wipe_matrix, r_update_iris_in,
-    r_update_iris_out, v_limit)
+    r_get_rectangle_object_areas, r_iter_objects_at, r_get_nearest_objects,
+    r_set_object_areas, r_start_transition, r_update_activation,
+    r_update_chunks, r_tune_object_areas, r_get_object_area_stats,
+    r_wake_object, r_get_snapshot, r_restore_snapshot, v_limit)
 
 
-__all__ = ["Game", "Room", "View", "Object"]
+__all__ = ["Game", "Room", "View", "SnapshotBuffer", "Object"]
 
 
 class Game(object):
@@ -175,26 +178,71 @@ class Game(object):
        to :const:`False` will improve performence if collision events
        are not needed.
 
+    .. attribute:: headless
+
+       Whether or not the game runs without rendering.  If set to
+       :const:`True`, the main loop still executes all events, movement,
+       and collision detection, but never calls :meth:`refresh`, so
+       nothing is drawn and the window is never updated.  This is
+       useful for running game logic as a simulation, e.g. for
+       automated testing or server-side validation.
+
+       If this is :const:`True` when the game is created and the
+       ``SDL_VIDEODRIVER`` and ``SDL_AUDIODRIVER`` environment variables
+       are not set, the SGE uses SDL's dummy drivers so that no window
+       is opened and no audio device is needed.
+
+       See also :meth:`skip_render`.
+
+    .. attribute:: uncapped
+
+       Whether or not the frame rate is uncapped.  If set to
+       :const:`True`, :meth:`regulate_speed` never sleeps and returns
+       the time a frame takes at the target frame rate rather than the
+       time that actually passed, so the game logic proceeds exactly as
+       it would at full speed, only as fast as the computer can run it.
+       Combined with :attr:`headless`, this allows running game logic
+       many times faster than real time.
+
+    .. attribute:: subsystems
+
+       The parts of SDL the game was started with, as a set containing
+       any of ``"mixer"`` (sound and music), ``"joystick"``, and
+       ``"font"`` (text rendering), or :const:`None` if everything
+       Pygame supports was started.  The display is always started.
+       Leaving out parts the game doesn't use makes it start faster,
+       which is useful for tools and tests that only need to load or
+       manipulate graphics.  (Read-only)
+
     .. attribute:: alarms
 
-       A dictionary containing the global alarms of the game.  Each
-       value decreases by 1 each frame (adjusted for delta timing if it
-       is enabled).  When a value is at or below 0,
+       A dictionary-like object containing the global alarms of the
+       game.  Each value decreases by 1 each frame (adjusted for delta
+       timing if it is enabled).  When a value is at or below 0,
        :meth:`sge.dsp.Game.event_alarm` is executed with ``alarm_id``
        set to the respective key, and the item is deleted from this
-       dictionary.
+       dictionary.  A regular dictionary can be assigned to this
+       attribute to replace all of the alarms.
 
     .. attribute:: input_events
 
-       A list containing all input event objects which have not yet been
-       handled, in the order in which they occurred.
+       A :class:`collections.deque` containing all input event objects
+       which have not yet been handled, in the order in which they
+       occurred.  Consecutive :class:`sge.input.MouseMove` events
+       received within a single frame are merged into one event, as are
+       consecutive :class:`sge.input.JoystickAxisMove` events for the
+       same axis along with the :class:`sge.input.JoystickEvent` events
+       that go with them.  Events are never merged across other events.
 
        .. note::
 
           If you handle input events manually, be sure to delete them
-          from this list, preferably by getting them with
-          :meth:`list.pop`.  Otherwise, the event will be handled more
-          than once, which is usually not what you want.
+          from this queue, preferably by getting them with
+          :meth:`collections.deque.popleft`.  Otherwise, the event will
+          be handled more than once, which is usually not what you want.
+
+       Any iterable of input events can be assigned to this attribute;
+       it is converted to a :class:`collections.deque`.
 
     .. attribute:: start_room
 
@@ -218,6 +266,25 @@ class Game(object):
        (Read-only)
     """
 
+    @property
+    def alarms(self):
+        return self._alarms
+
+    @alarms.setter
+    def alarms(self, value):
+        self._alarms.clear()
+        self._alarms.update(value)
+
+    @property
+    def input_events(self):
+        return self.__input_events
+
+    @input_events.setter
+    def input_events(self, value):
+        if not isinstance(value, _InputEventQueue):
+            value = _InputEventQueue(value)
+        self.__input_events = value
+
     @property
     def width(self):
         return r.game_width
@@ -318,7 +385,8 @@ class Game(object):
                  scale_proportional=True, scale_method=None, fps=60,
                  delta=False, delta_min=15, delta_max=None, grab_input=False,
                  window_text=None, window_icon=None,
-                 collision_events_enabled=True):
+                 collision_events_enabled=True, headless=False,
+                 uncapped=False, subsystems=None):
         """
         Arguments set the respective initial attributes of the game.
         See the documentation for :class:`sge.dsp.Game` for more
@@ -327,9 +395,29 @@ class Game(object):
         The created :class:`sge.dsp.Game` object is automatically
         assigned to :data:`sge.game`.
         """
+        if headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+        if subsystems is not None:
+            subsystems = frozenset(subsystems)
+        self.subsystems = subsystems
+
         # Settings use a smaller buffer size for less lag.
         pygame.mixer.pre_init(22050, -16, 2, 1024)
-        pygame.init()
+        if subsystems is None:
+            pygame.init()
+        else:
+            pygame.display.init()
+            if "mixer" in subsystems:
+                try:
+                    pygame.mixer.init()
+                except pygame.error:
+                    pass
+            if "joystick" in subsystems:
+                pygame.joystick.init()
+            if "font" in subsystems:
+                pygame.font.init()
 
         pygame.mixer.music.set_endevent(sge.MUSIC_END_EVENT)
 
@@ -346,6 +434,7 @@ class Game(object):
         r.game_scale_proportional = scale_proportional
         r.game_scale_method = scale_method
         r.game_new_room = None
+        r.game_skip_render = False
         self.fps = fps
         self.delta = delta
         self.delta_min = delta_min
@@ -353,10 +442,17 @@ class Game(object):
         self.window_text = window_text
         self.window_icon = window_icon
         self.collision_events_enabled = collision_events_enabled
-        self.alarms = {}
+        self.headless = headless
+        self.uncapped = uncapped
+        r._alarm_clock = 0
+        r._alarm_heap = []
+        r._due_object_alarms = {}
+        r._alarm_lag = 0
+        r._alarm_pending = None
+        self._alarms = r._Alarms(self, True)
         self.start_room = None
 
-        self.input_events = []
+        self.input_events = _InputEventQueue()
         self.current_room = None
 
         r.game_display_surface = pygame.Surface((self.width, self.height))
@@ -366,22 +462,24 @@ class Game(object):
         r.music_queue = []
         r.game_running = False
         r.game_clock = pygame.time.Clock()
+        # Ticking the clock also starts SDL's timer, which pygame.init
+        # would otherwise start, for the benefit of the music code.
+        r.game_clock.tick()
         r.game_window_projections = []
         self.mouse = Mouse()
 
-        # Setup sound channels
-        r.game_available_channels = []
+        # Sound channels and joysticks are set up when they are first
+        # used.
         if pygame.mixer.get_init():
-            for i in six.moves.range(pygame.mixer.get_num_channels()):
-                r.game_available_channels.append(pygame.mixer.Channel(i))
-        else:
+            r._voices_pending = r.DEFAULT_VOICES
+        elif subsystems is None or "mixer" in subsystems:
             w = "pygame.mixer module not initialized! Are you missing SDL_mixer?"
             warnings.warn(w)
 
-        # Setup joysticks
-        sge.joystick.refresh()
+        r._js_pending = subsystems is None or "joystick" in subsystems
 
-        if not pygame.font.get_init():
+        if (not pygame.font.get_init() and
+                (subsystems is None or "font" in subsystems)):
             w = "pygame.font module not initialized! Are you missing SDL_ttf?"
             warnings.warn(w)
 
@@ -393,6 +491,9 @@ class Game(object):
         further calls is undefined.
         """
         if self.start_room is not None:
+            if r._js_pending:
+                sge.joystick.refresh()
+
             r.game_running = True
             self.start_room.start()
             r.game_clock.tick()
@@ -403,19 +504,27 @@ class Game(object):
                 if new_room is not None:
                     r.game_new_room = None
                     self.unpause()
+                    if self.current_room is not None:
+                        self.current_room.alarms.suspend()
                     self.current_room = new_room
+                    new_room.alarms.resume()
 
-                    r._colliders = []
-                    r._collision_checkers = []
+                    for obj in r._active_objects:
+                        obj.alarms.suspend()
+
+                    r._colliders = r._ObjectList()
+                    r._collision_checkers = r._ObjectList()
                     r._active_objects = set()
 
                     r_set_object_areas(new_room, False)
+                    new_room.rd["area_tune_timer"] = 0
                     for obj in new_room.objects:
-                        obj.rd["object_areas"] = set()
+                        obj._object_areas = set()
                         o_update_object_areas(obj)
                         o_update_collision_lists(obj)
                         if obj.active:
                             r._active_objects.add(obj)
+                            obj.alarms.resume()
 
                     # This is stored in a variable to prevent problems
                     # with rd["started"] being False during the
@@ -438,111 +547,7 @@ class Game(object):
                 # Input events
                 self.pump_input()
                 while self.input_events:
-                    event = self.input_events.pop(0)
-
-                    if isinstance(event, sge.input.KeyPress):
-                        self.event_key_press(event.key, event.char)
-                        self.current_room.event_key_press(event.key,
-                                                          event.char)
-                        for obj in r._active_objects.copy():
-                            obj.event_key_press(event.key, event.char)
-                    elif isinstance(event, sge.input.KeyRelease):
-                        self.event_key_release(event.key)
-                        self.current_room.event_key_release(event.key)
-                        for obj in r._active_objects.copy():
-                            obj.event_key_release(event.key)
-                    elif isinstance(event, sge.input.MouseMove):
-                        self.event_mouse_move(event.x, event.y)
-                        self.current_room.event_mouse_move(event.x, event.y)
-                        for obj in r._active_objects.copy():
-                            obj.event_mouse_move(event.x, event.y)
-                    elif isinstance(event, sge.input.MouseButtonPress):
-                        self.event_mouse_button_press(event.button)
-                        self.current_room.event_mouse_button_press(
-                            event.button)
-                        for obj in r._active_objects.copy():
-                            obj.event_mouse_button_press(event.button)
-                    elif isinstance(event, sge.input.MouseButtonRelease):
-                        self.event_mouse_button_release(event.button)
-                        self.current_room.event_mouse_button_release(
-                            event.button)
-                        for obj in r._active_objects.copy():
-                            obj.event_mouse_button_release(event.button)
-                    elif isinstance(event, sge.input.JoystickAxisMove):
-                        self.event_joystick_axis_move(
-                            event.js_name, event.js_id, event.axis,
-                            event.value)
-                        self.current_room.event_joystick_axis_move(
-                            event.js_name, event.js_id, event.axis,
-                            event.value)
-                        for obj in r._active_objects.copy():
-                            obj.event_joystick_axis_move(
-                                event.js_name, event.js_id, event.axis,
-                                event.value)
-                    elif isinstance(event, sge.input.JoystickHatMove):
-                        self.event_joystick_hat_move(
-                            event.js_name, event.js_id, event.hat, event.x,
-                            event.y)
-                        self.current_room.event_joystick_hat_move(
-                            event.js_name, event.js_id, event.hat, event.x,
-                            event.y)
-                        for obj in r._active_objects.copy():
-                            obj.event_joystick_hat_move(
-                                event.js_name, event.js_id, event.hat, event.x,
-                                event.y)
-                    elif isinstance(event, sge.input.JoystickTrackballMove):
-                        self.event_joystick_trackball_move(
-                            event.js_name, event.js_id, event.ball, event.x,
-                            event.y)
-                        self.current_room.event_joystick_trackball_move(
-                            event.js_name, event.js_id, event.ball, event.x,
-                            event.y)
-                        for obj in r._active_objects.copy():
-                            obj.event_joystick_trackball_move(
-                                event.js_name, event.js_id, event.ball,
-                                event.x, event.y)
-                    elif isinstance(event, sge.input.JoystickButtonPress):
-                        self.event_joystick_button_press(
-                            event.js_name, event.js_id, event.button)
-                        self.current_room.event_joystick_button_press(
-                            event.js_name, event.js_id, event.button)
-                        for obj in r._active_objects.copy():
-                            obj.event_joystick_button_press(
-                                event.js_name, event.js_id, event.button)
-                    elif isinstance(event, sge.input.JoystickButtonRelease):
-                        self.event_joystick_button_release(
-                            event.js_name, event.js_id, event.button)
-                        self.current_room.event_joystick_button_release(
-                            event.js_name, event.js_id, event.button)
-                        for obj in r._active_objects.copy():
-                            obj.event_joystick_button_release(
-                                event.js_name, event.js_id, event.button)
-                    elif isinstance(event, sge.input.JoystickEvent):
-                        self.event_joystick(
-                            event.js_name, event.js_id, event.input_type,
-                            event.input_id, event.value)
-                        self.current_room.event_joystick(
-                            event.js_name, event.js_id, event.input_type,
-                            event.input_id, event.value)
-                        for obj in r._active_objects.copy():
-                            obj.event_joystick(
-                                event.js_name, event.js_id, event.input_type,
-                                event.input_id, event.value)
-                    elif isinstance(event, sge.input.KeyboardFocusGain):
-                        self.event_gain_keyboard_focus()
-                        self.current_room.event_gain_keyboard_focus()
-                    elif isinstance(event, sge.input.KeyboardFocusLose):
-                        self.event_lose_keyboard_focus()
-                        self.current_room.event_lose_keyboard_focus()
-                    elif isinstance(event, sge.input.MouseFocusGain):
-                        self.event_gain_mouse_focus()
-                        self.current_room.event_gain_mouse_focus()
-                    elif isinstance(event, sge.input.MouseFocusLose):
-                        self.event_lose_mouse_focus()
-                        self.current_room.event_lose_mouse_focus()
-                    elif isinstance(event, sge.input.QuitRequest):
-                        self.current_room.event_close()
-                        self.event_close()
+                    _handle_input_event(self, self.input_events.popleft())
 
                 # Regulate speed
                 real_time_passed = self.regulate_speed()
@@ -554,24 +559,21 @@ class Game(object):
                     time_passed = 1000 / self.fps
                     delta_mult = 1
 
-                # Alarms
-                activated_alarms = []
-                for a in self.alarms:
-                    self.alarms[a] -= delta_mult
-                    if self.alarms[a] <= 0:
-                        activated_alarms.append(a)
-                for a in activated_alarms:
-                    del self.alarms[a]
-                    self.event_alarm(a)
-
-                activated_alarms = []
-                for a in self.current_room.alarms:
-                    self.current_room.alarms[a] -= delta_mult
-                    if self.current_room.alarms[a] <= 0:
-                        activated_alarms.append(a)
-                for a in activated_alarms:
-                    del self.current_room.alarms[a]
-                    self.current_room.event_alarm(a)
+                # Alarms (object alarms are handled by o_update)
+                r._alarm_clock += delta_mult
+                r._alarm_lag = delta_mult
+                room = self.current_room
+                room_alarms = []
+                for owner, a in r._pop_due_alarms():
+                    if owner is self:
+                        self.event_alarm(a)
+                    elif owner is room:
+                        room_alarms.append(a)
+                    else:
+                        r._due_object_alarms.setdefault(owner, []).append(a)
+
+                for a in room_alarms:
+                    room.event_alarm(a)
 
                 # Step events
                 self.event_step(real_time_passed, delta_mult)
@@ -581,18 +583,39 @@ class Game(object):
                 for layer in self.current_room.background.layers:
                     bl_update(layer, time_passed)
 
+                # Load and unload chunks of streaming rooms
+                r_update_chunks(self.current_room)
+
+                # Resize object areas of rooms which size them
+                # automatically
+                r_tune_object_areas(self.current_room)
+
+                # Put objects far from the views to sleep
+                r_update_activation(self.current_room)
+
                 # Update objects (including mouse)
-                for obj in r._active_objects.copy():
+                objects = r._active_objects.copy()
+                r._alarm_pending = set(objects)
+                for obj in objects:
                     obj.event_begin_step(real_time_passed, delta_mult)
                     o_update(obj, time_passed, delta_mult)
                     obj.event_step(real_time_passed, delta_mult)
 
+                # Alarms of objects which were deactivated or removed
+                # before they could go off are still in their alarms
+                # and are rescheduled when the objects are reactivated.
+                r._due_object_alarms = {}
+                r._alarm_lag = 0
+                r._alarm_pending = None
+
                 if self.collision_events_enabled:
-                    # Set objects' colliders
+                    # Set colliders of objects which check for collisions
+                    # (nothing else uses them).
                     room = self.current_room
-                    for obj in r._colliders:
-                        obj.rd["colliders"] = []
-                        for area in obj.rd["object_areas"]:
+                    for obj in r._collision_checkers:
+                        obj._colliders = []
+                        found = set()
+                        for area in obj._object_areas:
                             if area is not None:
                                 i, j = area
                                 room_area = room.object_areas[i][j]
@@ -601,13 +624,18 @@ class Game(object):
 
                             for other in room_area:
                                 if (other is not obj and other.tangible and
-                                        other not in obj.rd["colliders"]):
-                                    obj.rd["colliders"].append(other)
+                                        other not in found):
+                                    found.add(other)
+                                    obj._colliders.append(other)
 
                     # Detect collisions
                     for obj in r._collision_checkers:
                         o_detect_collisions(obj)
 
+                    for obj in r._collision_checkers:
+                        if obj.collision_continuous:
+                            o_detect_continuous_collision(obj)
+
                 # End step event
                 for obj in r._active_objects.copy():
                     obj.event_end_step(real_time_passed, delta_mult)
@@ -617,21 +645,33 @@ class Game(object):
                     obj.xprevious = obj.x
                     obj.yprevious = obj.y
 
+                render = not (self.headless or r.game_skip_render)
+                r.game_skip_render = False
+
                 # Transition
                 rd = self.current_room.rd
                 if rd["t_update"] is not None:
                     rd["t_time_passed"] += real_time_passed
 
                     if rd["t_time_passed"] < rd["t_duration"]:
-                        complete = rd["t_time_passed"] / rd["t_duration"]
-                        rd["t_update"](self.current_room, complete)
-                        rd["t_complete_last"] = complete
-                        self.project_sprite(rd["t_sprite"], 0, 0, 0)
+                        # Transitions are drawn incrementally from
+                        # t_complete_last, so skipped frames are caught
+                        # up on the next rendered one.
+                        if render:
+                            complete = rd["t_time_passed"] / rd["t_duration"]
+                            rd["t_update"](self.current_room, complete)
+                            rd["t_complete_last"] = complete
+                            r.game_window_projections.append(
+                                (rd["t_sprite"].rd["baseimages"][0], 0, 0,
+                                 0, None))
                     else:
                         rd["t_update"] = None
 
                 # Refresh
-                self.refresh()
+                if render:
+                    self.refresh()
+                else:
+                    _skip_refresh()
             else:
                 pygame.quit()
                 sge.game = None
@@ -670,109 +710,7 @@ class Game(object):
             # Input events
             self.pump_input()
             while self.input_events:
-                event = self.input_events.pop(0)
-
-                if isinstance(event, sge.input.KeyPress):
-                    self.event_paused_key_press(event.key, event.char)
-                    self.current_room.event_paused_key_press(event.key,
-                                                             event.char)
-                    for obj in self.current_room.objects:
-                        obj.event_paused_key_press(event.key, event.char)
-                elif isinstance(event, sge.input.KeyRelease):
-                    self.event_paused_key_release(event.key)
-                    self.current_room.event_paused_key_release(event.key)
-                    for obj in self.current_room.objects:
-                        obj.event_paused_key_release(event.key)
-                elif isinstance(event, sge.input.MouseMove):
-                    self.event_paused_mouse_move(event.x, event.y)
-                    self.current_room.event_paused_mouse_move(event.x, event.y)
-                    for obj in self.current_room.objects:
-                        obj.event_paused_mouse_move(event.x, event.y)
-                elif isinstance(event, sge.input.MouseButtonPress):
-                    self.event_paused_mouse_button_press(event.button)
-                    self.current_room.event_paused_mouse_button_press(
-                        event.button)
-                    for obj in self.current_room.objects:
-                        obj.event_paused_mouse_button_press(event.button)
-                elif isinstance(event, sge.input.MouseButtonRelease):
-                    self.event_paused_mouse_button_release(event.button)
-                    self.current_room.event_paused_mouse_button_release(
-                        event.button)
-                    for obj in self.current_room.objects:
-                        obj.event_paused_mouse_button_release(event.button)
-                elif isinstance(event, sge.input.JoystickAxisMove):
-                    self.event_paused_joystick_axis_move(
-                        event.js_name, event.js_id, event.axis, event.value)
-                    self.current_room.event_paused_joystick_axis_move(
-                        event.js_name, event.js_id, event.axis, event.value)
-                    for obj in self.current_room.objects:
-                        obj.event_paused_joystick_axis_move(
-                            event.js_name, event.js_id, event.axis,
-                            event.value)
-                elif isinstance(event, sge.input.JoystickHatMove):
-                    self.event_paused_joystick_hat_move(
-                        event.js_name, event.js_id, event.hat, event.x,
-                        event.y)
-                    self.current_room.event_paused_joystick_hat_move(
-                        event.js_name, event.js_id, event.hat, event.x,
-                        event.y)
-                    for obj in self.current_room.objects:
-                        obj.event_paused_joystick_hat_move(
-                            event.js_name, event.js_id, event.hat,
-                            event.x, event.y)
-                elif isinstance(event, sge.input.JoystickTrackballMove):
-                    self.event_paused_joystick_trackball_move(
-                        event.js_name, event.js_id, event.ball, event.x,
-                        event.y)
-                    self.current_room.event_paused_joystick_trackball_move(
-                        event.js_name, event.js_id, event.ball, event.x,
-                        event.y)
-                    for obj in self.current_room.objects:
-                        obj.event_paused_joystick_trackball_move(
-                            event.js_name, event.js_id, event.ball,
-                            event.x, event.y)
-                elif isinstance(event, sge.input.JoystickButtonPress):
-                    self.event_paused_joystick_button_press(
-                        event.js_name, event.js_id, event.button)
-                    self.current_room.event_paused_joystick_button_press(
-                        event.js_name, event.js_id, event.button)
-                    for obj in self.current_room.objects:
-                        obj.event_paused_joystick_button_press(
-                            event.js_name, event.js_id, event.button)
-                elif isinstance(event, sge.input.JoystickButtonRelease):
-                    self.event_paused_joystick_button_release(
-                        event.js_name, event.js_id, event.button)
-                    self.current_room.event_paused_joystick_button_release(
-                        event.js_name, event.js_id, event.button)
-                    for obj in self.current_room.objects:
-                        obj.event_paused_joystick_button_release(
-                            event.js_name, event.js_id, event.button)
-                elif isinstance(event, sge.input.JoystickEvent):
-                    self.event_paused_joystick(
-                        event.js_name, event.js_id, event.input_type,
-                        event.input_id, event.value)
-                    self.current_room.event_paused_joystick(
-                        event.js_name, event.js_id, event.input_type,
-                        event.input_id, event.value)
-                    for obj in r._active_objects.copy():
-                        obj.event_paused_joystick(
-                            event.js_name, event.js_id, event.input_type,
-                            event.input_id, event.value)
-                elif isinstance(event, sge.input.KeyboardFocusGain):
-                    self.event_paused_gain_keyboard_focus()
-                    self.current_room.event_paused_gain_keyboard_focus()
-                elif isinstance(event, sge.input.KeyboardFocusLose):
-                    self.event_paused_lose_keyboard_focus()
-                    self.current_room.event_paused_lose_keyboard_focus()
-                elif isinstance(event, sge.input.MouseFocusGain):
-                    self.event_paused_gain_mouse_focus()
-                    self.current_room.event_paused_gain_mouse_focus()
-                elif isinstance(event, sge.input.MouseFocusLose):
-                    self.event_paused_lose_mouse_focus()
-                    self.current_room.event_paused_lose_mouse_focus()
-                elif isinstance(event, sge.input.QuitRequest):
-                    self.current_room.event_paused_close()
-                    self.event_paused_close()
+                _handle_input_event(self, self.input_events.popleft(), True)
 
             # Regulate speed
             time_passed = self.regulate_speed()
@@ -794,10 +732,14 @@ class Game(object):
             self.project_sprite(sprite, 0, x, y)
 
             # Refresh
-            self.refresh()
+            if self.headless or r.game_skip_render:
+                r.game_skip_render = False
+                _skip_refresh()
+            else:
+                self.refresh()
 
         self.pump_input()
-        self.input_events = []
+        self.input_events.clear()
 
     def unpause(self):
         """Unpause the game."""
@@ -814,13 +756,26 @@ class Game(object):
 
         Upon calling this, each event is translated into the appropriate
         class in :mod:`sge.input` and the resulting object is appended
-        to :attr:`input_events`.
+        to :attr:`input_events`.  The states of the keyboard, mouse, and
+        joysticks are also recorded at this point; the polling functions
+        in :mod:`sge.keyboard`, :mod:`sge.mouse`, and
+        :mod:`sge.joystick` return these recorded states until the next
+        time this method is called.  While a :class:`sge.input.Replay`
+        is running, live input is discarded and the recorded input is
+        used instead.
 
         You normally don't need to use this function directly.  It is
         called automatically in each frame of the SGE's main loop.  You
         only need to use this function directly if you take control away
         from the SGE's main loop, e.g. to create your own loop.
         """
+        # Pending motion events which further motion within this call
+        # gets merged into, as long as nothing else has been queued
+        # after them.
+        mouse_move = None
+        axis_moves = {}
+        num_events = len(self.input_events)
+
         for event in pygame.event.get():
             if event.type == pygame.KEYDOWN:
                 try:
@@ -839,8 +794,13 @@ class Game(object):
                 input_event = sge.input.KeyRelease(k)
                 self.input_events.append(input_event)
             elif event.type == pygame.MOUSEMOTION:
-                input_event = sge.input.MouseMove(*event.rel)
-                self.input_events.append(input_event)
+                if (mouse_move is not None and
+                        self.input_events[-1] is mouse_move):
+                    mouse_move.x += event.rel[0]
+                    mouse_move.y += event.rel[1]
+                else:
+                    mouse_move = sge.input.MouseMove(*event.rel)
+                    self.input_events.append(mouse_move)
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 try:
                     b = sge.MOUSE_BUTTON_NAMES[event.button]
@@ -860,37 +820,56 @@ class Game(object):
                     input_event = sge.input.MouseButtonRelease(b)
                     self.input_events.append(input_event)
             elif event.type == pygame.JOYAXISMOTION:
-                jsname = r.game_js_names[event.joy]
-                value = max(-1.0, min(event.value, 1.0))
-                a = abs(min(0, value))
-                b = max(0, value)
-                z = 1 - abs(value)
+                js_id, jsname = r._get_joystick_event_id(event)
+                if js_id is None:
+                    continue
 
-                axis_id = (event.joy, event.axis)
+                value = r._filter_axis(event.value)
+                axis_id = (js_id, event.axis)
                 valuep = r._prev_axes.get(axis_id, 0)
+                if value == valuep:
+                    continue
+
                 r._prev_axes[axis_id] = value
+                a = abs(min(0, value))
+                b = max(0, value)
+                z = 1 - abs(value)
                 ap = abs(min(0, valuep))
                 bp = max(0, valuep)
                 zp = 1 - abs(valuep)
 
-                input_event = sge.input.JoystickAxisMove(
-                    jsname, event.joy, event.axis, value)
-                self.input_events.append(input_event)
-
+                values = {"axis-": a, "axis+": b, "axis0": z}
+                changed = set()
                 if a != ap:
-                    input_event = sge.input.JoystickEvent(
-                        jsname, event.joy, "axis-", event.axis, a)
-                    self.input_events.append(input_event)
+                    changed.add("axis-")
                 if b != bp:
-                    input_event = sge.input.JoystickEvent(
-                        jsname, event.joy, "axis+", event.axis, b)
-                    self.input_events.append(input_event)
+                    changed.add("axis+")
                 if z != zp:
-                    input_event = sge.input.JoystickEvent(
-                        jsname, event.joy, "axis0", event.axis, z)
-                    self.input_events.append(input_event)
+                    changed.add("axis0")
+
+                # The axis move is merged together with the joystick
+                # events that go with it, so they stay in order.
+                group = axis_moves.get(axis_id)
+                if (group is not None and
+                        self.input_events[-1] is group[-1] and
+                        changed <= set(e.input_type for e in group[1:])):
+                    group[0].value = value
+                    for input_event in group[1:]:
+                        input_event.value = values[input_event.input_type]
+                else:
+                    group = [sge.input.JoystickAxisMove(
+                        jsname, js_id, event.axis, value)]
+                    for input_type in ("axis-", "axis+", "axis0"):
+                        if input_type in changed:
+                            group.append(sge.input.JoystickEvent(
+                                jsname, js_id, input_type, event.axis,
+                                values[input_type]))
+                    axis_moves[axis_id] = group
+                    self.input_events.extend(group)
             elif event.type == pygame.JOYHATMOTION:
-                jsname = r.game_js_names[event.joy]
+                js_id, jsname = r._get_joystick_event_id(event)
+                if js_id is None:
+                    continue
                 x, y = event.value
                 y *= -1
                 left = abs(min(0, x))
@@ -900,7 +879,7 @@ class Game(object):
                 down = max(0, y)
                 center_y = 1 - abs(y)
 
-                hat_id = (event.joy, event.hat)
+                hat_id = (js_id, event.hat)
                 xp, yp = r._prev_hats.get(hat_id, (0, 0))
                 r._prev_hats[hat_id] = (x, y)
                 leftp = abs(min(0, xp))
@@ -911,81 +890,94 @@ class Game(object):
                 center_yp = 1 - abs(yp)
 
                 input_event = sge.input.JoystickHatMove(
-                    jsname, event.joy, event.hat, x, y)
+                    jsname, js_id, event.hat, x, y)
                 self.input_events.append(input_event)
 
                 if left != leftp:
                     input_event = sge.input.JoystickEvent(
-                        jsname, event.joy, "hat_left", event.hat, left)
+                        jsname, js_id, "hat_left", event.hat, left)
                     self.input_events.append(input_event)
                 if right != rightp:
                     input_event = sge.input.JoystickEvent(
-                        jsname, event.joy, "hat_right", event.hat, right)
+                        jsname, js_id, "hat_right", event.hat, right)
                     self.input_events.append(input_event)
                 if center_x != center_xp:
                     input_event = sge.input.JoystickEvent(
-                        jsname, event.joy, "hat_center_x", event.hat, center_x)
+                        jsname, js_id, "hat_center_x", event.hat, center_x)
                     self.input_events.append(input_event)
                 if up != upp:
                     input_event = sge.input.JoystickEvent(
-                        jsname, event.joy, "hat_up", event.hat, up)
+                        jsname, js_id, "hat_up", event.hat, up)
                     self.input_events.append(input_event)
                 if down != downp:
                     input_event = sge.input.JoystickEvent(
-                        jsname, event.joy, "hat_down", event.hat, down)
+                        jsname, js_id, "hat_down", event.hat, down)
                     self.input_events.append(input_event)
                 if center_y != center_yp:
                     input_event = sge.input.JoystickEvent(
-                        jsname, event.joy, "hat_center_y", event.hat, center_y)
+                        jsname, js_id, "hat_center_y", event.hat, center_y)
                     self.input_events.append(input_event)
             elif event.type == pygame.JOYBALLMOTION:
-                jsname = r.game_js_names[event.joy]
+                js_id, jsname = r._get_joystick_event_id(event)
+                if js_id is None:
+                    continue
                 x, y = event.rel
 
                 input_event = sge.input.JoystickTrackballMove(
-                    jsname, event.joy, event.ball, x, y)
+                    jsname, js_id, event.ball, x, y)
                 self.input_events.append(input_event)
 
                 if x < 0:
                     input_event = sge.input.JoystickEvent(
-                        jsname, event.joy, "trackball_left", event.ball,
+                        jsname, js_id, "trackball_left", event.ball,
                         abs(x))
                     self.input_events.append(input_event)
                 elif x > 0:
                     input_event = sge.input.JoystickEvent(
-                        jsname, event.joy, "trackball_right", event.ball,
+                        jsname, js_id, "trackball_right", event.ball,
                         abs(x))
                     self.input_events.append(input_event)
                 if y < 0:
                     input_event = sge.input.JoystickEvent(
-                        jsname, event.joy, "trackball_up", event.ball,
+                        jsname, js_id, "trackball_up", event.ball,
                         abs(y))
                     self.input_events.append(input_event)
                 elif y > 0:
                     input_event = sge.input.JoystickEvent(
-                        jsname, event.joy, "trackball_down", event.ball,
+                        jsname, js_id, "trackball_down", event.ball,
                         abs(y))
                     self.input_events.append(input_event)
             elif event.type == pygame.JOYBUTTONDOWN:
-                jsname = r.game_js_names[event.joy]
+                js_id, jsname = r._get_joystick_event_id(event)
+                if js_id is None:
+                    continue
 
-                input_event = sge.input.JoystickButtonPress(jsname, event.joy,
+                input_event = sge.input.JoystickButtonPress(jsname, js_id,
                                                             event.button)
                 self.input_events.append(input_event)
 
                 input_event = sge.input.JoystickEvent(
-                    jsname, event.joy, "button", event.button, True)
+                    jsname, js_id, "button", event.button, True)
                 self.input_events.append(input_event)
             elif event.type == pygame.JOYBUTTONUP:
-                jsname = r.game_js_names[event.joy]
+                js_id, jsname = r._get_joystick_event_id(event)
+                if js_id is None:
+                    continue
 
                 input_event = sge.input.JoystickButtonRelease(
-                    jsname, event.joy, event.button)
+                    jsname, js_id, event.button)
                 self.input_events.append(input_event)
 
                 input_event = sge.input.JoystickEvent(
-                    jsname, event.joy, "button", event.button, False)
+                    jsname, js_id, "button", event.button, False)
                 self.input_events.append(input_event)
+            elif event.type == r.JOYDEVICEADDED:
+                joy = pygame.joystick.Joystick(event.device_index)
+                instance_id = r._get_js_instance_id(joy, event.device_index)
+                if instance_id not in r._js_instances:
+                    r._add_joystick(joy, instance_id)
+            elif event.type == r.JOYDEVICEREMOVED:
+                r._remove_joystick(event.instance_id)
             elif event.type == pygame.ACTIVEEVENT:
                 if event.gain:
                     if 2 & event.state:
@@ -1008,9 +1000,18 @@ class Game(object):
                 r.game_window_height = event.h
                 _set_mode()
             elif event.type == sge.MUSIC_END_EVENT:
-                if r.music_queue:
-                    music = r.music_queue.pop(0)
-                    music[0].play(*music[1:])
+                r._music_ended()
+
+        if r._input_player is not None:
+            # Live input is replaced with the recorded input.
+            while len(self.input_events) > num_events:
+                self.input_events.pop()
+            r._input_player._replay_pump(self)
+        else:
+            r._update_input_state()
+            if r._input_recorder is not None:
+                new_events = list(self.input_events)[num_events:]
+                r._input_recorder._record_pump(new_events)
 
     def regulate_speed(self, fps=None):
         """
@@ -1024,7 +1025,12 @@ class Game(object):
         When this method is called, the program will sleep long enough
         so that the game runs at ``fps`` frames per second, then return
         the number of milliseconds that passed between the previous call
-        and the current call of this method.
+        and the current call of this method.  If :attr:`uncapped` is
+        :const:`True`, this method does not sleep and returns the number
+        of milliseconds a frame takes at ``fps`` frames per second
+        instead.  While a
+        :class:`sge.input.Replay` is running, this method returns the
+        recorded value immediately instead.
 
         You normally don't need to use this function directly.  It is
         called automatically in each frame of the SGE's main loop.  You
@@ -1037,7 +1043,22 @@ class Game(object):
             else:
                 fps = self.fps
 
-        tp = r.game_clock.tick(fps)
+        tp = None
+        if r._input_player is not None:
+            tp = r._input_player._replay_timing()
+            if tp is not None:
+                # Keep the clock current without waiting.
+                r.game_clock.tick()
+
+        if tp is None:
+            if self.uncapped:
+                r.game_clock.tick()
+                tp = 1000 / fps
+            else:
+                tp = r.game_clock.tick(fps)
+
+            if r._input_recorder is not None:
+                r._input_recorder._record_timing(tp)
 
         r.cache.prune_time += tp
         if r.cache.prune_time >= r.CACHE_PRUNE_TIME:
@@ -1058,8 +1079,9 @@ class Game(object):
         only need to use this function directly if you take control away
         from the SGE's main loop, e.g. to create your own loop.
         """
-        # Music control
+        # Music and positional sound control
         _handle_music()
+        _handle_sounds()
 
         if (r.game_x == 0 and r.game_y == 0 and r.game_xscale == 1 and
                 r.game_yscale == 1):
@@ -1078,7 +1100,7 @@ class Game(object):
                 view_surf = display_surface
             else:
                 view_surf = pygame.Surface((view.width, view.height))
-            view_surf.fill(pygame.Color(*self.current_room.background.color))
+            view_surf.fill(self.current_room.background.color._value)
             view_x = view.x
             view_y = view.y
             view_width = view.width
@@ -1134,8 +1156,8 @@ class Game(object):
                         images.append((img, x + math.floor(view_x),
                                        y + math.floor(view_y), layer.z, None))
 
-            for obj in self.current_room.get_objects_at(
-                    view_x, view_y, view_width, view_height):
+            for obj in r_iter_objects_at(self.current_room, view_x, view_y,
+                                         view_width, view_height):
                 if obj.visible and obj is not self.mouse:
                     if isinstance(obj.sprite, sge.gfx.Sprite):
                         img = s_get_image(obj.sprite, obj.image_index,
@@ -1219,6 +1241,21 @@ class Game(object):
 
         pygame.display.flip()
 
+    def skip_render(self):
+        """
+        Skip rendering the current frame.
+
+        When this is called, the SGE's main loop does not call
+        :meth:`refresh` at the end of the current frame.  All events,
+        movement, and collision detection still take place as usual,
+        and anything projected during the frame is discarded.  This can
+        be used, for example, to keep game logic running at full rate
+        while only drawing some of the frames.
+
+        See also :attr:`headless`.
+        """
+        r.game_skip_render = True
+
     def project_dot(self, x, y, color, z=0, blend_mode=None):
         """
         Project a single-pixel dot onto the game window.
@@ -1762,22 +1799,96 @@ class Room(object):
        performance, this should generally be about the average height of
        objects in the room which check for collisions.
 
+    .. attribute:: object_area_auto
+
+       Whether or not :attr:`object_area_width` and
+       :attr:`object_area_height` are set automatically.  If set to
+       :const:`True`, when the room starts and every couple of seconds
+       after that, they are compared with the average size of the
+       bounding boxes of the objects in the room which check for
+       collisions (or of all tangible objects if none check for
+       collisions), and if they are off by more than a factor of two,
+       they are changed to that size and the object areas are rebuilt.
+       Until then, the values given are used.
+
+       :meth:`get_object_area_stats` can be used to see how well the
+       object areas fit the objects in the room.
+
+    .. attribute:: activation_margin
+
+       If set to a number, objects which are not within this many
+       pixels of any view are automatically put to sleep: they are made
+       inactive until a view comes near them again, at which point they
+       are made active again.  This means that objects far away from
+       any view don't use up time each frame.  If set to :const:`None`,
+       objects are never put to sleep.
+
+       The object areas are used to find which objects are near the
+       views, so objects may be kept awake at a distance of up to
+       :attr:`object_area_width` or :attr:`object_area_height` beyond
+       the margin.  Only objects which are active are put to sleep, and
+       the mouse is never put to sleep.  If anything other than the SGE
+       sets :attr:`sge.dsp.Object.active` on an object which is asleep,
+       the object is no longer considered asleep: its
+       :attr:`sge.dsp.Object.tangible` is restored, and it is not woken
+       up automatically.
+
+    .. attribute:: activation_untangible
+
+       Whether or not objects put to sleep because of
+       :attr:`activation_margin` are also made intangible while asleep.
+       When they are woken up, :attr:`sge.dsp.Object.tangible` is
+       restored to what it was when they were put to sleep.
+
+    .. attribute:: chunk_width
+
+       If set to a number, the room is a streaming room: it is divided
+       into chunks of this width, and only the objects in chunks near
+       the views are kept in the room.  When a chunk moves away from
+       all views, :meth:`event_chunk_unload` is called, and then its
+       objects are removed from the room and stored in the same form
+       as in :meth:`get_snapshot`, without calling any events.  When a
+       chunk comes near a view again, its objects are put back into the
+       room in the same way as in :meth:`restore_snapshot`, and then
+       :meth:`event_chunk_load` is called, which can add anything else
+       the chunk needs, such as tile grids.  An object's chunk is the
+       one its position is in, and objects which move out of the
+       loaded chunks are stored the next time any chunk is unloaded.
+       The mouse and objects whose :attr:`sge.dsp.Object.streamed`
+       attribute is :const:`False` are never unloaded.
+
+       If set to :const:`None`, the room is not a streaming room.  This
+       should not be changed once the room has been started.
+
+    .. attribute:: chunk_height
+
+       The height of the room's chunks.  If set to :const:`None`,
+       :attr:`chunk_width` is used.  See the documentation for
+       :attr:`chunk_width` for more information.
+
+    .. attribute:: chunk_margin
+
+       How many pixels away from the views chunks are loaded.  See the
+       documentation for :attr:`chunk_width` for more information.
+
     .. attribute:: alarms
 
-       A dictionary containing the alarms of the room.  Each value
-       decreases by 1 each frame (adjusted for delta timing if it is
-       enabled).  When a value is at or below 0,
+       A dictionary-like object containing the alarms of the room.
+       Each value decreases by 1 each frame (adjusted for delta timing
+       if it is enabled).  When a value is at or below 0,
        :meth:`event_alarm` is executed with ``alarm_id`` set to the
        respective key, and the item is deleted from this dictionary.
 
     .. attribute:: objects
 
-       A list containing all :class:`sge.dsp.Object` objects in the
-       room.  (Read-only)
+       A list-like sequence containing all :class:`sge.dsp.Object`
+       objects in the room, in the order they were added.  Checking
+       whether or not an object is in it takes constant time.
+       (Read-only)
 
     .. attribute:: object_areas
 
-       A 2-dimensional list of object areas, indexed in the following
+       A 2-dimensional grid of object areas, indexed in the following
        way::
 
            object_areas[x][y]
@@ -1804,6 +1915,12 @@ class Room(object):
        and/or the last column of collision areas may partially reside
        outside of the room.
 
+       In streaming rooms and very large rooms, only the object areas
+       with objects in them are allocated; the columns are then
+       list-like objects which return an empty frozenset for every
+       other object area, and an object area is removed when it is set
+       to an empty set.
+
        .. note::
 
           It is generally easier to use :meth:`get_objects_at` than to
@@ -1827,33 +1944,45 @@ class Room(object):
        Reserved dictionary for internal use by the SGE.  (Read-only)
     """
 
+    @property
+    def alarms(self):
+        return self._alarms
+
+    @alarms.setter
+    def alarms(self, value):
+        self._alarms.clear()
+        self._alarms.update(value)
+
     @property
     def object_area_width(self):
-        return self.__object_area_width
+        return self._object_area_width
 
     @object_area_width.setter
     def object_area_width(self, value):
         if value is None:
             value = sge.game.width
 
-        self.__object_area_width = value
+        self._object_area_width = value
         r_set_object_areas(self)
 
     @property
     def object_area_height(self):
-        return self.__object_area_height
+        return self._object_area_height
 
     @object_area_height.setter
     def object_area_height(self, value):
         if value is None:
             value = sge.game.height
 
-        self.__object_area_height = value
+        self._object_area_height = value
         r_set_object_areas(self)
 
     def __init__(self, objects=(), width=None, height=None, views=None,
                  background=None, background_x=0, background_y=0,
-                 object_area_width=None, object_area_height=None):
+                 object_area_width=None, object_area_height=None,
+                 activation_margin=None, activation_untangible=False,
+                 chunk_width=None, chunk_height=None, chunk_margin=0,
+                 object_area_auto=False):
         """
         Arguments:
 
@@ -1880,13 +2009,25 @@ class Room(object):
         if object_area_height is None:
             object_area_height = sge.game.height
 
-        self.__object_area_width = object_area_width
-        self.__object_area_height = object_area_height
+        self._object_area_width = object_area_width
+        self._object_area_height = object_area_height
         self.background_x = background_x
         self.background_y = background_y
-        self.alarms = {}
-        self.rd["new_objects"] = []
+        self.activation_margin = activation_margin
+        self.activation_untangible = activation_untangible
+        self.chunk_width = chunk_width
+        self.chunk_height = (chunk_height if chunk_height is not None
+                             else chunk_width)
+        self.chunk_margin = chunk_margin
+        self.object_area_auto = object_area_auto
+        self._alarms = r._Alarms(self)
+        self.rd["new_objects"] = r._ObjectList()
+        self.rd["asleep"] = {}
         self.rd["projections"] = []
+        self.rd["chunks"] = {}
+        self.rd["chunk_sprites"] = {}
+        self.rd["loaded_chunks"] = None
+        self.rd["area_tune_timer"] = 0
 
         if views is not None:
             self.views = list(views)
@@ -1899,8 +2040,9 @@ class Room(object):
             self.background = gfx.Background([], gfx.Color("black"))
 
         self.rd["started"] = False
+        self.rd["class_areas"] = {}
 
-        self.objects = []
+        self.objects = r._ObjectList()
         r_set_object_areas(self)
 
         self.add(sge.game.mouse)
@@ -1933,11 +2075,12 @@ class Room(object):
 
             if self is sge.game.current_room and self.rd["started"]:
                 obj.event_create()
-                obj.rd["object_areas"] = set()
+                obj._object_areas = set()
                 o_update_object_areas(obj)
                 o_update_collision_lists(obj)
                 if obj.active:
                     r._active_objects.add(obj)
+                    obj.alarms.resume()
             else:
                 self.rd["new_objects"].append(obj)
 
@@ -1960,16 +2103,20 @@ class Room(object):
                for obj in self.objects[:]:
                    self.remove(obj)
         """
-        while obj in self.objects:
-            self.objects.remove(obj)
+        self.objects.discard(obj)
+        self.rd["new_objects"].discard(obj)
 
-        while obj in self.rd["new_objects"]:
-            self.rd["new_objects"].remove(obj)
+        if obj in self.rd["asleep"]:
+            r_wake_object(self, obj)
+            if obj not in sge.game.current_room.objects:
+                r._active_objects.discard(obj)
+                obj.alarms.suspend()
 
         if self is sge.game.current_room:
             o_update_object_areas(obj)
             o_update_collision_lists(obj)
             r._active_objects.discard(obj)
+            obj.alarms.suspend()
             obj.event_destroy()
 
     def start(self, transition=None, transition_time=1500,
@@ -1997,6 +2144,8 @@ class Room(object):
           - ``"wipe_matrix"``
           - ``"iris_in"``
           - ``"iris_out"``
+          - Any name registered with
+            :meth:`sge.dsp.Room.register_transition`
 
           If an unsupported value is given, default to :const:`None`.
 
@@ -2016,31 +2165,46 @@ class Room(object):
             ``y`` is the vertical location relative to the window.
             Default is the center of the window.
         """
-        transitions = {
-            "fade": r_update_fade, "dissolve": r_update_dissolve,
-            "pixelate": r_update_pixelate, "wipe_left": r_update_wipe_left,
-            "wipe_right": r_update_wipe_right, "wipe_up": r_update_wipe_up,
-            "wipe_down": r_update_wipe_down,
-            "wipe_upleft": r_update_wipe_upleft,
-            "wipe_upright": r_update_wipe_upright,
-            "wipe_downleft": r_update_wipe_downleft,
-            "wipe_downright": r_update_wipe_downright,
-            "wipe_matrix": r_update_wipe_matrix,
-            "iris_in": r_update_iris_in, "iris_out": r_update_iris_out}
-
-        if transition in transitions and transition_time > 0:
-            self.rd["t_update"] = transitions[transition]
-            self.rd["t_sprite"] = gfx.Sprite.from_screenshot()
-            self.rd["t_duration"] = transition_time
-            self.rd["t_arg"] = transition_arg
-            self.rd["t_time_passed"] = 0
-            self.rd["t_complete_last"] = 0
-            self.rd["t_matrix_remaining"] = None
-        else:
-            self.rd["t_update"] = None
-
+        r_start_transition(self, transition, transition_time,
+                           transition_arg)
         r.game_new_room = self
 
+    @staticmethod
+    def register_transition(name, function):
+        """
+        Register a custom transition which can then be used by
+        :meth:`sge.dsp.Room.start`.
+
+        Arguments:
+
+        - ``name`` -- The name to use for the transition.  If a
+          transition with this name already exists, including one of
+          the built-in transitions, it is replaced.
+        - ``function`` -- The function to call once each frame while
+          the transition is in progress.  It is called with the
+          following arguments:
+
+          - ``source`` -- A :class:`sge.gfx.Sprite` containing the
+            screenshot the transition started from.  This should not be
+            modified.
+          - ``dest`` -- A :class:`sge.gfx.Sprite` which is projected
+            onto the window over the new room after ``function``
+            returns.  It starts out as a copy of ``source`` and is not
+            cleared between frames, so incremental effects only need to
+            draw what changed since the last frame.
+          - ``complete`` -- How complete the transition is as a float
+            from ``0`` to ``1``.
+          - ``previous`` -- The value of ``complete`` from the previous
+            frame, or ``0`` if this is the first frame.
+          - ``arg`` -- The ``transition_arg`` passed to
+            :meth:`sge.dsp.Room.start`.
+
+        Both sprites are the size of the game and are reused for all
+        transitions, so ``function`` should draw on them rather than
+        creating new full-screen sprites.
+        """
+        r.room_transitions[name] = function
+
     def get_objects_at(self, x, y, width, height):
         """
         Return a set of objects near a particular area.
@@ -2063,15 +2227,247 @@ class Room(object):
            check the object manually, or use
            :func:`sge.collision.rectangle` instead.
         """
-        area = set()
-        for a in r_get_rectangle_object_areas(self, x, y, width, height):
-            if a is None:
-                area |= self.object_area_void
-            else:
-                area |= self.object_areas[a[0]][a[1]]
+        return set(r_iter_objects_at(self, x, y, width, height))
+
+    def query_rectangle(self, x, y, width, height, other=None,
+                        tangible=None):
+        """
+        Return an iterator of objects whose bounding boxes overlap a
+        rectangle.
+
+        Arguments:
+
+        - ``x`` -- The horizontal location relative to the room of the
+          left edge of the rectangle.
+        - ``y`` -- The vertical location relative to the room of the
+          top edge of the rectangle.
+        - ``width`` -- The width of the rectangle in pixels.
+        - ``height`` -- The height of the rectangle in pixels.
+        - ``other`` -- What to look for.  See the documentation for
+          :meth:`sge.dsp.Object.collision` for more information.  If
+          this is a class passed to :meth:`add_class_index`, only that
+          class's object areas are searched.
+        - ``tangible`` -- If set to :const:`True` or :const:`False`,
+          only objects whose :attr:`sge.dsp.Object.tangible` attribute
+          is the same as this are found.  If set to :const:`None`,
+          objects are found regardless of tangibility.
+
+        Unlike :meth:`get_objects_at`, this method only finds objects
+        actually within the area, and it goes through the object areas
+        directly rather than building a set, so it is much faster when
+        used very frequently.  Each object is found only once.
+
+        .. note::
 
-        return area
-            
+           Only bounding boxes are checked; neither precise collision
+           detection nor ellipse collision detection is used.
+        """
+        x2 = x + width
+        y2 = y + height
+        for obj in r_iter_objects_at(self, x, y, width, height, other):
+            if ((tangible is None or obj.tangible == tangible) and
+                    o_is_other(obj, other) and obj.bbox_left < x2 and
+                    obj.bbox_right > x and obj.bbox_top < y2 and
+                    obj.bbox_bottom > y):
+                yield obj
+
+    def query_circle(self, x, y, radius, other=None, tangible=None):
+        """
+        Return an iterator of objects whose bounding boxes overlap a
+        circle.
+
+        Arguments:
+
+        - ``x`` -- The horizontal location relative to the room of the
+          center of the circle.
+        - ``y`` -- The vertical location relative to the room of the
+          center of the circle.
+        - ``radius`` -- The radius of the circle.
+
+        See the documentation for :meth:`query_rectangle` for more
+        information.
+        """
+        diameter = radius * 2
+        r2 = radius ** 2
+        for obj in r_iter_objects_at(self, x - radius, y - radius, diameter,
+                                     diameter, other):
+            if ((tangible is None or obj.tangible == tangible) and
+                    o_is_other(obj, other)):
+                dx = max(obj.bbox_left - x, 0, x - obj.bbox_right)
+                dy = max(obj.bbox_top - y, 0, y - obj.bbox_bottom)
+                if dx ** 2 + dy ** 2 <= r2:
+                    yield obj
+
+    def query_point(self, x, y, other=None, tangible=None):
+        """
+        Return an iterator of objects whose bounding boxes contain a
+        point.
+
+        Arguments:
+
+        - ``x`` -- The horizontal location relative to the room of the
+          point.
+        - ``y`` -- The vertical location relative to the room of the
+          point.
+
+        See the documentation for :meth:`query_rectangle` for more
+        information.
+        """
+        for obj in r_iter_objects_at(self, x, y, 0, 0, other):
+            if ((tangible is None or obj.tangible == tangible) and
+                    o_is_other(obj, other) and
+                    obj.bbox_left <= x < obj.bbox_right and
+                    obj.bbox_top <= y < obj.bbox_bottom):
+                yield obj
+
+    def query_nearest(self, x, y, k=1, radius=None, other=None,
+                      tangible=None):
+        """
+        Return a list of the objects nearest to a point, sorted from
+        nearest to farthest.
+
+        Arguments:
+
+        - ``x`` -- The horizontal location relative to the room of the
+          point.
+        - ``y`` -- The vertical location relative to the room of the
+          point.
+        - ``k`` -- The maximum number of objects to return.
+        - ``radius`` -- If set to a number, objects farther away than
+          this are not returned.  If set to :const:`None`, there is no
+          limit to the distance.
+
+        The distance of an object is the distance from the point to the
+        nearest edge of its bounding box, or ``0`` if the point is
+        within its bounding box.  The object areas are searched in
+        order of distance from the point, and the search stops as soon
+        as no closer objects can be found, so this is efficient even in
+        very large rooms as long as ``radius`` is set or the objects
+        being looked for are not very sparse.
+
+        See the documentation for :meth:`query_rectangle` for more
+        information.
+        """
+        if k < 1:
+            return []
+
+        return r_get_nearest_objects(self, x, y, k, radius, other, tangible)
+
+    def add_class_index(self, cls):
+        """
+        Index the objects of a class separately.
+
+        Arguments:
+
+        - ``cls`` -- The class to index.  Objects which are instances of
+          subclasses of this class are also indexed.
+
+        When ``cls`` is passed as the ``other`` argument of
+        :meth:`query_rectangle`, :meth:`query_circle`,
+        :meth:`query_point`, or :meth:`query_nearest`, only objects of
+        this class are searched, rather than searching all objects and
+        discarding those of other classes.  This makes queries for rare
+        classes among many objects much faster, at the cost of making
+        the movement of objects of this class slightly slower.
+        """
+        if cls not in self.rd["class_areas"]:
+            self.rd["class_areas"][cls] = None
+            r_set_object_areas(self)
+
+    def remove_class_index(self, cls):
+        """
+        Stop indexing the objects of a class separately.
+
+        Arguments:
+
+        - ``cls`` -- The class to stop indexing.
+
+        See the documentation for :meth:`add_class_index` for more
+        information.
+        """
+        self.rd["class_areas"].pop(cls, None)
+
+    def get_object_area_stats(self):
+        """
+        Return a dictionary of statistics about how objects are
+        distributed among the room's object areas, which can be used to
+        choose :attr:`object_area_width` and :attr:`object_area_height`.
+
+        The dictionary has the following keys:
+
+        - ``"objects"`` -- The number of objects in the object areas.
+        - ``"void"`` -- How many of those are partly or entirely in
+          :attr:`object_area_void`.
+        - ``"cells"`` -- The number of object areas with objects in
+          them.
+        - ``"objects_per_cell"`` -- The average number of objects in
+          each of those object areas.  If this is high, the object
+          areas may be too large.
+        - ``"cells_per_object"`` -- The average number of object areas
+          (not counting the void) each object is in.  If this is high,
+          the object areas may be too small.
+        - ``"queries"`` -- The number of times objects have been looked
+          up by area, e.g. by :meth:`get_objects_at` or
+          :meth:`query_rectangle`, since the object areas were last
+          rebuilt.
+        - ``"candidates_per_query"`` -- The average number of objects
+          those lookups had to look through.
+
+        Objects are only put in object areas while the room is the
+        current room, so all of the counts of objects are 0 for other
+        rooms.
+        """
+        return r_get_object_area_stats(self)
+
+    def get_snapshot(self):
+        """
+        Return a snapshot of the state of the room, which can later be
+        restored with :meth:`restore_snapshot`.
+
+        The snapshot records each object's class, position, movement,
+        image and collision attributes, and alarms, plus whatever is
+        returned by its :meth:`sge.dsp.Object.get_snapshot_state`
+        method; it also records the room's alarms, the positions of its
+        views, and the position of its background.  Sprites are
+        recorded by name rather than by their images.  The snapshot is
+        made of built-in types only, so as long as all of the objects'
+        states can be pickled, so can the snapshot, e.g. to save it to
+        a file.  For streaming rooms, the objects stored for unloaded
+        chunks are included as well.
+
+        :attr:`sge.game.mouse` is not included in the snapshot.
+        """
+        return r_get_snapshot(self)
+
+    def restore_snapshot(self, snapshot, sprites=None):
+        """
+        Put the room back into the state recorded in a snapshot.
+
+        Arguments:
+
+        - ``snapshot`` -- The snapshot to restore, as returned by
+          :meth:`get_snapshot`.
+        - ``sprites`` -- A dictionary mapping sprite names to the
+          sprites to use for them.  Sprites not found in this dictionary
+          are looked up among the sprites recorded by
+          :meth:`get_snapshot` during this session.  If set to
+          :const:`None`, only the latter is done.
+
+        All objects in the room other than :attr:`sge.game.mouse` are
+        replaced with the objects in the snapshot.  Objects which were
+        recorded during this session and still exist are reused, so
+        references to them stay valid; other objects are created
+        without calling their constructor methods.  Either way, the
+        attributes recorded in the snapshot are set as if by
+        :meth:`sge.dsp.Object.__init__`, and then
+        :meth:`sge.dsp.Object.set_snapshot_state` is called, which must
+        restore anything else the class needs.  No events are called.
+
+        If a sprite or class in the snapshot can't be found, the room
+        is left unchanged and an exception is raised (:exc:`ValueError`
+        for a missing sprite).
+        """
+        r_restore_snapshot(self, snapshot, sprites)
 
     def project_dot(self, x, y, z, color, blend_mode=None):
         """
@@ -2319,6 +2715,35 @@ class Room(object):
         """
         pass
 
+    def event_chunk_load(self, chunk_x, chunk_y):
+        """
+        Called when a chunk of a streaming room is loaded, after its
+        stored objects have been put back into the room.
+
+        Arguments:
+
+        - ``chunk_x`` -- The horizontal index of the chunk, i.e. the
+          horizontal location of its left edge divided by
+          :attr:`chunk_width`.
+        - ``chunk_y`` -- The vertical index of the chunk, i.e. the
+          vertical location of its top edge divided by
+          :attr:`chunk_height`.
+
+        See the documentation for :attr:`chunk_width` for more
+        information.
+        """
+        pass
+
+    def event_chunk_unload(self, chunk_x, chunk_y):
+        """
+        Called when a chunk of a streaming room is about to be unloaded,
+        before its objects are stored.
+
+        See the documentation for :meth:`event_chunk_load` for more
+        information.
+        """
+        pass
+
     def event_key_press(self, key, char):
         """
         See the documentation for :class:`sge.input.KeyPress` for more
@@ -2692,6 +3117,118 @@ class View(object):
         self.hport = hport
 
 
+class SnapshotBuffer(object):
+
+    """
+    This class stores a limited number of room snapshots in memory, for
+    quick saves, undo, and rollback.  When the buffer is full, saving
+    another snapshot discards the oldest one.
+
+    Each snapshot is stored with a key, usually the number of the frame
+    it was taken on, so that a specific earlier state can be returned
+    to, e.g. when a delayed input is received from another player.
+
+    See the documentation for :meth:`sge.dsp.Room.get_snapshot` for
+    more information.
+
+    .. attribute:: size
+
+       The maximum number of snapshots stored.  (Read-only)
+    """
+
+    @property
+    def size(self):
+        return self.__snapshots.maxlen
+
+    def __init__(self, size=60):
+        """
+        Arguments set the respective initial attributes of the buffer.
+        See the documentation for :class:`sge.dsp.SnapshotBuffer` for
+        more information.
+        """
+        self.__snapshots = collections.deque(maxlen=size)
+
+    def __len__(self):
+        return len(self.__snapshots)
+
+    def save(self, room, key=None):
+        """
+        Take a snapshot of a room, store it, and return it.
+
+        Arguments:
+
+        - ``room`` -- The room to take a snapshot of.
+        - ``key`` -- The key to store the snapshot with.  Saving a
+          snapshot with the same key as an existing one replaces it,
+          unless the key is :const:`None`.
+        """
+        snapshot = room.get_snapshot()
+        if key is not None:
+            self.discard(key)
+        self.__snapshots.append((key, snapshot))
+        return snapshot
+
+    def get(self, key=None):
+        """
+        Return the snapshot stored with a key, or :const:`None` if there
+        is no such snapshot.
+
+        Arguments:
+
+        - ``key`` -- The key of the snapshot.  If set to :const:`None`,
+          the most recent snapshot is returned instead.
+        """
+        if key is None:
+            return self.__snapshots[-1][1] if self.__snapshots else None
+
+        for k, snapshot in reversed(self.__snapshots):
+            if k == key:
+                return snapshot
+
+        return None
+
+    def restore(self, room, key=None):
+        """
+        Restore a stored snapshot to a room, and discard all snapshots
+        saved after it.  Return whether or not the snapshot was found.
+
+        Arguments:
+
+        - ``room`` -- The room to restore the snapshot to.
+        - ``key`` -- The key of the snapshot to restore.  If set to
+          :const:`None`, the most recent snapshot is restored.
+
+        See the documentation for :meth:`sge.dsp.Room.restore_snapshot`
+        for more information.
+        """
+        snapshot = self.get(key)
+        if snapshot is None:
+            return False
+
+        room.restore_snapshot(snapshot)
+        if key is not None:
+            while self.__snapshots[-1][0] != key:
+                self.__snapshots.pop()
+        return True
+
+    def discard(self, key):
+        """
+        Remove the snapshot stored with a key, if there is one.
+
+        Arguments:
+
+        - ``key`` -- The key of the snapshot to remove.
+        """
+        for i, (k, snapshot) in enumerate(self.__snapshots):
+            if k == key:
+                del self.__snapshots[i]
+                break
+
+    def clear(self):
+        """Remove all snapshots."""
+        self.__snapshots.clear()
+
+
 class Object(object):
 
     """
@@ -2776,6 +3313,16 @@ class Object(object):
           value.  This is because checking for collisions which can't be
           detected is meaningless.
 
+    .. attribute:: streamed
+
+       Whether or not the object is unloaded along with its chunk when
+       it is in a streaming room.  Set this to :const:`False` for
+       objects which must always stay in the room, such as objects
+       which control the game.  Unlike most attributes, this can be set
+       on the class as well as on individual objects, and is not
+       recorded in snapshots.  See the documentation for
+       :attr:`sge.dsp.Room.chunk_width` for more information.
+
     .. attribute:: bbox_x
 
        The horizontal location of the bounding box relative to the
@@ -2823,6 +3370,21 @@ class Object(object):
        be used.  Note that this can be inefficient and does not work
        well with animated sprites.
 
+    .. attribute:: collision_continuous
+
+       Whether or not continuous collision detection should be used.
+       If this is :const:`True` and :attr:`checks_collisions` is
+       :const:`True`, the path the bounding box took from
+       :attr:`xprevious` and :attr:`yprevious` to the current position
+       is checked each frame, and :meth:`event_continuous_collision` is
+       called for the first object it touched along the way.  This
+       allows fast-moving objects to detect collisions with objects
+       they would otherwise pass straight through.
+
+       Only bounding boxes are used for continuous collision detection,
+       and other objects are treated as if they had been at their
+       current positions for the whole frame.
+
     .. attribute:: bbox_left
 
        The position of the left side of the bounding box in the room
@@ -2998,11 +3560,11 @@ class Object(object):
 
     .. attribute:: alarms
 
-       A dictionary containing the alarms of the object.  Each value
-       decreases by 1 each frame (adjusted for delta timing if it is
-       enabled).  When a value is at or below 0, :meth:`event_alarm` is
-       executed with ``alarm_id`` set to the respective key, and the
-       item is deleted from this dictionary.
+       A dictionary-like object containing the alarms of the object.
+       Each value decreases by 1 each frame (adjusted for delta timing
+       if it is enabled).  When a value is at or below 0,
+       :meth:`event_alarm` is executed with ``alarm_id`` set to the
+       respective key, and the item is deleted from this dictionary.
 
     .. attribute:: image_width
 
@@ -3055,6 +3617,34 @@ class Object(object):
        Reserved dictionary for internal use by the SGE.  (Read-only)
     """
 
+    # Engine-owned state is kept in slots rather than in the instance
+    # dictionary to reduce the memory used by each object.  ``__dict__``
+    # is included so that subclasses can still add any attributes they
+    # need; it is only created once such an attribute is set.
+    __slots__ = (
+        "__dict__", "__weakref__", "rd", "alive", "__x", "__y", "z",
+        "__active", "__checks_collisions", "regulate_origin",
+        "collision_ellipse", "collision_precise", "collision_continuous",
+        "xacceleration",
+        "yacceleration", "xdeceleration", "ydeceleration", "__image_origin_x",
+        "__image_origin_y", "__fps", "image_xscale", "image_yscale",
+        "image_rotation", "image_alpha", "__image_blend", "image_blend_mode",
+        "_alarms", "xstart", "ystart", "xprevious", "yprevious", "visible",
+        "__bbox_x", "__bbox_y", "__bbox_width", "__bbox_height", "_sprite",
+        "_tangible", "_xv", "_yv", "_speed", "_mv_dir", "_image_index",
+        "_anim_count", "_frame_time", "_object_areas", "_colliders")
+
+    streamed = True
+
+    @property
+    def alarms(self):
+        return self._alarms
+
+    @alarms.setter
+    def alarms(self, value):
+        self._alarms.clear()
+        self._alarms.update(value)
+
     @property
     def x(self):
         return self.__x
@@ -3077,12 +3667,12 @@ class Object(object):
 
     @property
     def sprite(self):
-        return self.rd["sprite"]
+        return self._sprite
 
     @sprite.setter
     def sprite(self, value):
-        if self.rd["sprite"] != value:
-            self.rd["sprite"] = value
+        if self._sprite != value:
+            self._sprite = value
             if value is not None:
                 self.image_index %= value.frames
             o_update_object_areas(self)
@@ -3093,12 +3683,20 @@ class Object(object):
 
     @active.setter
     def active(self, value):
+        room = sge.game.current_room
+        if room is not None and self in room.rd["asleep"]:
+            # The SGE stops managing a sleeping object once anything
+            # else changes whether or not it is active.
+            self.tangible = room.rd["asleep"].pop(self)
+
         if self.__active != value:
             self.__active = value
             if value:
                 r._active_objects.add(self)
+                self._alarms.resume()
             else:
                 r._active_objects.discard(self)
+                self._alarms.suspend()
 
     @property
     def checks_collisions(self):
@@ -3112,12 +3710,12 @@ class Object(object):
 
     @property
     def tangible(self):
-        return self.rd["tangible"]
+        return self._tangible
 
     @tangible.setter
     def tangible(self, value):
-        if self.rd["tangible"] != value:
-            self.rd["tangible"] = value
+        if self._tangible != value:
+            self._tangible = value
             o_update_collision_lists(self)
 
     @property
@@ -3218,69 +3816,60 @@ class Object(object):
 
     @property
     def xvelocity(self):
-        return self.rd["xv"]
+        return self._xv
 
     @xvelocity.setter
     def xvelocity(self, value):
-        if self.rd["xv"] != value:
-            self.rd["xv"] = value
+        if self._xv != value:
+            self._xv = value
             o_set_speed(self)
 
     @property
     def yvelocity(self):
-        return self.rd["yv"]
+        return self._yv
 
     @yvelocity.setter
     def yvelocity(self, value):
-        if self.rd["yv"] != value:
-            self.rd["yv"] = value
+        if self._yv != value:
+            self._yv = value
             o_set_speed(self)
 
     @property
     def speed(self):
-        return self.rd["speed"]
+        return self._speed
 
     @speed.setter
     def speed(self, value):
-        if self.rd["speed"] != value:
-            self.rd["speed"] = value
-            self.rd["xv"] = math.cos(math.radians(self.rd["mv_dir"])) * value
-            self.rd["yv"] = math.sin(math.radians(self.rd["mv_dir"])) * value
+        if self._speed != value:
+            self._speed = value
+            self._xv = math.cos(math.radians(self._mv_dir)) * value
+            self._yv = math.sin(math.radians(self._mv_dir)) * value
 
     @property
     def move_direction(self):
-        return self.rd["mv_dir"]
+        return self._mv_dir
 
     @move_direction.setter
     def move_direction(self, value):
-        if self.rd["mv_dir"] != value:
-            self.rd["mv_dir"] = value
-            self.rd["xv"] = math.cos(math.radians(value)) * self.rd["speed"]
-            self.rd["yv"] = math.sin(math.radians(value)) * self.rd["speed"]
+        if self._mv_dir != value:
+            self._mv_dir = value
+            self._xv = math.cos(math.radians(value)) * self._speed
+            self._yv = math.sin(math.radians(value)) * self._speed
 
     @property
     def image_index(self):
-        return self.rd["image_index"]
+        return self._image_index
 
     @image_index.setter
     def image_index(self, value):
-        if value != self.rd["image_index"]:
-            self.rd["image_index"] = value
-            self.rd["anim_count"] = 0
+        if value != self._image_index:
+            self._image_index = value
+            self._anim_count = 0
 
     @property
     def image_origin_x(self):
         if self.regulate_origin and self.sprite is not None:
-            id_ = (self.sprite.width, self.sprite.height, self.sprite.origin_x,
-                   self.sprite.origin_y, self.image_xscale, self.image_yscale,
-                   self.image_rotation)
-
-            if id_ not in self.__origins_x:
-                x_offset, y_offset = o_get_origin_offset(self)
-                self.__origins_x[id_] = self.sprite.origin_x + x_offset
-                self.__origins_y[id_] = self.sprite.origin_y + y_offset
-
-            self.__image_origin_x = self.__origins_x[id_]
+            self.__image_origin_x = o_get_regulated_origin(self)[0]
 
         if self.__image_origin_x is None:
             return self.sprite.origin_x if self.sprite is not None else 0
@@ -3294,16 +3883,7 @@ class Object(object):
     @property
     def image_origin_y(self):
         if self.regulate_origin and self.sprite is not None:
-            id_ = (self.sprite.width, self.sprite.height, self.sprite.origin_x,
-                   self.sprite.origin_y, self.image_xscale, self.image_yscale,
-                   self.image_rotation)
-
-            if id_ not in self.__origins_y:
-                x_offset, y_offset = o_get_origin_offset(self)
-                self.__origins_x[id_] = self.sprite.origin_x + x_offset
-                self.__origins_y[id_] = self.sprite.origin_y + y_offset
-
-            self.__image_origin_y = self.__origins_y[id_]
+            self.__image_origin_y = o_get_regulated_origin(self)[1]
 
         if self.__image_origin_y is None:
             return self.sprite.origin_y if self.sprite is not None else 0
@@ -3325,17 +3905,17 @@ class Object(object):
 
         self.__fps = value
         if value and isinstance(self.sprite, sge.gfx.Sprite):
-            self.rd["frame_time"] = 1000 / value
-            if not self.rd["frame_time"]:
+            self._frame_time = 1000 / value
+            if not self._frame_time:
                 # This would be caused by a round-off to 0 resulting
                 # from a much too high frame rate.  It would cause a
                 # division by 0 later, so this is meant to prevent that.
-                self.rd["frame_time"] = 0.000001
+                self._frame_time = 0.000001
                 w = "Could not calculate timing for {:.2e} FPS.".format(
                     value)
                 warnings.warn(w)
         else:
-            self.rd["frame_time"] = None
+            self._frame_time = None
 
     @property
     def image_speed(self):
@@ -3510,7 +4090,8 @@ class Object(object):
                  ydeceleration=0, image_index=0, image_origin_x=None,
                  image_origin_y=None, image_fps=None, image_xscale=1,
                  image_yscale=1, image_rotation=0, image_alpha=255,
-                 image_blend=None, image_blend_mode=None):
+                 image_blend=None, image_blend_mode=None,
+                 collision_continuous=False):
         """
         Arugments set the respective initial attributes of the object.
         See the documentation for :class:`sge.dsp.Object` for more
@@ -3522,19 +4103,20 @@ class Object(object):
         self.z = z
         self.__active = active
         self.__checks_collisions = checks_collisions
-        self.rd["tangible"] = tangible
+        self._tangible = tangible
         self.regulate_origin = regulate_origin
         self.collision_ellipse = collision_ellipse
         self.collision_precise = collision_precise
-        self.rd["xv"] = xvelocity
-        self.rd["yv"] = yvelocity
-        self.rd["mv_dir"] = 0
-        self.rd["speed"] = 0
+        self.collision_continuous = collision_continuous
+        self._xv = xvelocity
+        self._yv = yvelocity
+        self._mv_dir = 0
+        self._speed = 0
         self.xacceleration = xacceleration
         self.yacceleration = yacceleration
         self.xdeceleration = xdeceleration
         self.ydeceleration = ydeceleration
-        self.rd["image_index"] = None
+        self._image_index = None
         self.image_index = image_index
         self.image_origin_x = image_origin_x
         self.image_origin_y = image_origin_y
@@ -3544,19 +4126,16 @@ class Object(object):
         self.image_alpha = image_alpha
         self.image_blend = image_blend
         self.image_blend_mode = image_blend_mode
-        self.alarms = {}
+        self._alarms = r._Alarms(self, is_object=True)
         self.xstart = x
         self.ystart = y
         self.xprevious = x
         self.yprevious = y
-        self.rd["anim_count"] = 0
-        self.__origins_x = {}
-        self.__origins_y = {}
-        self.rd["object_areas"] = set()
-        self.rd["colliders"] = []
-        self.__masks = {}
-
-        self.rd["sprite"] = sprite
+        self._anim_count = 0
+        self._object_areas = set()
+        self._colliders = []
+
+        self._sprite = sprite
         if sprite is not None:
             self.image_index %= sprite.frames
             sprite_bbox_x = self.sprite.bbox_x
@@ -3661,11 +4240,21 @@ class Object(object):
                 w = self.bbox_width
                 h = self.bbox_height
 
-            others = room.get_objects_at(ax, ay, w, h)
+            if isinstance(other, Object):
+                # Checking one object is faster than searching the
+                # object areas for it.
+                others = (other,) if other in room.objects else ()
+            else:
+                others = r_iter_objects_at(room, ax, ay, w, h, other)
 
             for obj in others:
                 if obj is not self and obj.tangible and o_is_other(obj, other):
-                    if (self.collision_precise or self.collision_ellipse or
+                    touching = o_get_touching_tiles(self, obj, x, y)
+                    if touching is not None:
+                        # Tile grids only collide where tiles are solid.
+                        if touching[1]:
+                            collisions.append(obj)
+                    elif (self.collision_precise or self.collision_ellipse or
                             obj.collision_precise or obj.collision_ellipse):
                         # Use masks.
                         if sge.collision.masks_collide(
@@ -3692,6 +4281,60 @@ class Object(object):
         """
         sge.game.current_room.remove(self)
 
+    def recycle(self):
+        """
+        Remove the object from the current room and keep it so that it
+        can be reused by :meth:`spawn`.  Recycling objects which are
+        created and destroyed often, such as bullets, instead of
+        destroying them avoids the cost of creating new objects.
+
+        The object should not be used after it is recycled unless it is
+        reused by :meth:`spawn`.  See also :meth:`clear_pool`.
+        """
+        sge.game.current_room.remove(self)
+        pool = r._object_pools.setdefault(self.__class__, r._ObjectList())
+        pool.append(self)
+
+    def reset(self, *args, **kwargs):
+        """
+        Prepare the object to be reused by :meth:`spawn`.  ``args`` and
+        ``kwargs`` are the arguments that were passed to :meth:`spawn`.
+
+        By default, this calls the constructor method again with the
+        same arguments, which puts the object in the same state as a
+        newly created object.  Classes which are spawned very often can
+        override this to only reset what actually needs to be reset.
+        """
+        self.__init__(*args, **kwargs)
+
+    def get_snapshot_state(self):
+        """
+        Return the state of the object which
+        :meth:`sge.dsp.Room.get_snapshot` should record in addition to
+        the attributes it records itself, e.g. attributes added by a
+        subclass.  The returned value is passed to
+        :meth:`set_snapshot_state` when the snapshot is restored.  It
+        should not be changed afterwards, so if it is mutable, return a
+        copy.
+
+        By default, this returns :const:`None`.
+        """
+        return None
+
+    def set_snapshot_state(self, state):
+        """
+        Restore the state returned by :meth:`get_snapshot_state` when a
+        room snapshot is restored.
+
+        Arguments:
+
+        - ``state`` -- The value :meth:`get_snapshot_state` returned
+          when the snapshot was taken.
+
+        By default, this does nothing.
+        """
+        pass
+
     def event_create(self):
         """
         Called in the following cases:
@@ -3910,6 +4553,65 @@ class Object(object):
         """
         pass
 
+    def event_continuous_collision(self, other, time, xnormal, ynormal):
+        """
+        Called when this object, while using continuous collision
+        detection, touches another object during its movement.  See the
+        documentation for :attr:`collision_continuous` for more
+        information.
+
+        Arguments:
+
+        - ``other`` -- The other object which was collided with.
+        - ``time`` -- How far along its movement this frame the object
+          was when it touched ``other``, from ``0`` (at
+          :attr:`xprevious` and :attr:`yprevious`) to ``1`` (at the
+          current position).
+        - ``xnormal`` -- The horizontal direction the side of ``other``
+          which was touched faces.  Can be ``-1`` (left), ``1``
+          (right), or ``0``.
+        - ``ynormal`` -- The vertical direction the side of ``other``
+          which was touched faces.  Can be ``-1`` (up), ``1`` (down),
+          or ``0``.
+
+        This is called after :meth:`event_collision`.  If this object
+        is not touching ``other`` at the end of its movement, i.e. it
+        passed all the way through ``other``, :meth:`event_collision`
+        is called for both objects before this event just as if they
+        had collided normally, so games which only need to know that the
+        collision happened can just use :meth:`event_collision`.  If
+        ``other`` uses a :class:`sge.gfx.TileGrid` with solid tiles,
+        only its solid tiles are touched, and :meth:`event_tile_collision`
+        is called for the tile touched instead of :meth:`event_collision`.
+        """
+        pass
+
+    def event_tile_collision(self, other, tile, xdirection, ydirection):
+        """
+        Called when this object collides with a solid tile of a
+        :class:`sge.gfx.TileGrid` instead of :meth:`event_collision`.
+        See the documentation for :attr:`sge.gfx.TileGrid.solid` for
+        more information.
+
+        Arguments:
+
+        - ``other`` -- The other object involved in the collision.  If
+          this object uses the tile grid as its sprite, this is the
+          object which touched the tile; otherwise, this is the object
+          using the tile grid.
+        - ``tile`` -- The index of the tile in
+          :attr:`sge.gfx.TileGrid.tiles`.
+        - ``xdirection`` -- The horizontal direction of the collision
+          with the tile from the perspective of this object.
+        - ``ydirection`` -- The vertical direction of the collision with
+          the tile from the perspective of this object.
+
+        This is called once for each solid tile touched.  By default,
+        this calls :meth:`event_collision`, so the collision is
+        reported as a collision with ``other`` once per tile.
+        """
+        self.event_collision(other, xdirection, ydirection)
+
     def event_paused_step(self, time_passed, delta_mult):
         """
         See the documentation for :meth:`sge.dsp.Game.event_step` for
@@ -4012,6 +4714,34 @@ class Object(object):
         sge.game.current_room.add(obj)
         return obj
 
+    @classmethod
+    def spawn(cls, *args, **kwargs):
+        """
+        Add an object of this class to the current room, reusing an
+        object which was recycled with :meth:`recycle` if possible.
+
+        If there is a recycled object of this class, :meth:`reset` is
+        called for it with ``args`` and ``kwargs`` as arguments before
+        it is added to the room.  Otherwise, this method does the same
+        thing as :meth:`create`.  The object is returned either way.
+        """
+        pool = r._object_pools.get(cls)
+        if pool:
+            obj = pool.pop()
+            obj.reset(*args, **kwargs)
+            sge.game.current_room.add(obj)
+            return obj
+        else:
+            return cls.create(*args, **kwargs)
+
+    @classmethod
+    def clear_pool(cls):
+        """
+        Discard all objects of this class which were recycled with
+        :meth:`recycle` and have not been reused yet.
+        """
+        r._object_pools.pop(cls, None)
+
 
 class Mouse(Object):
 
@@ -4053,11 +4783,11 @@ class Mouse(Object):
 
     @property
     def sprite(self):
-        return self.rd["sprite"]
+        return self._sprite
 
     @sprite.setter
     def sprite(self, value):
-        self.rd["sprite"] = value
+        self._sprite = value
         self.set_cursor()
 
     @property
@@ -4072,13 +4802,13 @@ class Mouse(Object):
     @property
     def tangible(self):
         if self.x != -1 and self.y != -1:
-            return self.rd["tangible"]
+            return self._tangible
         else:
             return False
 
     @tangible.setter
     def tangible(self, value):
-        self.rd["tangible"] = value
+        self._tangible = value
 
     def __init__(self):
         self.__visible = True
@@ -24,6 +24,7 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import collections
 import math
 import os
 import warnings
@@ -31,11 +32,17 @@ import warnings
 import pygame
 import six
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 import sge
 from sge import r
 from sge.r import (_check_color_input, _check_color, _scale, _get_blend_flags,
                    _screen_blend, f_split_text, s_get_image, s_set_size,
-                   s_refresh, s_set_transparency, s_from_text, tg_blit)
+                   s_refresh, s_set_transparency, s_get_rgba_image, s_from_text,
+                   tg_blit)
 
 COLORS = {'white': '#ffffff', 'silver': '#c0c0c0', 'gray': '#808080',
           'black': '#000000', 'red': '#ff0000', 'maroon': '#800000',
@@ -52,6 +59,44 @@ __all__ = ["Color", "Sprite", "TileGrid", "Font", "BackgroundLayer",
            "Background"]
 
 
+class _ColorValue(tuple):
+
+    # Immutable (red, green, blue, alpha) tuple which holds the value of
+    # a Color.  Being a tuple, it is hashable, can be used directly as
+    # part of cache keys, and can be passed to Pygame as is.  Values
+    # are interned by their packed 32-bit form (0xRRGGBBAA), so the
+    # same color is normally represented by the same object.  The
+    # arguments are assumed to be valid.
+
+    __slots__ = ()
+    _interned = {}
+    intern_limit = 65536
+
+    def __new__(cls, red, green, blue, alpha=255):
+        packed = red << 24 | green << 16 | blue << 8 | alpha
+        value = cls._interned.get(packed)
+        if value is None:
+            value = tuple.__new__(cls, (red, green, blue, alpha))
+            if len(cls._interned) < cls.intern_limit:
+                cls._interned[packed] = value
+
+        return value
+
+    @property
+    def packed(self):
+        red, green, blue, alpha = self
+        return red << 24 | green << 16 | blue << 8 | alpha
+
+    def __reduce__(self):
+        return (_ColorValue, tuple(self))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
 class Color(object):
 
     """
@@ -93,6 +138,8 @@ class Color(object):
        An HTML hex string representation of the color.  (Read-only)
     """
 
+    __slots__ = ("_value",)
+
     def __init__(self, value):
         """
         Arguments:
@@ -113,84 +160,90 @@ class Color(object):
             components, and optionally the alpha component, in that
             order.
         """
-        self.alpha = 255
+        alpha = 255
         if isinstance(value, six.string_types):
             value = COLORS.get(value, value)[1:]
             if len(value) == 3:
                 r, g, b = [int(value[i] * 2, 16) for i in six.moves.range(3)]
-                self.red, self.green, self.blue = r, g, b
             elif len(value) == 4:
-                r, g, b, a = [int(value[i] * 2, 16) for i in range(4)]
-                self.red, self.green, self.blue, self.alpha = r, g, b, a
+                r, g, b, alpha = [int(value[i] * 2, 16) for i in range(4)]
             elif len(value) == 6:
                 r, g, b = [int(value[i:(i + 2)], 16)
                            for i in six.moves.range(0, 6, 2)]
-                self.red, self.green, self.blue = r, g, b
             elif len(value) == 8:
-                r, g, b, a = [int(value[i:(i + 2)], 16) for i in range(0, 8, 2)]
-                self.red, self.green, self.blue, self.alpha = r, g, b, a
+                r, g, b, alpha = [int(value[i:(i + 2)], 16)
+                                  for i in range(0, 8, 2)]
             else:
                 raise ValueError("Invalid color string.")
         elif isinstance(value, six.integer_types):
             b, g, r = [(value & 256 ** (i + 1) - 1) // 256 ** i
                        for i in six.moves.range(3)]
-            self.red, self.green, self.blue = r, g, b
         elif isinstance(value, (list, tuple)):
             if len(value) >= 3:
-                self.red, self.green, self.blue = value[:3]
+                r, g, b = value[:3]
                 if len(value) >= 4:
-                    self.alpha = value[3]
+                    alpha = value[3]
             else:
                 raise ValueError("Invalid color tuple.")
         else:
             raise ValueError("Invalid color value.")
 
+        self._value = _ColorValue(
+            _check_color_input(r), _check_color_input(g),
+            _check_color_input(b), _check_color_input(alpha))
+
+    @classmethod
+    def _from_value(cls, value):
+        # Create a color directly from a _ColorValue, skipping parsing
+        # and validation.
+        color = cls.__new__(cls)
+        color._value = value
+        return color
+
     @property
     def red(self):
-        return self._r
+        return self._value[0]
 
     @red.setter
     def red(self, value):
-        self._r = _check_color_input(value)
+        self[0] = value
 
     @property
     def green(self):
-        return self._g
+        return self._value[1]
 
     @green.setter
     def green(self, value):
-        self._g = _check_color_input(value)
+        self[1] = value
 
     @property
     def blue(self):
-        return self._b
+        return self._value[2]
 
     @blue.setter
     def blue(self, value):
-        self._b = _check_color_input(value)
+        self[2] = value
 
     @property
     def alpha(self):
-        return self._a
+        return self._value[3]
 
     @alpha.setter
     def alpha(self, value):
-        self._a = _check_color_input(value)
+        self[3] = value
 
     @property
     def hex_string(self):
-        if self.alpha == 255:
-            r, g, b = [hex(c)[2:].zfill(2) for c in self[:3]]
-            return "#{}{}{}".format(r, g, b)
+        if self._value[3] == 255:
+            return "#{:02x}{:02x}{:02x}".format(*self._value[:3])
         else:
-            r, g, b, a = [hex(c)[2:].zfill(2) for c in self]
-            return "#{}{}{}{}".format(r, g, b, a)
+            return "#{:02x}{:02x}{:02x}{:02x}".format(*self._value)
 
     def __iter__(self):
-        return iter([self.red, self.green, self.blue, self.alpha])
+        return iter(self._value)
 
     def __int__(self):
-        return self.red * 256 ** 2 | self.green * 256 | self.blue
+        return self._value.packed >> 8
 
     def __repr__(self):
         return 'sge.gfx.Color("{}")'.format(str(self))
@@ -199,15 +252,21 @@ class Color(object):
         return COLOR_NAMES.get(self.hex_string, self.hex_string)
 
     def __eq__(self, other):
-        return str(self) == str(other)
+        if isinstance(other, Color):
+            return self._value == other._value
+        else:
+            return str(self) == str(other)
+
+    def __ne__(self, other):
+        return not self == other
 
     def __getitem__(self, index):
-        return tuple(self)[index]
+        return self._value[index]
 
     def __setitem__(self, index, value):
-        c = list(self)
+        c = list(self._value)
         c[index] = value
-        self.red, self.green, self.blue, self.alpha = c
+        self._value = _ColorValue(*[_check_color_input(i) for i in c])
 
 
 class Sprite(object):
@@ -659,8 +718,8 @@ class Sprite(object):
         x = int(round(x))
         y = int(round(y))
         frame %= self.frames
-        pg_color = self.rd["baseimages"][frame].get_at((x, y))
-        return Color(tuple(pg_color))
+        r, g, b, a = self.rd["baseimages"][frame].get_at((x, y))
+        return Color._from_value(_ColorValue(r, g, b, a))
 
     def get_pixels(self, frame=0):
         """
@@ -680,11 +739,122 @@ class Sprite(object):
         surf = self.rd["baseimages"][frame]
         surf.lock()
         w, h = surf.get_size()
-        pixels = [[Color(tuple(surf.get_at(x, y))) for y in six.moves.range(h)]
-                  for x in six.moves.range(w)]
+        get_at = surf.get_at
+        from_value = Color._from_value
+        pixels = [[from_value(_ColorValue(*get_at((x, y))))
+                   for y in six.moves.range(h)] for x in six.moves.range(w)]
         surf.unlock()
         return pixels
 
+    def get_pixel_buffer(self, frame=0):
+        """
+        Return a buffer which directly exposes the pixels of a frame of
+        the sprite.
+
+        The returned buffer is a writable :class:`memoryview` of bytes
+        containing the red, green, blue, and alpha components of each
+        pixel, in that order.  Pixels are stored row by row starting at
+        the top-left corner, so the components of the pixel at
+        ``(x, y)`` start at index ``(y * width + x) * 4``.  Writing to
+        the buffer changes the sprite.
+
+        Arguments:
+
+        - ``frame`` -- The frame of the sprite to get the buffer of,
+          where ``0`` is the first frame.
+
+        .. warning::
+
+           Do not use the sprite in any way while the buffer exists,
+           including drawing on it, drawing it, or projecting it.
+           Delete the buffer as soon as you are done with it.
+        """
+        frame %= self.frames
+        img = s_get_rgba_image(self, frame)
+        s_refresh(self)
+        return memoryview(img.get_view("0"))
+
+    def get_pixel_array(self, frame=0):
+        """
+        Return a NumPy array which directly exposes the pixels of a
+        frame of the sprite.
+
+        The returned array has the shape ``(width, height, 4)`` and is
+        indexed as ``pixels[x, y, c]``, where ``c`` is ``0`` for red,
+        ``1`` for green, ``2`` for blue, and ``3`` for alpha.  It is a
+        view of the sprite's pixels rather than a copy, so modifying
+        the array changes the sprite.
+
+        If NumPy is not available, :exc:`ImportError` is raised.
+
+        See the documentation for :meth:`sge.gfx.Sprite.get_pixel_buffer`
+        for more information.
+        """
+        if numpy is None:
+            raise ImportError("NumPy is required for pixel arrays.")
+
+        pixels = numpy.frombuffer(self.get_pixel_buffer(frame), numpy.uint8)
+        return pixels.reshape((self.height, self.width, 4)).transpose(1, 0, 2)
+
+    def set_pixels(self, pixels, frame=None):
+        """
+        Replace all of the pixels of the sprite.
+
+        Arguments:
+
+        - ``pixels`` -- The new pixels.  Can be one of the following:
+
+          - A two-dimensional list of :class:`sge.gfx.Color` objects
+            indexed in the same way as the list returned by
+            :meth:`get_pixels`.
+          - A bytes-like object in the same format as the buffer
+            returned by :meth:`get_pixel_buffer`.
+          - A NumPy array in the same format as the array returned by
+            :meth:`get_pixel_array`.  The last dimension can also have
+            a size of 3, in which case all pixels are made opaque.
+
+        - ``frame`` -- The frame of the sprite to set the pixels of,
+          where ``0`` is the first frame; set to :const:`None` to set
+          the pixels of all frames.
+        """
+        if frame is None:
+            rng = six.moves.range(self.frames)
+        else:
+            rng = [frame % self.frames]
+
+        w = self.width
+        h = self.height
+
+        for i in rng:
+            img = s_get_rgba_image(self, i)
+            if numpy is not None and isinstance(pixels, numpy.ndarray):
+                view = numpy.frombuffer(img.get_view("0"), numpy.uint8)
+                view = view.reshape((h, w, 4)).transpose(1, 0, 2)
+                if pixels.ndim == 3 and pixels.shape[2] == 3:
+                    view[:, :, :3] = pixels
+                    view[:, :, 3] = 255
+                else:
+                    view[...] = pixels
+                del view
+            elif isinstance(pixels, (bytes, bytearray, memoryview)):
+                view = memoryview(img.get_view("0"))
+                if len(pixels) != len(view):
+                    del view
+                    raise ValueError(
+                        "Pixel buffer must contain exactly {} bytes.".format(
+                            w * h * 4))
+                view[:] = pixels
+                del view
+            else:
+                img.lock()
+                for x in six.moves.range(min(w, len(pixels))):
+                    column = pixels[x]
+                    for y in six.moves.range(min(h, len(column))):
+                        img.set_at((x, y), column[y]._value)
+                img.unlock()
+
+        s_refresh(self)
+
     def draw_dot(self, x, y, color, frame=None, blend_mode=None):
         """
         Draw a single-pixel dot on the sprite.
@@ -723,7 +893,7 @@ class Sprite(object):
 
         x = int(round(x))
         y = int(round(y))
-        pg_color = pygame.Color(*color)
+        pg_color = color._value
 
         if frame is None:
             rng = six.moves.range(self.frames)
@@ -797,7 +967,7 @@ class Sprite(object):
         x2 = int(round(x2))
         y2 = int(round(y2))
         thickness = int(round(thickness))
-        pg_color = pygame.Color(*color)
+        pg_color = color._value
         thickness = abs(thickness)
 
         if frame is None:
@@ -884,9 +1054,9 @@ class Sprite(object):
 
         rect = pygame.Rect(x, y, width, height)
         if fill is not None:
-            pg_fill = pygame.Color(*fill)
+            pg_fill = fill._value
         if outline is not None:
-            pg_outl = pygame.Color(*outline)
+            pg_outl = outline._value
 
         if frame is None:
             rng = six.moves.range(self.frames)
@@ -973,9 +1143,9 @@ class Sprite(object):
 
         rect = pygame.Rect(x, y, width, height)
         if fill is not None:
-            pg_fill = pygame.Color(*fill)
+            pg_fill = fill._value
         if outline is not None:
-            pg_outl = pygame.Color(*outline)
+            pg_outl = outline._value
 
         if frame is None:
             rng = six.moves.range(self.frames)
@@ -1059,9 +1229,9 @@ class Sprite(object):
             return
 
         if fill is not None:
-            pg_fill = pygame.Color(*fill)
+            pg_fill = fill._value
         if outline is not None:
-            pg_outl = pygame.Color(*outline)
+            pg_outl = outline._value
 
         if frame is None:
             rng = six.moves.range(self.frames)
@@ -1143,9 +1313,9 @@ class Sprite(object):
             return
 
         if fill is not None:
-            pg_fill = pygame.Color(*fill)
+            pg_fill = fill._value
         if outline is not None:
-            pg_outl = pygame.Color(*outline)
+            pg_outl = outline._value
 
         if frame is None:
             rng = six.moves.range(self.frames)
@@ -1341,7 +1511,7 @@ class Sprite(object):
 
         for i in six.moves.range(len(lines)):
             rendered_text = font.rd["font"].render(lines[i], anti_alias,
-                                                   pygame.Color(*color))
+                                                   color._value)
             if color.alpha < 255:
                 rendered_text = rendered_text.convert_alpha()
                 rendered_text.fill((0, 0, 0, 255 - color.alpha), None,
@@ -1712,26 +1882,29 @@ class Sprite(object):
         else:
             rng = [frame % self.frames]
 
-        pg_new_color = pygame.Color(*new_color)
+        pg_new_color = new_color._value
 
         for i in rng:
             img = self.rd["baseimages"][i]
             try:
                 palette = img.get_palette()
             except pygame.error:
-                img.lock()
-                for y in six.moves.range(img.get_height()):
-                    for x in six.moves.range(img.get_width()):
-                        if old_color == Color(tuple(img.get_at((x, y)))):
-                            img.set_at((x, y), pg_new_color)
-                img.unlock()
+                # Without per-pixel alpha, every pixel is opaque.
+                if (old_color.alpha == 255 or
+                        img.get_flags() & pygame.SRCALPHA):
+                    pixels = pygame.PixelArray(img)
+                    pixels.replace(old_color._value, pg_new_color)
+                    del pixels
             else:
+                old_value = old_color._value
                 for j in six.moves.range(len(palette)):
-                    if old_color == Color(tuple(palette[j])):
+                    if _ColorValue(*palette[j]) == old_value:
                         palette[j] = pg_new_color
 
                 img.set_palette(palette)
 
+        s_refresh(self)
+
     def copy(self):
         """Return a copy of the sprite."""
         new_copy = Sprite(width=self.width, height=self.height,
@@ -2072,7 +2245,8 @@ class TileGrid(object):
     - Cannot be animated in any way.  Only the first frame of each
       individual sprite is considered.
 
-    - Cannot be used as a basis for precise collision detection.
+    - Cannot be used as a basis for precise collision detection.  Use
+      :attr:`solid` instead.
 
     .. attribute:: tiles
 
@@ -2189,6 +2363,20 @@ class TileGrid(object):
        :const:`None`, it will become equal to ``height - bbox_y``
        (which is always everything on the grid below :attr:`bbox_y`).
 
+    .. attribute:: solid
+
+       A list indicating which tiles are solid, with one item for each
+       item in :attr:`tiles`; a tile is solid if its item is
+       :const:`True`.  Set to :const:`None` to treat the grid as a
+       whole like any other sprite for collision detection instead.
+
+       If this is not :const:`None` and :attr:`render_method` is not
+       ``"isometric"``, objects using the grid as their sprite only
+       collide with other objects which touch solid tiles, and
+       :meth:`sge.dsp.Object.event_tile_collision` is called for each
+       solid tile touched.  This makes it possible to use a single
+       object for all the walls of a tile-based level.
+
     .. attribute:: transparent
 
        Defined as :const:`True`.  Provided for compatibility with
@@ -2290,7 +2478,8 @@ class TileGrid(object):
 
     def __init__(self, tiles, render_method=None, section_length=1,
                  tile_width=16, tile_height=16, origin_x=0, origin_y=0,
-                 bbox_x=None, bbox_y=None, bbox_width=None, bbox_height=None):
+                 bbox_x=None, bbox_y=None, bbox_width=None, bbox_height=None,
+                 solid=None):
         """
         Arguments set the respective initial attributes of the grid.
         See the documentation for :class:`xsge.gfx.TileGrid` for more
@@ -2308,6 +2497,7 @@ class TileGrid(object):
         self.bbox_y = bbox_y
         self.bbox_width = bbox_width
         self.bbox_height = bbox_height
+        self.solid = solid
         self.transparent = True
         self.fps = 0
         self.speed = 0
@@ -2320,9 +2510,51 @@ class TileGrid(object):
             self.tiles, render_method=self.render_method,
             section_length=self.section_length, tile_width=self.tile_width,
             tile_height=self.tile_height, origin_x=self.origin_x,
-            origin_y=self.origin_y, fps=self.fps, bbox_x=self.bbox_x,
+            origin_y=self.origin_y, bbox_x=self.bbox_x,
             bbox_y=self.bbox_y, bbox_width=self.bbox_width,
-            bbox_height=self.bbox_height)
+            bbox_height=self.bbox_height, solid=self.solid)
+
+    def get_solid_tiles(self, x, y, width, height):
+        """
+        Return a list of the indexes in :attr:`tiles` of solid tiles
+        which overlap a rectangle.
+
+        Arguments:
+
+        - ``x`` -- The horizontal location relative to the left edge of
+          the grid of the left edge of the rectangle.
+        - ``y`` -- The vertical location relative to the top edge of
+          the grid of the top edge of the rectangle.
+        - ``width`` -- The width of the rectangle.
+        - ``height`` -- The height of the rectangle.
+
+        Only the tiles within the rectangle are looked at, so this is
+        fast no matter how large the grid is.  If :attr:`solid` is
+        :const:`None` or :attr:`render_method` is ``"isometric"``, an
+        empty list is returned.
+
+        See the documentation for :attr:`solid` for more information.
+        """
+        if self.solid is None or self.render_method == "isometric":
+            return []
+
+        imin = max(int(math.floor(x / self.tile_width)), 0)
+        imax = min(int(math.ceil((x + width) / self.tile_width)),
+                   self.section_length)
+        jmin = max(int(math.floor(y / self.tile_height)), 0)
+        # The last row may only be partly filled.
+        solid = self.solid
+        rows = -(-len(solid) // self.section_length)
+        jmax = min(int(math.ceil((y + height) / self.tile_height)), rows)
+
+        tiles = []
+        for j in six.moves.range(jmin, jmax):
+            row = j * self.section_length
+            for i in six.moves.range(imin, imax):
+                if row + i < len(solid) and solid[row + i]:
+                    tiles.append(row + i)
+
+        return tiles
 
     def render(self):
         """
@@ -2750,6 +2982,9 @@ class _PygameSpriteFont(pygame.font.Font):
 
     # Special font class that returns good values for a sprite font.
 
+    cache_size = 256
+    glyph_cache_size = 16
+
     @property
     def vsize(self):
         return self.height
@@ -2778,6 +3013,9 @@ class _PygameSpriteFont(pygame.font.Font):
             for i in six.moves.range(len(chars)):
                 self.chars[chars[i]] = i
 
+        self.char_frames = {}
+        self.glyphs = collections.OrderedDict()
+        self.rendered = collections.OrderedDict()
         self.width = self.sprite.width
         self.height = self.sprite.height
         self.vsize = size
@@ -2786,41 +3024,89 @@ class _PygameSpriteFont(pygame.font.Font):
         self.italic = False
 
     def render(self, text, antialias, color, background=None):
-        w, h = self.size(text)
+        color_key = tuple(color)
+        bg_key = tuple(background) if background is not None else None
         xscale = (self.width / self.sprite.width if self.sprite.width > 0
                   else 1)
         yscale = (self.height / self.sprite.height if self.sprite.height > 0
                   else 1)
+        drawcycle = self.sprite.rd["drawcycle"]
+
+        # Rendered strings are kept in a bounded LRU cache, since the
+        # same text (e.g. HUD labels) tends to be rendered every frame.
+        i = (text, color_key, bg_key, xscale, yscale, self.hsep, drawcycle)
+        surf = self.rendered.pop(i, None)
+        if surf is None:
+            surf = self._render(text, color_key, background, xscale, yscale,
+                                drawcycle)
+            while len(self.rendered) >= self.cache_size:
+                self.rendered.popitem(last=False)
+
+        self.rendered[i] = surf
+        return surf
+
+    def _render(self, text, color_key, background, xscale, yscale,
+                drawcycle):
+        w, h = self.size(text)
         surf = pygame.Surface((w, h), pygame.SRCALPHA)
-        surf.fill(pygame.Color(0, 0, 0, 0))
-        if not isinstance(color, pygame.Color):
-            color = pygame.Color(color)
-        sge_color = Color((color.r, color.g, color.b, color.a))
+        if background is None:
+            surf.fill(pygame.Color(0, 0, 0, 0))
+        else:
+            surf.fill(background)
 
+        glyphs = self._get_glyphs(color_key, xscale, yscale, drawcycle)
+        sge_color = None
+        blit_sequence = []
         for i in six.moves.range(len(text)):
-            if text[i] in self.chars:
-                cimg = s_get_image(self.sprite, self.chars[text[i]],
-                                   xscale=xscale, yscale=yscale,
-                                   blend=sge_color)
-                surf.blit(cimg, (int(i * (self.width + self.hsep)), 0))
-            elif text[i].swapcase() in self.chars:
-                cimg = s_get_image(self.sprite, self.chars[text[i].swapcase()],
-                                   xscale=xscale, yscale=yscale,
-                                   blend=sge_color)
-                surf.blit(cimg, (int(i * (self.width + self.hsep)), 0))
-            elif None in self.chars:
-                cimg = s_get_image(self.sprite, self.chars[None],
-                                   xscale=xscale, yscale=yscale,
-                                   blend=sge_color)
-                surf.blit(cimg, (int(i * (self.width + self.hsep)), 0))
-
-        if background is None:
-            return surf
+            num = self.get_char_frame(text[i])
+            if num is not None:
+                cimg = glyphs.get(num)
+                if cimg is None:
+                    if sge_color is None:
+                        sge_color = Color._from_value(_ColorValue(*color_key))
+                    cimg = s_get_image(self.sprite, num, xscale=xscale,
+                                       yscale=yscale, blend=sge_color)
+                    glyphs[num] = cimg
+                blit_sequence.append(
+                    (cimg, (int(i * (self.width + self.hsep)), 0)))
+
+        if hasattr(surf, "blits"):
+            surf.blits(blit_sequence, False)
         else:
-            rsurf = pygame.Surface((w, h), pygame.SRCALPHA)
-            rsurf.fill(background)
-            rsurf.blit(surf, (0, 0))
-            return rsurf
+            for cimg, pos in blit_sequence:
+                surf.blit(cimg, pos)
+
+        return surf
+
+    def _get_glyphs(self, color_key, xscale, yscale, drawcycle):
+        # Return the dictionary of pre-blended glyph images (indexed by
+        # frame number) for the given color and scale, evicting the
+        # least recently used color if there are too many.
+        i = (color_key, xscale, yscale, drawcycle)
+        glyphs = self.glyphs.pop(i, None)
+        if glyphs is None:
+            glyphs = {}
+            while len(self.glyphs) >= self.glyph_cache_size:
+                self.glyphs.popitem(last=False)
+
+        self.glyphs[i] = glyphs
+        return glyphs
+
+    def get_char_frame(self, char):
+        # Return the frame of the sprite used for ``char``, or None if
+        # it can't be displayed.
+        try:
+            return self.char_frames[char]
+        except KeyError:
+            if char in self.chars:
+                num = self.chars[char]
+            elif char.swapcase() in self.chars:
+                num = self.chars[char.swapcase()]
+            else:
+                num = self.chars.get(None)
+
+            self.char_frames[char] = num
+            return num
 
     def size(self, text):
         # XXX: I don't understand why, but adding an extra pixel to both
@@ -24,6 +24,10 @@ You normally don't need to use input event objects directly.  Input
 events are handled automatically in each frame of the SGE's main loop.
 You only need to use input event objects directly if you take control
 away from the SGE's main loop, e.g. to create your own loop.
+
+This module also provides :class:`sge.input.Recorder` and
+:class:`sge.input.Replay`, which can be used to save the input received
+during a session to a file and feed it back into the game later.
 """
 
 from __future__ import division
@@ -31,13 +35,21 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import struct
+import warnings
+
+import six
+
+import sge
+from sge import r
+
 
 __all__ = ["KeyPress", "KeyRelease", "MouseMove", "MouseButtonPress",
            "MouseButtonRelease", "JoystickAxisMove", "JoystickHatMove",
            "JoystickTrackballMove", "JoystickButtonPress",
            "JoystickButtonRelease", "JoystickEvent", "KeyboardFocusGain",
            "KeyboardFocusLose", "MouseFocusGain", "MouseFocusLose",
-           "QuitRequest"]
+           "QuitRequest", "Recorder", "Replay"]
 
 
 class KeyPress(object):
@@ -426,3 +438,365 @@ class QuitRequest(object):
     close (e.g. when the user presses a "close" button on the window
     border).
     """
+
+
+class Recorder(object):
+
+    """
+    This class records the input received by the SGE to a file so that
+    it can be fed back into the game later by :class:`sge.input.Replay`.
+
+    While a recorder is running, every input event translated by
+    :meth:`sge.dsp.Game.pump_input` is written to the file, along with
+    the states read by the polling functions of :mod:`sge.keyboard`,
+    :mod:`sge.mouse`, and :mod:`sge.joystick` and the time passed as
+    returned by :meth:`sge.dsp.Game.regulate_speed` in each frame.  The
+    game's own use of random numbers, the system clock, and other
+    sources of nondeterminism are not recorded.
+
+    .. attribute:: fname
+
+       The path to the file the input is recorded to.
+
+    .. attribute:: recording
+
+       Whether or not the recorder is currently recording.  (Read-only)
+    """
+
+    @property
+    def recording(self):
+        return self.__file is not None
+
+    def __init__(self, fname):
+        """
+        Arguments:
+
+        - ``fname`` -- The path to the file to record input to.  The
+          file is created when :meth:`start` is called, replacing any
+          existing file at that path.
+
+        All other arguments set the respective initial attributes of
+        the recorder.  See the documentation for
+        :class:`sge.input.Recorder` for more information.
+        """
+        self.fname = fname
+        self.__file = None
+        self.__state = None
+
+    def start(self):
+        """
+        Start recording input.
+
+        If another recorder is running, it is stopped first.  If the
+        file cannot be created, :exc:`OSError` is raised.
+        """
+        if r._input_recorder is not None:
+            r._input_recorder.stop()
+
+        try:
+            self.__file = open(self.fname, "wb")
+        except IOError as e:
+            raise OSError(e)
+
+        self.__file.write(_LOG_MAGIC + struct.pack("<B", _LOG_VERSION))
+        self.__state = None
+        r._input_recorder = self
+
+    def stop(self):
+        """Stop recording input and close the file."""
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+        if r._input_recorder is self:
+            r._input_recorder = None
+
+    def _record_pump(self, events):
+        # Record the events added by one call to Game.pump_input, and
+        # the input state if it has changed since the last call.
+        f = self.__file
+        for event in events:
+            entry = _event_index.get(type(event))
+            if entry is not None:
+                i, attrs = entry
+                f.write(struct.pack("<cB", b"E", i))
+                for attr in attrs:
+                    _write_value(f, getattr(event, attr))
+
+        keys = r._input_keys
+        state = (tuple(code for code in _key_codes if keys[code]),
+                 r._input_mods, tuple(r._input_mouse_buttons),
+                 tuple(r._input_mouse_pos), tuple(r._input_joysticks))
+        if state != self.__state:
+            self.__state = state
+            f.write(b"S")
+            _write_value(f, state)
+
+        f.write(b"P")
+
+    def _record_timing(self, time_passed):
+        # Record the value returned by Game.regulate_speed.
+        self.__file.write(b"T")
+        _write_value(self.__file, time_passed)
+
+
+class Replay(object):
+
+    """
+    This class feeds input recorded by :class:`sge.input.Recorder`
+    back into the game.
+
+    While a replay is running, live input is ignored.  Each call to
+    :meth:`sge.dsp.Game.pump_input` instead adds the recorded input
+    events of the corresponding call to
+    :attr:`sge.dsp.Game.input_events` and restores the states read by
+    the polling functions of :mod:`sge.keyboard`, :mod:`sge.mouse`, and
+    :mod:`sge.joystick`.  Each call to
+    :meth:`sge.dsp.Game.regulate_speed` returns the recorded time
+    passed without waiting, so the replay runs as fast as the game can
+    process it.
+
+    The replay reproduces the original session only if the game runs
+    the same way given the same input and timing, e.g. if its random
+    number generator is seeded with a fixed value.  For unattended
+    runs, such as performance regression tests, set the
+    ``SDL_VIDEODRIVER`` environment variable to ``"dummy"`` before
+    creating the :class:`sge.dsp.Game` object so that no window is
+    opened.
+
+    .. attribute:: fname
+
+       The path to the file the input is read from.
+
+    .. attribute:: end_game
+
+       Whether or not to end the game with :meth:`sge.dsp.Game.end`
+       when the end of the recording is reached.  Since the end is
+       only noticed when the game asks for more input, the frame in
+       which this happens still runs to completion, with no input.
+
+    .. attribute:: playing
+
+       Whether or not the replay is currently running.  (Read-only)
+
+    .. attribute:: frames
+
+       The number of frames replayed so far, counted by calls to
+       :meth:`sge.dsp.Game.regulate_speed`.  (Read-only)
+    """
+
+    @property
+    def playing(self):
+        return self.__file is not None
+
+    @property
+    def frames(self):
+        return self.__frames
+
+    def __init__(self, fname, end_game=True):
+        """
+        Arguments:
+
+        - ``fname`` -- The path to the recorded input file.
+
+        All other arguments set the respective initial attributes of
+        the replay.  See the documentation for
+        :class:`sge.input.Replay` for more information.
+        """
+        self.fname = fname
+        self.end_game = end_game
+        self.__file = None
+        self.__frames = 0
+
+    def start(self):
+        """
+        Start feeding the recorded input into the game.
+
+        If another replay is running, it is stopped first.  If the file
+        cannot be opened, :exc:`OSError` is raised; if it is not a
+        recorded input file, :exc:`ValueError` is raised.
+        """
+        if r._input_player is not None:
+            r._input_player.stop()
+
+        try:
+            f = open(self.fname, "rb")
+        except IOError as e:
+            raise OSError(e)
+
+        header = f.read(len(_LOG_MAGIC) + 1)
+        if (len(header) != len(_LOG_MAGIC) + 1 or
+                not header.startswith(_LOG_MAGIC)):
+            f.close()
+            raise ValueError("{} is not a recorded input file.".format(
+                self.fname))
+
+        version = struct.unpack("<B", header[-1:])[0]
+        if version != _LOG_VERSION:
+            f.close()
+            e = "Unsupported recorded input file version: {}".format(version)
+            raise ValueError(e)
+
+        self.__file = f
+        self.__frames = 0
+        r._input_player = self
+
+    def stop(self):
+        """Stop the replay and go back to taking live input."""
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+        if r._input_player is self:
+            r._input_player = None
+
+    def __finish(self, tag):
+        # Stop the replay at the end of the recording, or where it no
+        # longer matches the calls the game makes.
+        if tag:
+            w = "{} does not match the game; stopping replay.".format(
+                self.fname)
+            warnings.warn(w)
+
+        self.stop()
+        if self.end_game and sge.game is not None:
+            sge.game.end()
+
+    def _replay_pump(self, game):
+        # Feed the recorded results of one call to Game.pump_input into
+        # the game.
+        f = self.__file
+        while True:
+            tag = f.read(1)
+            try:
+                if tag == b"P":
+                    return
+                elif tag == b"E":
+                    i = struct.unpack("<B", f.read(1))[0]
+                    cls, attrs = _event_types[i]
+                    args = [_read_value(f) for attr in attrs]
+                    game.input_events.append(cls(*args))
+                    continue
+                elif tag == b"S":
+                    keys, mods, buttons, pos, joysticks = _read_value(f)
+                    r._input_keys = _PressedKeys(keys)
+                    r._input_mods = mods
+                    r._input_mouse_buttons = buttons
+                    r._input_mouse_pos = pos
+                    r._input_joysticks = list(joysticks)
+                    continue
+            except (ValueError, IndexError, struct.error):
+                # Truncated or damaged record, e.g. because the game
+                # crashed while recording; treat it as the end.
+                tag = b""
+
+            self.__finish(tag)
+            return
+
+    def _replay_timing(self):
+        # Return the recorded result of one call to
+        # Game.regulate_speed, or None if there is none.
+        tag = self.__file.read(1)
+        if tag == b"T":
+            try:
+                time_passed = _read_value(self.__file)
+            except (ValueError, struct.error):
+                tag = b""
+            else:
+                self.__frames += 1
+                return time_passed
+
+        self.__finish(tag)
+        return None
+
+
+class _PressedKeys(object):
+
+    # Stands in for the result of pygame.key.get_pressed while
+    # replaying recorded input.
+
+    __slots__ = ("codes",)
+
+    def __init__(self, codes):
+        self.codes = frozenset(codes)
+
+    def __getitem__(self, code):
+        return code in self.codes
+
+
+_LOG_MAGIC = b"SGEINPUT"
+_LOG_VERSION = 1
+
+# Input event classes in the order of their indexes in recorded input
+# files, along with the attributes recorded for each, in the order they
+# are passed to the constructor.  Only append to this list; changing
+# the order breaks existing files.
+_event_types = [
+    (KeyPress, ("key", "char")),
+    (KeyRelease, ("key",)),
+    (MouseMove, ("x", "y")),
+    (MouseButtonPress, ("button",)),
+    (MouseButtonRelease, ("button",)),
+    (JoystickAxisMove, ("js_name", "js_id", "axis", "value")),
+    (JoystickHatMove, ("js_name", "js_id", "hat", "x", "y")),
+    (JoystickTrackballMove, ("js_name", "js_id", "ball", "x", "y")),
+    (JoystickButtonPress, ("js_name", "js_id", "button")),
+    (JoystickButtonRelease, ("js_name", "js_id", "button")),
+    (JoystickEvent, ("js_name", "js_id", "input_type", "input_id", "value")),
+    (KeyboardFocusGain, ()),
+    (KeyboardFocusLose, ()),
+    (MouseFocusGain, ()),
+    (MouseFocusLose, ()),
+    (QuitRequest, ())]
+_event_index = dict((cls, (i, attrs))
+                    for i, (cls, attrs) in enumerate(_event_types))
+
+# Key codes checked when recording which keys are pressed.
+_key_codes = sorted(set(sge.KEYS.values()))
+
+
+def _write_value(f, value):
+    # Write a value of one of the simple types found in input events
+    # and input states to a binary file.
+    if value is None:
+        f.write(b"n")
+    elif value is True:
+        f.write(b"t")
+    elif value is False:
+        f.write(b"f")
+    elif isinstance(value, six.integer_types):
+        f.write(struct.pack("<cq", b"i", value))
+    elif isinstance(value, float):
+        f.write(struct.pack("<cd", b"d", value))
+    elif isinstance(value, six.string_types):
+        data = value.encode("utf-8")
+        f.write(struct.pack("<cH", b"s", len(data)))
+        f.write(data)
+    else:
+        value = tuple(value)
+        f.write(struct.pack("<cH", b"l", len(value)))
+        for item in value:
+            _write_value(f, item)
+
+
+def _read_value(f):
+    # Read a value written by _write_value.
+    tag = f.read(1)
+    if tag == b"n":
+        return None
+    elif tag == b"t":
+        return True
+    elif tag == b"f":
+        return False
+    elif tag == b"i":
+        return struct.unpack("<q", f.read(8))[0]
+    elif tag == b"d":
+        return struct.unpack("<d", f.read(8))[0]
+    elif tag == b"s":
+        n = struct.unpack("<H", f.read(2))[0]
+        return f.read(n).decode("utf-8")
+    elif tag == b"l":
+        n = struct.unpack("<H", f.read(2))[0]
+        return tuple(_read_value(f) for i in six.moves.range(n))
+    else:
+        raise ValueError("Corrupt recorded input file.")
@@ -33,7 +33,8 @@ from sge import r
 
 __all__ = ["refresh", "get_axis", "get_hat_x", "get_hat_y",
            "get_pressed", "get_value", "get_joysticks", "get_name",
-           "get_id", "get_axes", "get_hats", "get_trackballs", "get_buttons"]
+           "get_id", "get_axes", "get_hats", "get_trackballs", "get_buttons",
+           "get_axis_filter", "set_axis_filter"]
 
 
 def refresh():
@@ -42,22 +43,36 @@ def refresh():
 
     Call this method to allow the SGE to use joysticks that were plugged
     in while the game was running.
+
+    If the version of Pygame used supports it, joysticks being plugged
+    in and unplugged are detected automatically, so calling this method
+    is not necessary.  Either way, joysticks which are still connected
+    keep their numbers; the number of a joystick which was unplugged is
+    given to the next joystick plugged in.
     """
-    r.game_joysticks = []
-    r.game_js_names = {}
-    r.game_js_ids = {}
-    pygame.joystick.quit()
-    pygame.joystick.init()
+    r._js_pending = False
+
+    if (not hasattr(pygame, "JOYDEVICEADDED") or
+            not pygame.joystick.get_init()):
+        # Without hot-plug support, the joystick subsystem has to be
+        # restarted to find new joysticks.
+        for instance_id in list(r._js_instances):
+            r._remove_joystick(instance_id)
+        pygame.joystick.quit()
+        pygame.joystick.init()
 
     if pygame.joystick.get_init():
+        present = set()
         for i in six.moves.range(pygame.joystick.get_count()):
             joy = pygame.joystick.Joystick(i)
-            joy.init()
-            n = joy.get_name()
-            r.game_joysticks.append(joy)
-            r.game_js_names[i] = n
-            if n not in r.game_js_ids:
-                r.game_js_ids[n] = i
+            instance_id = r._get_js_instance_id(joy, i)
+            present.add(instance_id)
+            if instance_id not in r._js_instances:
+                r._add_joystick(joy, instance_id)
+
+        for instance_id in list(r._js_instances):
+            if instance_id not in present:
+                r._remove_joystick(instance_id)
 
 
 def get_axis(joystick, axis):
@@ -76,9 +91,9 @@ def get_axis(joystick, axis):
     """
     joystick = get_id(joystick)
 
-    if (joystick is not None and joystick < len(r.game_joysticks) and
-            axis < r.game_joysticks[joystick].get_numaxes()):
-        return max(-1.0, min(r.game_joysticks[joystick].get_axis(axis), 1.0))
+    state = r._get_joystick_state(joystick)
+    if state is not None and 0 <= axis < len(state[0]):
+        return state[0][axis]
     else:
         return 0
 
@@ -129,9 +144,9 @@ def get_pressed(joystick, button):
     """
     joystick = get_id(joystick)
 
-    if (joystick is not None and joystick < len(r.game_joysticks) and
-            button < r.game_joysticks[joystick].get_numbuttons()):
-        return r.game_joysticks[joystick].get_button(button)
+    state = r._get_joystick_state(joystick)
+    if state is not None and 0 <= button < len(state[2]):
+        return state[2][button]
     else:
         return False
 
@@ -202,7 +217,15 @@ def get_value(joystick, input_type, input_id):
 
 
 def get_joysticks():
-    """Return the number of joysticks available."""
+    """
+    Return the number of joysticks available.
+
+    If a joystick other than the last one has been unplugged, its
+    number is still counted until another joystick is plugged in.
+    """
+    if r._js_pending:
+        refresh()
+
     return len(r.game_joysticks)
 
 
@@ -216,6 +239,9 @@ def get_name(joystick):
     - ``joystick`` -- The number of the joystick to check, where ``0``
       is the first joystick, or the name of the joystick to check.
     """
+    if r._js_pending:
+        refresh()
+
     if isinstance(joystick, six.integer_types):
         return r.game_js_names.setdefault(joystick)
     elif joystick in r.game_js_names.values():
@@ -234,6 +260,9 @@ def get_id(joystick):
     - ``joystick`` -- The number of the joystick to check, where ``0``
       is the first joystick, or the name of the joystick to check.
     """
+    if r._js_pending:
+        refresh()
+
     if not isinstance(joystick, six.integer_types):
         return r.game_js_ids.setdefault(joystick)
     elif joystick in r.game_js_names:
@@ -254,8 +283,9 @@ def get_axes(joystick):
     """
     joystick = get_id(joystick)
 
-    if joystick is not None and joystick < len(r.game_joysticks):
-        return r.game_joysticks[joystick].get_numaxes()
+    if (joystick is not None and joystick < len(r._js_caps) and
+            r._js_caps[joystick] is not None):
+        return r._js_caps[joystick][0]
     else:
         return 0
 
@@ -272,8 +302,9 @@ def get_hats(joystick):
     """
     joystick = get_id(joystick)
 
-    if joystick is not None and joystick < len(r.game_joysticks):
-        return r.game_joysticks[joystick].get_numhats()
+    if (joystick is not None and joystick < len(r._js_caps) and
+            r._js_caps[joystick] is not None):
+        return r._js_caps[joystick][1]
     else:
         return 0
 
@@ -290,8 +321,9 @@ def get_trackballs(joystick):
     """
     joystick = get_id(joystick)
 
-    if joystick is not None and joystick < len(r.game_joysticks):
-        return r.game_joysticks[joystick].get_numballs()
+    if (joystick is not None and joystick < len(r._js_caps) and
+            r._js_caps[joystick] is not None):
+        return r._js_caps[joystick][2]
     else:
         return 0
 
@@ -308,7 +340,41 @@ def get_buttons(joystick):
     """
     joystick = get_id(joystick)
 
-    if joystick is not None and joystick < len(r.game_joysticks):
-        return r.game_joysticks[joystick].get_numbuttons()
+    if (joystick is not None and joystick < len(r._js_caps) and
+            r._js_caps[joystick] is not None):
+        return r._js_caps[joystick][3]
     else:
         return 0
+
+
+def get_axis_filter():
+    """
+    Return the joystick axis filter as a tuple in the form
+    ``(deadzone, step)``.
+
+    See the documentation for :func:`sge.joystick.set_axis_filter` for
+    more information.
+    """
+    return (r._axis_deadzone, r._axis_step)
+
+
+def set_axis_filter(deadzone=0, step=0):
+    """
+    Set how joystick axis values are filtered.
+
+    Arguments:
+
+    - ``deadzone`` -- The distance from the center, from ``0`` to
+      ``1``, within which an axis is treated as centered.
+    - ``step`` -- If set to a value greater than ``0``, axis values are
+      rounded to the nearest multiple of this value.
+
+    Analog sticks commonly report small changes even when they are
+    not being touched.  Filtering these out means that
+    :func:`sge.joystick.get_axis` returns stable values, and that
+    :class:`sge.input.JoystickAxisMove` and
+    :class:`sge.input.JoystickEvent` events are only generated when the
+    filtered value of an axis actually changes.
+    """
+    r._axis_deadzone = max(0, min(deadzone, 1))
+    r._axis_step = max(0, step)
@@ -175,6 +175,7 @@ from __future__ import unicode_literals
 import pygame
 
 import sge
+from sge import r
 
 
 __all__ = ["get_pressed", "get_modifier", "get_focused", "set_repeat",
@@ -182,6 +183,19 @@ __all__ = ["get_pressed", "get_modifier", "get_focused", "set_repeat",
 
 _repeat_enabled = False
 
+# Key and modifier identifiers mapped to their Pygame values, including
+# the all-uppercase spellings so that the common cases can skip
+# lowercasing the identifier.
+_key_codes = {}
+for _name, _code in sge.KEYS.items():
+    _key_codes[_name] = _code
+    _key_codes.setdefault(_name.upper(), _code)
+_mod_codes = {}
+for _name, _code in sge.MODS.items():
+    _mod_codes[_name] = _code
+    _mod_codes.setdefault(_name.upper(), _code)
+del _name, _code
+
 
 def get_pressed(key):
     """
@@ -192,11 +206,16 @@ def get_pressed(key):
     - ``key`` -- The identifier string of the modifier key to check; see
       the table in the documentation for :mod:`sge.keyboard`.
     """
-    key = key.lower()
-    if key in sge.KEYS:
-        return pygame.key.get_pressed()[sge.KEYS[key]]
-    else:
-        return False
+    code = _key_codes.get(key)
+    if code is None:
+        code = _key_codes.get(key.lower())
+        if code is None:
+            return False
+
+    keys = r._input_keys
+    if keys is None:
+        keys = pygame.key.get_pressed()
+    return keys[code]
 
 
 def get_modifier(key):
@@ -228,11 +247,15 @@ def get_modifier(key):
     Num Lock          ``"num_lock"``
     ================= =================
     """
-    key = key.lower()
-    if key in sge.MODS:
-        return pygame.key.get_mods() & sge.MODS[key]
-    else:
-        return False
+    code = _mod_codes.get(key)
+    if code is None:
+        code = _mod_codes.get(key.lower())
+        if code is None:
+            return False
+
+    if r._input_keys is None:
+        return pygame.key.get_mods() & code
+    return r._input_mods & code
 
 
 def get_focused():
@@ -68,6 +68,23 @@ from sge import r
 
 __all__ = ["get_pressed", "get_x", "get_y", "set_x", "set_y"]
 
+_button_indexes = {"left": 0, "middle": 1, "right": 2, "LEFT": 0,
+                   "MIDDLE": 1, "RIGHT": 2}
+
+
+def _get_pos():
+    # Return the mouse position in the window from the input snapshot.
+    if r._input_keys is None:
+        return pygame.mouse.get_pos()
+    return r._input_mouse_pos
+
+
+def _set_pos(x, y):
+    # Move the mouse and keep the input snapshot in sync with it.
+    pygame.mouse.set_pos(x, y)
+    if r._input_keys is not None:
+        r._input_mouse_pos = pygame.mouse.get_pos()
+
 
 def get_pressed(button):
     """
@@ -76,11 +93,15 @@ def get_pressed(button):
     See the documentation for :class:`sge.input.MouseButtonPress` for
     more information.
     """
-    b = {"left": 0, "middle": 1, "right": 2}.setdefault(button.lower())
-    if b is not None:
+    b = _button_indexes.get(button)
+    if b is None:
+        b = _button_indexes.get(button.lower())
+        if b is None:
+            return False
+
+    if r._input_keys is None:
         return pygame.mouse.get_pressed()[b]
-    else:
-        return False
+    return r._input_mouse_buttons[b]
 
 
 def get_x():
@@ -94,7 +115,7 @@ def get_x():
     if sge.game.grab_input and not sge.game.mouse.visible:
         return None
     else:
-        return (pygame.mouse.get_pos()[0] - r.game_x) / r.game_xscale
+        return (_get_pos()[0] - r.game_x) / r.game_xscale
 
 
 def get_y():
@@ -108,7 +129,7 @@ def get_y():
     if sge.game.grab_input and not sge.game.mouse.visible:
         return None
     else:
-        return (pygame.mouse.get_pos()[1] - r.game_y) / r.game_yscale
+        return (_get_pos()[1] - r.game_y) / r.game_yscale
 
 
 def set_x(value):
@@ -120,8 +141,7 @@ def set_x(value):
     relative mode, this function has no effect.
     """
     if not sge.game.grab_input or sge.game.mouse.visible:
-        pygame.mouse.set_pos(value * r.game_xscale + r.game_x,
-                             pygame.mouse.get_pos()[1])
+        _set_pos(value * r.game_xscale + r.game_x, _get_pos()[1])
 
 
 def set_y(value):
@@ -133,5 +153,4 @@ def set_y(value):
     relative mode, this function has no effect.
     """
     if not sge.game.grab_input or sge.game.mouse.visible:
-        pygame.mouse.set_pos(pygame.mouse.get_pos()[0],
-                             value * r.game_yscale + r.game_y)
+        _set_pos(_get_pos()[0], value * r.game_yscale + r.game_y)
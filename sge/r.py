@@ -26,9 +26,15 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import collections
+import heapq
+import importlib
 import inspect
 import math
+import operator
 import random
+import sys
+import threading
 import time
 import warnings
 import weakref
@@ -36,6 +42,11 @@ import weakref
 import pygame
 import six
 
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
 import sge
 
 
@@ -45,22 +56,167 @@ CACHE_PRUNE_TIME = 8000
 # How long cached items should remain cached by default in seconds.
 CACHE_DEFAULT_LIFE = 15
 
-# Lists of objects that are tangible and objects that check for
-# collisions; makes collision detection more efficient.
-_colliders = []
-_collision_checkers = []
-
 # Set of objects that are active, to avoid looping through inactive
 # objects needlessly.
 _active_objects = set()
 
+# Alarm schedule.  _alarm_clock is the total delta_mult of all frames
+# run so far; _alarm_heap holds (due, serial, alarms, alarm_id) entries
+# for the alarms of the game, the current room, and active objects, and
+# entries made obsolete by changes to alarms are skipped when they come
+# up (or dropped when the heap grows past _alarm_compact_size).
+# _due_object_alarms holds (alarm_id, serial) pairs for the alarms of
+# objects which are due this frame until the object is updated; they
+# stay in the objects' alarms until then, so they can still be changed.
+# Objects count their alarms down when they are updated, so until then,
+# their alarms are behind the clock by _alarm_lag, the delta_mult of
+# the current frame.  _alarm_pending is the set of objects which have
+# yet to be updated, or None if all objects are before the update loop.
+_alarm_clock = 0
+_alarm_heap = []
+_alarm_serial = 0
+_alarm_compact_size = 1024
+_due_object_alarms = {}
+_alarm_lag = 0
+_alarm_pending = None
+
+# Recycled objects waiting to be reused by sge.dsp.Object.spawn, indexed
+# by class.
+_object_pools = {}
+
+# Room snapshots.  Objects and sprites are given names the first time
+# they are captured so that they can be found again when a snapshot is
+# restored in the same session; _snapshot_classes caches classes found
+# by their import paths and _snapshot_paths the reverse.
+_snapshot_objects = weakref.WeakValueDictionary()
+_snapshot_sprites = weakref.WeakValueDictionary()
+_snapshot_serial = 0
+_snapshot_classes = {}
+_snapshot_paths = {}
+
+# Object attributes stored in snapshots.  The first group are arguments
+# of sge.dsp.Object.__init__; the rest are set afterwards.
+SNAPSHOT_INIT_FIELDS = (
+    "x", "y", "z", "sprite", "visible", "active", "checks_collisions",
+    "tangible", "bbox_x", "bbox_y", "bbox_width", "bbox_height",
+    "regulate_origin", "collision_ellipse", "collision_precise",
+    "xvelocity", "yvelocity", "xacceleration", "yacceleration",
+    "xdeceleration", "ydeceleration", "image_index", "image_origin_x",
+    "image_origin_y", "image_fps", "image_xscale", "image_yscale",
+    "image_rotation", "image_alpha", "image_blend", "image_blend_mode",
+    "collision_continuous")
+SNAPSHOT_EXTRA_FIELDS = ("xstart", "ystart", "xprevious", "yprevious",
+                         "_anim_count")
+_get_snapshot_init_values = operator.attrgetter(*SNAPSHOT_INIT_FIELDS)
+_get_snapshot_extra_values = operator.attrgetter(*SNAPSHOT_EXTRA_FIELDS)
+_snapshot_index = dict((name, i) for i, name in
+                       enumerate(SNAPSHOT_INIT_FIELDS))
+
 # Previous joystick states
 _prev_axes = {}
 _prev_hats = {}
 
+# Joystick bookkeeping.  game_joysticks has None in the slots of
+# joysticks which have been removed so that the numbers of the others
+# don't change; _js_caps holds the (axes, hats, trackballs, buttons)
+# counts of each slot, and _js_instances maps Pygame's instance IDs to
+# slots.  Axis values within _axis_deadzone of the center are treated
+# as centered, and if _axis_step is nonzero, values are rounded to
+# multiples of it.
+game_joysticks = []
+game_js_names = {}
+game_js_ids = {}
+_js_caps = []
+_js_instances = {}
+_axis_deadzone = 0
+_axis_step = 0
+_NO_JOYSTICK = ((), (), ())
+
+# Whether or not the joysticks have yet to be found; this is put off
+# until the game starts or sge.joystick is first used.
+_js_pending = False
+
+# Hot-plug events, which older versions of Pygame don't have.
+JOYDEVICEADDED = getattr(pygame, "JOYDEVICEADDED", None)
+JOYDEVICEREMOVED = getattr(pygame, "JOYDEVICEREMOVED", None)
+
+# Input state captured once per frame by Game.pump_input; polling
+# functions read from these instead of querying Pygame each call.
+# _input_keys is None until the first snapshot is taken.
+_input_keys = None
+_input_mods = 0
+_input_mouse_buttons = (0, 0, 0)
+_input_mouse_pos = (0, 0)
+_input_joysticks = []
+
+# Running sge.input.Recorder and sge.input.Replay objects, if any.
+_input_recorder = None
+_input_player = None
+
+# Sound voice pool: all voices, the stack of free voices, and the
+# counter used to order voices by age.
+DEFAULT_VOICES = 32
+_voices = []
+_free_voices = []
+_voice_serial = 0
+
+# Number of voices to create when a sound is first played, or None if
+# the voice pool has already been created.
+_voices_pending = None
+
+# Positional sound state: voices following an emitter, the listener
+# (None for the center of the first view), the distances at which
+# attenuation starts and ends (None for the game's width), and how much
+# a speaker's volume must change before the channel is updated.
+_positional_voices = []
+_sound_listener = None
+_sound_near = 0
+_sound_far = None
+SOUND_GAIN_THRESHOLD = 0.01
+
+# Decoded samples of lazily loaded sounds, shared by file name and
+# limited to SOUND_CACHE_SIZE bytes in least recently used order.  The
+# worker thread decodes files put in _sound_requests and puts the
+# results in _sound_results; plays waiting on those are kept in
+# _pending_sound_plays.
+SOUND_CACHE_SIZE = 64 * 1024 * 1024
+_sound_cache = collections.OrderedDict()
+_sound_cache_bytes = 0
+_sound_requests = six.moves.queue.Queue()
+_sound_results = six.moves.queue.Queue()
+_sound_loading = set()
+_sound_worker = None
+_pending_sound_plays = []
+
+# Music scheduler state.  Playback of the current music began at
+# _music_play_ticks (adjusted for pauses) from _music_offset
+# milliseconds into it; _handle_music does nothing until the ticks
+# reach _music_wake.  _music_fade_out holds the start ticks, length,
+# and starting volume of a fade-out and the queue entry to play after
+# it.  _music_preloaded is the queue entry handed to Pygame's own queue
+# for gapless playback.
+MUSIC_FADE_STEP = 25
+_music_play_ticks = 0
+_music_offset = 0
+_music_pause_ticks = None
+_music_wake = None
+_music_fading_in = False
+_music_fade_out = None
+_music_preloaded = None
+_music_preload_cancelled = False
+
 # Display info
 _display_info = None
 
+# Full-screen sprites reused by room transitions
+_transition_buffers = {}
+
+# Channel masks which put the bytes of 32-bit pixels in RGBA order.
+if sys.byteorder == "little":
+    RGBA_MASKS = (0xff, 0xff00, 0xff0000, 0xff000000)
+else:
+    RGBA_MASKS = (0xff000000, 0xff0000, 0xff00, 0xff)
+
 
 class cache(object):
 
@@ -110,6 +266,12 @@ def _check_color_input(value):
         raise ValueError("Color values must be between 0 and 255.")
 
 
+def _get_color_value(color):
+    # Return the immutable value of a color (or None), suitable for
+    # cache keys and for passing to Pygame.
+    return color._value if color is not None else None
+
+
 def _check_color(value):
     # Make sure a value is either None or a color.
     if value is not None and not isinstance(value, sge.gfx.Color):
@@ -272,57 +434,443 @@ def _set_mode():
         game_y = int(round((h - game.height * game_yscale) / 2))
 
 
-def _get_channel():
-    # Return a channel for a sound effect to use.
-    assert pygame.mixer.get_init()
+class _Voice(object):
 
-    if not game_available_channels:
-        _add_channels()
+    # A mixer channel in the sound voice pool.  ``group`` is the list
+    # of voices of the sound (or top parent sound) currently using the
+    # voice, or None if the voice is free.  ``serial`` orders voices by
+    # when they were last assigned, for finding the oldest.  Positional
+    # sounds also set ``emitter``, the ``volume`` before attenuation,
+    # and the ``gains`` last sent to the channel.
 
-    return game_available_channels.pop(0)
+    __slots__ = ("channel", "group", "priority", "serial", "emitter",
+                 "volume", "gains")
 
+    def __init__(self, channel):
+        self.channel = channel
+        self.group = None
+        self.priority = 0
+        self.serial = 0
+        self.emitter = None
+        self.volume = 0
+        self.gains = (0, 0)
 
-def _release_channel(channel):
-    # Release the given channel for other sounds to use.
+
+def _init_voices(num):
+    # (Re)create the voice pool with the given number of channels.
+    global _voices, _free_voices, _voices_pending
     assert pygame.mixer.get_init()
-    game_available_channels.append(channel)
+    _voices_pending = None
+
+    pygame.mixer.stop()
+    for voice in _voices:
+        if voice.group is not None:
+            voice.group.remove(voice)
+    del _positional_voices[:]
+
+    pygame.mixer.set_num_channels(num)
+    _voices = [_Voice(pygame.mixer.Channel(i))
+               for i in six.moves.range(num)]
+    _free_voices = _voices[::-1]
+
+
+def _free_voice(voice):
+    # Return a voice to the free list.
+    voice.group.remove(voice)
+    voice.group = None
+    _free_voices.append(voice)
 
 
-def _add_channels():
-    # Add four channels for playing sounds.
+def _reclaim_voices(voices):
+    # Free the voices in the given list which have finished playing.
+    for voice in voices[:]:
+        if voice.group is not None and not voice.channel.get_busy():
+            _free_voice(voice)
+
+
+def _get_voice(group, max_play, priority, force):
+    # Return a voice for a sound to play on, or None if it should not
+    # be played.  ``group`` is the voice list of the sound's top parent
+    # and ``max_play`` its limit.
+    global _voice_serial
     assert pygame.mixer.get_init()
 
-    old_num_channels = pygame.mixer.get_num_channels()
-    new_num_channels = old_num_channels + 4
-    pygame.mixer.set_num_channels(new_num_channels)
+    if _voices_pending is not None:
+        _init_voices(_voices_pending)
+
+    voice = None
+    if max_play:
+        _reclaim_voices(group)
+        if len(group) >= max_play:
+            if not force:
+                return None
+
+            # Restart the sound's own oldest instance.
+            voice = min(group, key=lambda v: v.serial)
+
+    if voice is None:
+        if not _free_voices:
+            _reclaim_voices(_voices)
+
+        if _free_voices:
+            voice = _free_voices.pop()
+        elif _voices:
+            # Steal the least important voice, the oldest among equals.
+            voice = min(_voices, key=lambda v: (v.priority, v.serial))
+            if voice.priority > priority:
+                return None
+        else:
+            return None
+
+    if voice.group is not group:
+        if voice.group is not None:
+            voice.group.remove(voice)
+        voice.group = group
+        group.append(voice)
+
+    _voice_serial += 1
+    voice.serial = _voice_serial
+    voice.priority = priority
+    if voice.emitter is not None:
+        # A voice is in _positional_voices exactly while it has an
+        # emitter.
+        _positional_voices.remove(voice)
+        voice.emitter = None
+    return voice
+
+
+def _get_listener_position():
+    # Return the position sounds are heard from.
+    listener = _sound_listener
+    if listener is None:
+        room = sge.game.current_room
+        if room is None or not room.views:
+            return (sge.game.width / 2, sge.game.height / 2)
+        listener = room.views[0]
+
+    if isinstance(listener, sge.dsp.View):
+        return (listener.x + listener.width / 2,
+                listener.y + listener.height / 2)
+    else:
+        return (listener.x, listener.y)
 
-    for i in six.moves.range(old_num_channels, new_num_channels):
-        game_available_channels.append(pygame.mixer.Channel(i))
+
+def _get_positional_gains(volume, emitter, listener_x, listener_y):
+    # Return the left and right speaker volumes of a sound played at
+    # the given volume from the given emitter.
+    far = _sound_far if _sound_far is not None else sge.game.width
+    near = min(_sound_near, far)
+    dx = emitter.x - listener_x
+    dy = emitter.y - listener_y
+    dist = math.hypot(dx, dy)
+
+    if dist >= far:
+        return (0, 0)
+    elif dist > near:
+        volume *= (far - dist) / (far - near)
+
+    balance = max(-1, min(dx / far, 1)) if far else 0
+    left = volume * (1 - balance) if balance > 0 else volume
+    right = volume * (1 + balance) if balance < 0 else volume
+    return (left, right)
+
+
+def _decode_sound(fname):
+    # Return the decoded samples of a sound file.
+    try:
+        return pygame.mixer.Sound(fname)
+    except pygame.error as e:
+        raise OSError(e)
+
+
+def _cache_sound(fname, data):
+    # Add decoded samples to the sound cache, evicting the least
+    # recently used entries to stay within SOUND_CACHE_SIZE.  Evicted
+    # samples still playing are kept alive by their channels.
+    global _sound_cache_bytes
+    freq, fmt, channels = pygame.mixer.get_init()
+    size = int(data.get_length() * freq) * channels * (abs(fmt) // 8)
+    _sound_cache[fname] = (data, size)
+    _sound_cache_bytes += size
+
+    while _sound_cache_bytes > SOUND_CACHE_SIZE and len(_sound_cache) > 1:
+        old_fname, (old_data, old_size) = _sound_cache.popitem(last=False)
+        _sound_cache_bytes -= old_size
+
+
+def _get_sound_data(fname, block=True):
+    # Return the decoded samples of a lazily loaded sound.  If they are
+    # not cached and ``block`` is false, have the worker thread decode
+    # them and return None.
+    global _sound_worker
+    entry = _sound_cache.pop(fname, None)
+    if entry is not None:
+        _sound_cache[fname] = entry
+        return entry[0]
+
+    if block:
+        data = _decode_sound(fname)
+        _cache_sound(fname, data)
+        return data
+
+    if fname not in _sound_loading:
+        _sound_loading.add(fname)
+        _sound_requests.put(fname)
+        if _sound_worker is None:
+            _sound_worker = threading.Thread(target=_sound_worker_main)
+            _sound_worker.daemon = True
+            _sound_worker.start()
+
+    return None
+
+
+def _sound_worker_main():
+    # Decode sound files in the background.  Runs on the worker thread;
+    # the results are cached by _handle_sounds on the main thread.
+    while True:
+        fname = _sound_requests.get()
+        try:
+            data = _decode_sound(fname)
+        except Exception as e:
+            # Anything else would kill the thread and leave the file
+            # loading forever.
+            _sound_results.put((fname, None, e))
+        else:
+            _sound_results.put((fname, data, None))
+
+
+def _handle_sound_loading():
+    # Cache sounds decoded by the worker thread and start the plays that
+    # were waiting on them.
+    global _pending_sound_plays
+    loaded = False
+    while True:
+        try:
+            fname, data, error = _sound_results.get_nowait()
+        except six.moves.queue.Empty:
+            break
+
+        _sound_loading.discard(fname)
+        if data is not None:
+            _cache_sound(fname, data)
+        else:
+            warnings.warn("Could not load {}: {}".format(fname, error))
+        loaded = True
+
+    if loaded:
+        waiting = []
+        plays = _pending_sound_plays
+        _pending_sound_plays = waiting
+        for fname, play in plays:
+            entry = _sound_cache.get(fname)
+            if entry is not None:
+                play(entry[0])
+            elif fname in _sound_loading:
+                waiting.append((fname, play))
+
+
+def _handle_sounds():
+    # Call each frame to finish background sound loading and update the
+    # volumes of positional sounds.
+    if _sound_loading:
+        _handle_sound_loading()
+
+    if not _positional_voices:
+        return
+
+    listener_x, listener_y = _get_listener_position()
+    threshold = SOUND_GAIN_THRESHOLD
+    i = 0
+    while i < len(_positional_voices):
+        voice = _positional_voices[i]
+        if (voice.emitter is None or voice.group is None or
+                not voice.channel.get_busy()):
+            # No longer positional; swap-remove it.
+            voice.emitter = None
+            _positional_voices[i] = _positional_voices[-1]
+            _positional_voices.pop()
+            continue
+
+        gains = _get_positional_gains(voice.volume, voice.emitter,
+                                      listener_x, listener_y)
+        old_left, old_right = voice.gains
+        # Small changes are skipped, except for reaching silence.
+        if gains != voice.gains and (
+                abs(gains[0] - old_left) > threshold or
+                abs(gains[1] - old_right) > threshold or
+                not gains[0] or not gains[1]):
+            voice.channel.set_volume(*gains)
+            voice.gains = gains
+
+        i += 1
+
+
+def _music_started(new_music, offset):
+    # Record that new_music has started playing from ``offset``
+    # milliseconds, and schedule its fade and timeout.
+    global music, _music_play_ticks, _music_offset, _music_pause_ticks
+    global _music_fade_out, _music_fading_in
+    music = new_music
+    _music_play_ticks = pygame.time.get_ticks()
+    _music_offset = offset
+    _music_pause_ticks = None
+    _music_fade_out = None
+    _music_fading_in = bool(music.rd["fade_time"])
+    _schedule_music(_music_play_ticks)
+    _preload_music()
+
+
+def _music_stopped():
+    # Record that no music is playing any longer.
+    global music, _music_wake, _music_preloaded, _music_fade_out
+    music = None
+    _music_wake = None
+    _music_preloaded = None
+    _music_fade_out = None
+
+
+def _get_music_position():
+    # Return how many milliseconds into the current music playback is.
+    if _music_pause_ticks is not None:
+        now = _music_pause_ticks
+    else:
+        now = pygame.time.get_ticks()
+
+    return _music_offset + now - _music_play_ticks
+
+
+def _schedule_music(now):
+    # Set when _handle_music next has something to do.
+    global _music_wake
+    wake = None
+    if music is not None and _music_pause_ticks is None:
+        if _music_fade_out is not None or _music_fading_in:
+            wake = now + MUSIC_FADE_STEP
+
+        timeout = music.rd["timeout"]
+        if timeout and _music_fade_out is None:
+            end = _music_play_ticks + timeout
+            wake = min(wake, end) if wake is not None else end
+
+    _music_wake = wake
+
+
+def _preload_music():
+    # Hand the next queued music to Pygame so that it starts without a
+    # gap when the current music ends, if it can be played that way.
+    global _music_preloaded, _music_preload_cancelled
+    if (_music_preloaded is not None or not music_queue or
+            music is None or music.rd["timeout"]):
+        return
+
+    entry = music_queue[0]
+    next_music, start, loops, maxtime, fade_time = entry
+    if next_music.fname is None or start or fade_time:
+        return
+
+    if not loops:
+        loops = -1
+
+    try:
+        pygame.mixer.music.queue(next_music.fname, "", loops)
+    except TypeError:
+        # Older versions of Pygame can't queue music with loops.
+        if loops:
+            return
+        try:
+            pygame.mixer.music.queue(next_music.fname)
+        except pygame.error:
+            return
+    except pygame.error:
+        return
+
+    _music_preloaded = entry
+    _music_preload_cancelled = False
+
+
+def _music_ended():
+    # Call when Pygame reports that the music has ended.
+    global _music_preloaded
+    entry = _music_preloaded
+    _music_preloaded = None
+
+    if _music_fade_out is not None:
+        # The old music ended by itself before fading out completely.
+        next_entry = _music_fade_out[3]
+        _music_stopped()
+        next_entry[0].play(*next_entry[1:])
+    elif entry is not None and pygame.mixer.music.get_busy():
+        # Pygame has already switched to the preloaded music.
+        if music_queue and music_queue[0] is entry:
+            music_queue.pop(0)
+
+        if _music_preload_cancelled:
+            _music_stopped()
+            pygame.mixer.music.stop()
+        else:
+            next_music, start, loops, maxtime, fade_time = entry
+            next_music.rd["timeout"] = maxtime
+            next_music.rd["fade_time"] = fade_time
+            pygame.mixer.music.set_volume(next_music.volume)
+            _music_started(next_music, 0)
+    else:
+        _music_stopped()
+        if music_queue:
+            next_entry = music_queue.pop(0)
+            next_entry[0].play(*next_entry[1:])
 
 
 def _handle_music():
-    # Call each frame to control the music playback.
-    if music is not None:
-        if pygame.mixer.music.get_busy():
-            time_played = pygame.mixer.music.get_pos()
+    # Call each frame to control the music playback.  This only checks
+    # the time unless a fade step or timeout is due.
+    global _music_fading_in
+    if _music_wake is None:
+        return
+
+    now = pygame.time.get_ticks()
+    if now < _music_wake:
+        return
+
+    if _music_fade_out is not None:
+        start, duration, volume, next_entry = _music_fade_out
+        if now - start >= duration:
+            _music_stopped()
+            next_entry[0].play(*next_entry[1:])
+            return
+
+        pygame.mixer.music.set_volume(volume * (1 - (now - start) / duration))
+    else:
+        time_played = now - _music_play_ticks
+        timeout = music.rd["timeout"]
+        if timeout and time_played >= timeout:
+            music.stop()
+            return
+
+        if _music_fading_in:
             fade_time = music.rd["fade_time"]
-            timeout = music.rd["timeout"]
+            if time_played < fade_time:
+                volume = music.volume * time_played / fade_time
+            else:
+                volume = music.volume
+                _music_fading_in = False
+            pygame.mixer.music.set_volume(volume)
+
+    _schedule_music(now)
 
-            if fade_time:
-                real_volume = music.volume / 100
-                if time_played < fade_time:
-                    volume = real_volume * time_played / fade_time
-                    pygame.mixer.music.set_volume(volume)
-                else:
-                    pygame.mixer.music.set_volume(real_volume)
 
-            if timeout and time_played >= timeout:
-                music.stop()
+def _skip_refresh():
+    # Do the parts of Game.refresh that must happen every frame even
+    # when nothing is drawn, and drop the frame's projections.
+    global game_window_projections
+    _handle_music()
+    _handle_sounds()
+    sge.game.current_room.rd["projections"] = []
+    game_window_projections = []
 
 
 def _get_dot_sprite(color):
     # Return a sprite for the given dot.
-    i = ("dot_sprite", tuple(color))
+    i = ("dot_sprite", _get_color_value(color))
     sprite = cache.get(i)
     if sprite is None:
         sprite = sge.gfx.Sprite(None, width=1, height=1)
@@ -336,7 +884,8 @@ def _get_line_sprite(x1, y1, x2, y2, color, thickness, anti_alias):
     # Return a sprite for the given line.
     w = int(round(abs(x2 - x1) + thickness))
     h = int(round(abs(y2 - y1) + thickness))
-    i = ("line_sprite", x1, y1, x2, y2, tuple(color), thickness, anti_alias)
+    i = ("line_sprite", x1, y1, x2, y2, _get_color_value(color), thickness,
+         anti_alias)
     sprite = cache.get(i)
     if sprite is None:
         sprite = sge.gfx.Sprite(None, width=w, height=h)
@@ -348,10 +897,8 @@ def _get_line_sprite(x1, y1, x2, y2, color, thickness, anti_alias):
 
 def _get_rectangle_sprite(width, height, fill, outline, outline_thickness):
     # Return a sprite for the given rectangle.
-    i = ("rectangle_sprite", width, height,
-         tuple(fill) if fill is not None else None,
-         tuple(outline) if outline is not None else None,
-         outline_thickness)
+    i = ("rectangle_sprite", width, height, _get_color_value(fill),
+         _get_color_value(outline), outline_thickness)
     sprite = cache.get(i)
     if sprite is None:
         outline_thickness = abs(outline_thickness)
@@ -370,10 +917,8 @@ def _get_rectangle_sprite(width, height, fill, outline, outline_thickness):
 def _get_ellipse_sprite(width, height, fill, outline, outline_thickness,
                         anti_alias):
     # Return a sprite for the given ellipse.
-    i = ("ellipse_sprite", width, height,
-         tuple(fill) if fill is not None else None,
-         tuple(outline) if outline is not None else None,
-         outline_thickness, anti_alias)
+    i = ("ellipse_sprite", width, height, _get_color_value(fill),
+         _get_color_value(outline), outline_thickness, anti_alias)
     sprite = cache.get(i)
     if sprite is None:
         outline_thickness = abs(outline_thickness)
@@ -391,9 +936,8 @@ def _get_ellipse_sprite(width, height, fill, outline, outline_thickness,
 
 def _get_circle_sprite(radius, fill, outline, outline_thickness, anti_alias):
     # Return a sprite for the given circle.
-    i = ("circle_sprite", radius, tuple(fill) if fill is not None else None,
-         tuple(outline) if outline is not None else None,
-         outline_thickness, anti_alias)
+    i = ("circle_sprite", radius, _get_color_value(fill),
+         _get_color_value(outline), outline_thickness, anti_alias)
     sprite = cache.get(i)
     if sprite is None:
         outline_thickness = abs(outline_thickness)
@@ -409,10 +953,8 @@ def _get_circle_sprite(radius, fill, outline, outline_thickness, anti_alias):
 
 def _get_polygon_sprite(points, fill, outline, outline_thickness, anti_alias):
     # Return a sprite for the given polygon.
-    i = ("poly_sprite", tuple(points),
-         tuple(fill) if fill is not None else None,
-         tuple(outline) if outline is not None else None,
-         outline_thickness, anti_alias)
+    i = ("poly_sprite", tuple(points), _get_color_value(fill),
+         _get_color_value(outline), outline_thickness, anti_alias)
     sprite = cache.get(i)
     if sprite is None:
         xlist = []
@@ -440,11 +982,522 @@ def _get_polygon_sprite(points, fill, outline, outline_thickness, anti_alias):
     return sprite
 
 
+class _InputEventQueue(collections.deque):
+
+    # Queue of input events waiting to be handled.  Also accepts
+    # list-style ``pop(0)`` so that code written for the old list-based
+    # queue keeps working.
+
+    def pop(self, index=-1):
+        if index == 0:
+            return self.popleft()
+        elif index == -1:
+            return collections.deque.pop(self)
+        else:
+            item = self[index]
+            del self[index]
+            return item
+
+
+class _ObjectList(object):
+
+    # Ordered collection of objects with constant-time membership
+    # tests, appending, and removal, used in place of a list where
+    # objects come and go often.  Reading works like a list; iteration
+    # and indexing go through a snapshot which is only rebuilt after a
+    # change, so the collection can be changed during a loop through
+    # it.  Each object can only be in the collection once.
+
+    def __init__(self, objects=()):
+        self._items = collections.OrderedDict()
+        self._list = None
+        for obj in objects:
+            self.append(obj)
+
+    def _snapshot(self):
+        if self._list is None:
+            self._list = list(self._items)
+        return self._list
+
+    def __contains__(self, obj):
+        return obj in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._snapshot())
+
+    def __reversed__(self):
+        return reversed(self._snapshot())
+
+    def __getitem__(self, index):
+        return self._snapshot()[index]
+
+    def __repr__(self):
+        return repr(self._snapshot())
+
+    def index(self, obj):
+        return self._snapshot().index(obj)
+
+    def append(self, obj):
+        if obj not in self._items:
+            self._items[obj] = None
+            self._list = None
+
+    def remove(self, obj):
+        try:
+            del self._items[obj]
+        except KeyError:
+            raise ValueError("{!r} is not in list".format(obj))
+        self._list = None
+
+    def discard(self, obj):
+        if obj in self._items:
+            del self._items[obj]
+            self._list = None
+
+    def pop(self, index=-1):
+        if not self._items:
+            raise IndexError("pop from empty list")
+
+        if index == 0:
+            obj = self._items.popitem(last=False)[0]
+        elif index == -1:
+            obj = self._items.popitem()[0]
+        else:
+            obj = self._snapshot()[index]
+            del self._items[obj]
+        self._list = None
+        return obj
+
+
+class _SparseColumn(object):
+
+    # Column of a sparse object area grid.  The areas of all columns are
+    # kept in one dictionary keyed by (i, j), and only areas with
+    # objects in them are stored; the rest are read as an empty
+    # frozenset.  Like other object areas, stored areas are replaced
+    # rather than modified.
+
+    __slots__ = ("cells", "i", "rows")
+
+    def __init__(self, cells, i, rows):
+        self.cells = cells
+        self.i = i
+        self.rows = rows
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        for j in six.moves.range(self.rows):
+            yield self.cells.get((self.i, j), _empty_area)
+
+    def _check_index(self, j):
+        if j < 0:
+            j += self.rows
+        if not 0 <= j < self.rows:
+            raise IndexError("object area index out of range")
+        return j
+
+    def __getitem__(self, j):
+        return self.cells.get((self.i, self._check_index(j)), _empty_area)
+
+    def __setitem__(self, j, value):
+        key = (self.i, self._check_index(j))
+        if value:
+            self.cells[key] = value
+        else:
+            self.cells.pop(key, None)
+
+
+_empty_area = frozenset()
+
+# Rooms with more object areas than this have their object areas
+# allocated sparsely (see _SparseColumn).
+SPARSE_AREA_THRESHOLD = 65536
+
+# Automatic object area sizing (see r_tune_object_areas): how many
+# frames to wait between checks, how far off the size may be before
+# the object areas are rebuilt, and the smallest size to use.
+AUTO_AREA_INTERVAL = 120
+AUTO_AREA_TOLERANCE = 2
+AUTO_AREA_MIN_SIZE = 16
+
+
+def _new_object_areas(cols, rows, sparse):
+    # Return a 2-dimensional grid of empty object areas.
+    if sparse:
+        cells = {}
+        return [_SparseColumn(cells, i, rows) for i in six.moves.range(cols)]
+    else:
+        return [[set() for j in six.moves.range(rows)]
+                for i in six.moves.range(cols)]
+
+
+# Objects that are tangible and objects that check for collisions;
+# makes collision detection more efficient.
+_colliders = _ObjectList()
+_collision_checkers = _ObjectList()
+
+
+class _Alarms(MutableMapping):
+
+    # Dictionary-like view of the alarms of the game, a room, or an
+    # object.  While scheduled, the stored times are when the alarms
+    # are due on _alarm_clock; otherwise, they are the time remaining.
+
+    def __init__(self, owner, scheduled=False, is_object=False):
+        self.owner = owner
+        self.scheduled = scheduled
+        self.is_object = is_object
+        self._times = {}
+        self._serials = {}
+
+    def _now(self):
+        # Return the time on _alarm_clock the alarms have counted down
+        # to.
+        if (self.is_object and _alarm_lag and
+                (_alarm_pending is None or self.owner in _alarm_pending)):
+            return _alarm_clock - _alarm_lag
+        else:
+            return _alarm_clock
+
+    def __getitem__(self, key):
+        if self.scheduled:
+            return self._times[key] - self._now()
+        else:
+            return self._times[key]
+
+    def __setitem__(self, key, value):
+        if self.scheduled:
+            now = self._now()
+            value += now
+            serial = _schedule_alarm(value, self, key)
+            self._serials[key] = serial
+            if now < _alarm_clock and value <= _alarm_clock:
+                # The object has yet to count down its alarms this
+                # frame, and this one will go off when it does.
+                _due_object_alarms.setdefault(self.owner, []).append(
+                    (key, serial))
+        self._times[key] = value
+
+    def __delitem__(self, key):
+        del self._times[key]
+        self._serials.pop(key, None)
+
+    def __iter__(self):
+        return iter(list(self._times))
+
+    def __len__(self):
+        return len(self._times)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def resume(self):
+        # Start counting down the alarms.
+        if not self.scheduled:
+            self.scheduled = True
+            for key, value in list(self._times.items()):
+                self[key] = value
+
+    def suspend(self):
+        # Stop counting down the alarms.
+        if self.scheduled:
+            now = self._now()
+            for key in self._times:
+                self._times[key] -= now
+            self._serials.clear()
+            self.scheduled = False
+
+
+def _schedule_alarm(due, alarms, key):
+    # Add an alarm to the schedule and return its serial number.
+    global _alarm_serial, _alarm_heap, _alarm_compact_size
+    _alarm_serial += 1
+    heapq.heappush(_alarm_heap, (due, _alarm_serial, alarms, key))
+
+    if len(_alarm_heap) > _alarm_compact_size:
+        _alarm_heap = [entry for entry in _alarm_heap
+                       if entry[2]._serials.get(entry[3]) == entry[1]]
+        heapq.heapify(_alarm_heap)
+        _alarm_compact_size = max(1024, 2 * len(_alarm_heap))
+
+    return _alarm_serial
+
+
+def _pop_due_alarms():
+    # Remove the alarms which are due from the schedule and return them
+    # as a list of (owner, alarm_id) tuples in the order they are due.
+    # Alarms of objects are instead added to _due_object_alarms and are
+    # left in place until the objects are updated.
+    due = []
+    while _alarm_heap and _alarm_heap[0][0] <= _alarm_clock:
+        time, serial, alarms, key = heapq.heappop(_alarm_heap)
+        if alarms._serials.get(key) == serial:
+            if alarms.is_object:
+                _due_object_alarms.setdefault(alarms.owner, []).append(
+                    (key, serial))
+            else:
+                del alarms[key]
+                due.append((alarms.owner, key))
+
+    return due
+
+
+def o_fire_alarms(self):
+    # Count down the object's alarms for this frame and execute the
+    # alarm events of those which go off.
+    if _alarm_pending is not None:
+        _alarm_pending.discard(self)
+
+    if self in _due_object_alarms:
+        alarms = self.alarms
+        for key, serial in _due_object_alarms.pop(self):
+            if alarms._serials.get(key) == serial:
+                del alarms[key]
+                self.event_alarm(key)
+
+
+# Maps input event classes to a tuple of the names of the event method
+# and the paused event method it triggers, the names of the event
+# attributes passed to them, whether or not objects receive it, and
+# whether or not the room receives it before the game.  Filled in by
+# _get_input_event_handler, since sge.input is not loaded yet when this
+# module is.
+_input_event_handlers = {}
+
+
+def _get_input_event_handler(cls):
+    # Return the dispatch table entry for an input event class, or None
+    # if the class is not handled.
+    try:
+        return _input_event_handlers[cls]
+    except KeyError:
+        pass
+
+    if not _input_event_handlers:
+        joystick_args = ("js_name", "js_id")
+        _input_event_handlers.update({
+            sge.input.KeyPress: ("key_press", ("key", "char"), True, False),
+            sge.input.KeyRelease: ("key_release", ("key",), True, False),
+            sge.input.MouseMove: ("mouse_move", ("x", "y"), True, False),
+            sge.input.MouseButtonPress: (
+                "mouse_button_press", ("button",), True, False),
+            sge.input.MouseButtonRelease: (
+                "mouse_button_release", ("button",), True, False),
+            sge.input.JoystickAxisMove: (
+                "joystick_axis_move", joystick_args + ("axis", "value"),
+                True, False),
+            sge.input.JoystickHatMove: (
+                "joystick_hat_move", joystick_args + ("hat", "x", "y"),
+                True, False),
+            sge.input.JoystickTrackballMove: (
+                "joystick_trackball_move", joystick_args + ("ball", "x", "y"),
+                True, False),
+            sge.input.JoystickButtonPress: (
+                "joystick_button_press", joystick_args + ("button",), True,
+                False),
+            sge.input.JoystickButtonRelease: (
+                "joystick_button_release", joystick_args + ("button",), True,
+                False),
+            sge.input.JoystickEvent: (
+                "joystick",
+                joystick_args + ("input_type", "input_id", "value"), True,
+                False),
+            sge.input.KeyboardFocusGain: (
+                "gain_keyboard_focus", (), False, False),
+            sge.input.KeyboardFocusLose: (
+                "lose_keyboard_focus", (), False, False),
+            sge.input.MouseFocusGain: ("gain_mouse_focus", (), False, False),
+            sge.input.MouseFocusLose: ("lose_mouse_focus", (), False, False),
+            sge.input.QuitRequest: ("close", (), False, True)})
+
+        for event_cls, entry in list(_input_event_handlers.items()):
+            name = entry[0]
+            _input_event_handlers[event_cls] = (
+                "event_" + name, "event_paused_" + name) + entry[1:]
+
+    # Subclasses of the input event classes are handled like the class
+    # they derive from.
+    handler = None
+    for base in inspect.getmro(cls):
+        if base in _input_event_handlers:
+            handler = _input_event_handlers[base]
+            break
+
+    _input_event_handlers[cls] = handler
+    return handler
+
+
+def _handle_input_event(game, event, paused=False):
+    # Call the event methods corresponding to an input event.
+    handler = _get_input_event_handler(type(event))
+    if handler is None:
+        return
+
+    name, paused_name, attrs, to_objects, room_first = handler
+    if paused:
+        name = paused_name
+    args = [getattr(event, attr) for attr in attrs]
+    room = game.current_room
+
+    if room_first:
+        getattr(room, name)(*args)
+        getattr(game, name)(*args)
+    else:
+        getattr(game, name)(*args)
+        getattr(room, name)(*args)
+
+    if to_objects:
+        if paused:
+            objects = room.objects[:]
+        else:
+            objects = _active_objects.copy()
+
+        for obj in objects:
+            getattr(obj, name)(*args)
+
+
+def _filter_axis(value):
+    # Return a joystick axis value clamped, with the deadzone and
+    # quantization applied.
+    value = max(-1.0, min(value, 1.0))
+    if abs(value) <= _axis_deadzone:
+        return 0
+    elif _axis_step:
+        return max(-1.0, min(round(value / _axis_step) * _axis_step, 1.0))
+    else:
+        return value
+
+
+def _read_joystick(joystick):
+    # Return the current (axes, hats, buttons) state of a joystick.
+    joy = game_joysticks[joystick]
+    if joy is None:
+        return _NO_JOYSTICK
+
+    numaxes, numhats, numballs, numbuttons = _js_caps[joystick]
+    axes = tuple(_filter_axis(joy.get_axis(i))
+                 for i in six.moves.range(numaxes))
+    hats = tuple(joy.get_hat(i) for i in six.moves.range(numhats))
+    buttons = tuple(joy.get_button(i) for i in six.moves.range(numbuttons))
+    return (axes, hats, buttons)
+
+
+def _get_js_instance_id(joy, default):
+    # Return the ID Pygame uses for joy in events.  Older versions of
+    # Pygame use the device number, passed as default.
+    try:
+        return joy.get_instance_id()
+    except AttributeError:
+        return default
+
+
+def _add_joystick(joy, instance_id):
+    # Open a joystick and give it the first free number, returning
+    # that number.
+    joy.init()
+    caps = (joy.get_numaxes(), joy.get_numhats(), joy.get_numballs(),
+            joy.get_numbuttons())
+    try:
+        i = game_joysticks.index(None)
+    except ValueError:
+        i = len(game_joysticks)
+        game_joysticks.append(None)
+        _js_caps.append(None)
+
+    game_joysticks[i] = joy
+    _js_caps[i] = caps
+    _js_instances[instance_id] = i
+    name = joy.get_name()
+    game_js_names[i] = name
+    if name not in game_js_ids or game_js_ids[name] > i:
+        game_js_ids[name] = i
+
+    _forget_joystick_state(i)
+    return i
+
+
+def _remove_joystick(instance_id):
+    # Forget a joystick which has been unplugged, returning its number
+    # or None if it wasn't known.
+    i = _js_instances.pop(instance_id, None)
+    if i is None:
+        return None
+
+    game_joysticks[i] = None
+    _js_caps[i] = None
+    name = game_js_names.pop(i)
+    if game_js_ids.get(name) == i:
+        del game_js_ids[name]
+        others = [j for j in game_js_names if game_js_names[j] == name]
+        if others:
+            game_js_ids[name] = min(others)
+
+    while game_joysticks and game_joysticks[-1] is None:
+        game_joysticks.pop()
+        _js_caps.pop()
+
+    _forget_joystick_state(i)
+    return i
+
+
+def _forget_joystick_state(joystick):
+    # Discard the recorded state of a joystick number.
+    for axis_id in [k for k in _prev_axes if k[0] == joystick]:
+        del _prev_axes[axis_id]
+    for hat_id in [k for k in _prev_hats if k[0] == joystick]:
+        del _prev_hats[hat_id]
+
+    if joystick < len(_input_joysticks):
+        if joystick < len(game_joysticks):
+            _input_joysticks[joystick] = _read_joystick(joystick)
+        else:
+            _input_joysticks[joystick] = _NO_JOYSTICK
+
+
+def _get_joystick_event_id(event):
+    # Return the (number, name) of the joystick an event is from, or
+    # (None, None) if it isn't known.
+    i = _js_instances.get(getattr(event, "instance_id", event.joy))
+    if i is None:
+        return (None, None)
+    return (i, game_js_names[i])
+
+
+def _update_input_state():
+    # Take a snapshot of the keyboard, mouse, and joystick states.
+    global _input_keys, _input_mods, _input_mouse_buttons
+    global _input_mouse_pos, _input_joysticks
+
+    _input_keys = pygame.key.get_pressed()
+    _input_mods = pygame.key.get_mods()
+    _input_mouse_buttons = pygame.mouse.get_pressed()[:3]
+    _input_mouse_pos = pygame.mouse.get_pos()
+
+    _input_joysticks = [_read_joystick(i)
+                        for i in six.moves.range(len(game_joysticks))]
+
+
+def _get_joystick_state(joystick):
+    # Return the (axes, hats, buttons) snapshot of a joystick, or None.
+    if joystick is not None and joystick >= 0:
+        if joystick < len(_input_joysticks):
+            return _input_joysticks[joystick]
+        elif joystick < len(game_joysticks):
+            return _read_joystick(joystick)
+
+    return None
+
+
 def _get_hat(joystick, hat):
     # Return the position of a joystick HAT.
-    if (joystick is not None and joystick < len(game_joysticks) and
-            hat < game_joysticks[joystick].get_numhats()):
-        return game_joysticks[joystick].get_hat(hat)
+    state = _get_joystick_state(joystick)
+    if state is not None and 0 <= hat < len(state[1]):
+        return state[1][hat]
     else:
         return (0, 0)
 
@@ -506,27 +1559,20 @@ def o_update(self, time_passed, delta_mult):
     # Update this object (should be called each frame).
     # Update the animation frame.
     if self.image_fps and isinstance(self.sprite, sge.gfx.Sprite):
-        self.rd["anim_count"] += time_passed
-        self.rd["image_index"] += int(self.rd["anim_count"] / self.rd["frame_time"])
-        self.rd["anim_count"] %= abs(self.rd["frame_time"])
+        self._anim_count += time_passed
+        self._image_index += int(self._anim_count / self._frame_time)
+        self._anim_count %= abs(self._frame_time)
 
         if self.sprite is not None:
-            while self.rd["image_index"] >= self.sprite.frames:
-                self.rd["image_index"] -= self.sprite.frames
+            while self._image_index >= self.sprite.frames:
+                self._image_index -= self.sprite.frames
                 self.event_animation_end()
-            while self.rd["image_index"] < 0:
-                self.rd["image_index"] += self.sprite.frames
+            while self._image_index < 0:
+                self._image_index += self.sprite.frames
                 self.event_animation_end()
 
     # Alarms
-    activated_alarms = []
-    for a in self.alarms:
-        self.alarms[a] -= delta_mult
-        if self.alarms[a] <= 0:
-            activated_alarms.append(a)
-    for a in activated_alarms:
-        del self.alarms[a]
-        self.event_alarm(a)
+    o_fire_alarms(self)
 
     # Movement
     if self is not sge.game.mouse:
@@ -551,7 +1597,7 @@ def o_update_object_areas(self):
     else:
         my_areas = set()
 
-    for area in my_areas ^ self.rd["object_areas"]:
+    for area in my_areas ^ self._object_areas:
         if area in my_areas:
             if area is None:
                 area = (None, None)
@@ -559,7 +1605,7 @@ def o_update_object_areas(self):
             if (i is not None and j is not None and
                     i < len(room.object_areas) and
                     j < len(room.object_areas[i])):
-                oa = room.object_areas[i][j].copy()
+                oa = set(room.object_areas[i][j])
                 oa.add(self)
                 room.object_areas[i][j] = oa
             else:
@@ -572,7 +1618,7 @@ def o_update_object_areas(self):
                     e += "\nAvailable areas: {}x{}".format(x, y)
                     warnings.warn(e)
 
-                oa = room.object_area_void.copy()
+                oa = set(room.object_area_void)
                 oa.add(self)
                 room.object_area_void = oa
         else:
@@ -582,7 +1628,7 @@ def o_update_object_areas(self):
             if (i is not None and j is not None and
                     i < len(room.object_areas) and
                     j < len(room.object_areas[i])):
-                oa = room.object_areas[i][j].copy()
+                oa = set(room.object_areas[i][j])
                 oa.discard(self)
                 room.object_areas[i][j] = oa
             else:
@@ -595,42 +1641,57 @@ def o_update_object_areas(self):
                     e += "\nAvailable areas: {}x{}".format(x, y)
                     warnings.warn(e)
 
-                oa = room.object_area_void.copy()
+                oa = set(room.object_area_void)
                 oa.discard(self)
                 room.object_area_void = oa
 
-    self.rd["object_areas"] = my_areas
+    if room is not None and room.rd["class_areas"]:
+        changed = my_areas ^ self._object_areas
+        for cls in room.rd["class_areas"]:
+            if isinstance(self, cls):
+                _update_class_areas(room.rd["class_areas"][cls], self,
+                                    changed, my_areas)
+
+    self._object_areas = my_areas
+
+
+def _update_class_areas(index, obj, changed, my_areas):
+    # Add obj to or remove it from the object areas of a class index,
+    # which is a list in the form [object_areas, object_area_void].
+    # Like the room's own object areas, these are replaced rather than
+    # modified.
+    areas = index[0]
+    for area in changed:
+        if (area is not None and area[0] < len(areas) and
+                area[1] < len(areas[area[0]])):
+            i, j = area
+            oa = set(areas[i][j])
+        else:
+            oa = set(index[1])
+
+        if area in my_areas:
+            oa.add(obj)
+        else:
+            oa.discard(obj)
+
+        if (area is not None and area[0] < len(areas) and
+                area[1] < len(areas[area[0]])):
+            areas[i][j] = oa
+        else:
+            index[1] = oa
 
 
 def o_update_collision_lists(self):
-    global _colliders
-    global _collision_checkers
     if (self.tangible and sge.game.current_room is not None and
             self in sge.game.current_room.objects):
-        if self not in _colliders:
-            colliders = _colliders[:]
-            colliders.append(self)
-            _colliders = colliders
-
-        if (self.checks_collisions and self not in _collision_checkers):
-            collision_checkers = _collision_checkers[:]
-            collision_checkers.append(self)
-            _collision_checkers = collision_checkers
+        _colliders.append(self)
+        if self.checks_collisions:
+            _collision_checkers.append(self)
         else:
-            collision_checkers = _collision_checkers[:]
-            while self in collision_checkers:
-                collision_checkers.remove(self)
-            _collision_checkers = collision_checkers
+            _collision_checkers.discard(self)
     else:
-        colliders = _colliders[:]
-        while self in colliders:
-            colliders.remove(self)
-        _colliders = colliders
-
-        collision_checkers = _collision_checkers[:]
-        while self in collision_checkers:
-            collision_checkers.remove(self)
-        _collision_checkers = collision_checkers
+        _colliders.discard(self)
+        _collision_checkers.discard(self)
 
 
 def o_is_other(self, other=None):
@@ -650,14 +1711,24 @@ def o_is_other(self, other=None):
 
 def o_detect_collisions(self):
     assert self.checks_collisions
-    for other in self.rd["colliders"]:
+    for other in self._colliders:
         if other is self:
             continue
 
         # Delete self from the other object's list of colliders to
         # prevent redundancy.
-        while self in other.rd["colliders"]:
-            other.rd["colliders"].remove(self)
+        while self in other._colliders:
+            other._colliders.remove(self)
+
+        # Tile grids only collide where tiles are solid; the tiles
+        # touched are found once for both the check and the events.
+        touching = o_get_touching_tiles(self, other)
+        if touching is not None:
+            room = sge.game.current_room
+            if (touching[1] and self.tangible and other.tangible and
+                    self in room.objects and other in room.objects):
+                o_tile_collision_events(self, other, *touching)
+            continue
 
         if self.collision(other):
             self_prev_bbox_left = self.xprevious + self.bbox_x
@@ -691,6 +1762,150 @@ def o_detect_collisions(self):
             other.event_collision(self, -xdirection, -ydirection)
 
 
+def o_get_tile_grid(self):
+    # Return the sprite of an object if it's a tile grid with solid
+    # tiles, or None.
+    sprite = self.sprite
+    if (isinstance(sprite, sge.gfx.TileGrid) and sprite.solid is not None and
+            sprite.render_method != "isometric"):
+        return sprite
+    else:
+        return None
+
+
+def o_get_touching_tiles(self, other, x=0, y=0):
+    # If either object uses a tile grid with solid tiles, return
+    # (owner, tiles), where owner is the object using the grid and
+    # tiles is a list of the solid tiles the other object touches with
+    # self offset by (x, y).  Otherwise, return None.
+    grid = o_get_tile_grid(other)
+    if grid is not None:
+        owner = other
+        actor = self
+        ax = x
+        ay = y
+        gx = 0
+        gy = 0
+    else:
+        grid = o_get_tile_grid(self)
+        if grid is None:
+            return None
+        owner = self
+        actor = other
+        ax = 0
+        ay = 0
+        gx = x
+        gy = y
+
+    gx += owner.x - owner.image_origin_x
+    gy += owner.y - owner.image_origin_y
+    precise = actor.collision_precise or actor.collision_ellipse
+    if precise:
+        mask = actor.mask
+        ax += actor.mask_x
+        ay += actor.mask_y
+        w = len(mask)
+        h = len(mask[0]) if mask else 0
+    else:
+        ax += actor.bbox_left
+        ay += actor.bbox_top
+        w = actor.bbox_width
+        h = actor.bbox_height
+
+    tiles = grid.get_solid_tiles(ax - gx, ay - gy, w, h)
+
+    if precise and tiles:
+        tw = grid.tile_width
+        th = grid.tile_height
+        mask_id = ("tile_masks", tw, th)
+        tile_mask = cache.get(mask_id)
+        if tile_mask is None:
+            tile_mask = [[True for j in six.moves.range(int(th))]
+                         for i in six.moves.range(int(tw))]
+            cache.add(mask_id, tile_mask)
+
+        n = grid.section_length
+        tiles = [tile for tile in tiles
+                 if sge.collision.masks_collide(
+                     ax, ay, mask, gx + (tile % n) * tw, gy + (tile // n) * th,
+                     tile_mask)]
+
+    return (owner, tiles)
+
+
+def o_tile_collision_events(self, other, owner, tiles):
+    # Call the tile collision events of self and other for each tile
+    # of owner's tile grid touched, with directions based on where the
+    # other object was relative to each tile in the previous frame.
+    actor = other if owner is self else self
+    grid = owner.sprite
+    n = grid.section_length
+    tw = grid.tile_width
+    th = grid.tile_height
+    gx = owner.xprevious - owner.image_origin_x
+    gy = owner.yprevious - owner.image_origin_y
+    prev_left = actor.xprevious + actor.bbox_x
+    prev_right = prev_left + actor.bbox_width
+    prev_top = actor.yprevious + actor.bbox_y
+    prev_bottom = prev_top + actor.bbox_height
+
+    for tile in tiles:
+        tile_left = gx + (tile % n) * tw
+        tile_top = gy + (tile // n) * th
+
+        if prev_right <= tile_left:
+            xdirection = 1
+        elif prev_left >= tile_left + tw:
+            xdirection = -1
+        else:
+            xdirection = 0
+
+        if prev_bottom <= tile_top:
+            ydirection = 1
+        elif prev_top >= tile_top + th:
+            ydirection = -1
+        else:
+            ydirection = 0
+
+        if actor is self:
+            self.event_tile_collision(other, tile, xdirection, ydirection)
+            other.event_tile_collision(self, tile, -xdirection, -ydirection)
+        else:
+            self.event_tile_collision(other, tile, -xdirection, -ydirection)
+            other.event_tile_collision(self, tile, xdirection, ydirection)
+
+
+def o_detect_continuous_collision(self):
+    # Sweep the bounding box from its previous position to its current
+    # one and report the first object touched on the way.
+    dx = self.x - self.xprevious
+    dy = self.y - self.yprevious
+    if not dx and not dy:
+        return
+
+    hw = self.bbox_width / 2
+    hh = self.bbox_height / 2
+    x = self.xprevious + self.bbox_x + hw
+    y = self.yprevious + self.bbox_y + hh
+    # Objects already touching at the start are left to the normal
+    # collision detection.
+    hits = r_sweep(sge.game.current_room, x, y, dx, dy, hw, hh, first=True,
+                   exclude=self, skip_start=True)
+
+    if hits:
+        t, other, xnormal, ynormal, tile = hits[0]
+        if tile is not None:
+            # Tiles of a tile grid are reported as tile collisions.
+            touching = o_get_touching_tiles(self, other)
+            if touching is None or tile not in touching[1]:
+                o_tile_collision_events(self, other, other, [tile])
+        elif not self.collision(other):
+            self.event_collision(other, -xnormal, -ynormal)
+            other.event_collision(self, xnormal, ynormal)
+
+        self.event_continuous_collision(other, t, xnormal, ynormal)
+
+
 def o_get_origin_offset(self):
     # Return the amount to offset the origin as (x, y).
     if isinstance(self.sprite, sge.gfx.Sprite):
@@ -737,11 +1952,28 @@ def o_get_origin_offset(self):
     return (x_offset, y_offset)
 
 
+def o_get_regulated_origin(self):
+    # Return the regulated origin as (x, y).  This only depends on the
+    # size and origin of the sprite and the transformation, so it is
+    # shared between all objects through the cache.
+    i = ("o_origin", self.sprite.width, self.sprite.height,
+         self.sprite.origin_x, self.sprite.origin_y, self.image_xscale,
+         self.image_yscale, self.image_rotation)
+    origin = cache.get(i)
+    if origin is None:
+        x_offset, y_offset = o_get_origin_offset(self)
+        origin = (self.sprite.origin_x + x_offset,
+                  self.sprite.origin_y + y_offset)
+
+    cache.add(i, origin)
+    return origin
+
+
 def o_set_speed(self):
     # Set the speed and move direction based on xvelocity and
     # yvelocity.
-    self.rd["speed"] = math.hypot(self.rd["xv"], self.rd["yv"])
-    self.rd["mv_dir"] = math.degrees(math.atan2(self.rd["yv"], self.rd["xv"]))
+    self._speed = math.hypot(self._xv, self._yv)
+    self._mv_dir = math.degrees(math.atan2(self._yv, self._xv))
 
 
 def r_get_rectangle_object_areas(self, x, y, width, height):
@@ -782,160 +2014,1077 @@ def r_get_rectangle_object_areas(self, x, y, width, height):
     return areas
 
 
-def r_set_object_areas(self, update_objects=True):
-    self.object_areas = []
-    for i in six.moves.range(0, self.width, self.object_area_width):
-        column = [set() for j in six.moves.range(0, self.height,
-                                                 self.object_area_height)]
-        self.object_areas.append(column)
+def r_get_area_index(self, other=None):
+    # Return the (object_areas, object_area_void) to search for objects
+    # matching other, using a class index if there is one.
+    if inspect.isclass(other):
+        index = self.rd["class_areas"].get(other)
+        if index is not None:
+            return index
+
+    return (self.object_areas, self.object_area_void)
+
+
+def r_iter_objects_at(self, x, y, width, height, other=None):
+    # Yield each object in the object areas a rect is in, once each,
+    # without building any sets.  An object's object areas always form
+    # a rectangle (plus the void), so an object is skipped in an area if
+    # it is also in the area to the left or above, where it has already
+    # been yielded.  Object areas are replaced rather than modified, so
+    # objects can safely move during iteration.  rd["area_queries"]
+    # counts the lookups and the objects found in their areas.
+    areas, void = r_get_area_index(self, other)
+    queries = self.rd["area_queries"]
+    queries[0] += 1
+    xis = int(math.floor(x / self.object_area_width))
+    yis = int(math.floor(y / self.object_area_height))
+    # Points and lines on the edge of an object area are in the
+    # object area after the edge.
+    xie = max(int(math.ceil((x + width) / self.object_area_width)), xis + 1)
+    yie = max(int(math.ceil((y + height) / self.object_area_height)), yis + 1)
+
+    if not (areas and xis < len(areas) and yis < len(areas[0]) and
+            xie > 0 and yie > 0):
+        queries[1] += len(void)
+        for obj in void:
+            yield obj
+        return
+
+    use_void = (xis < 0 or yis < 0 or xie > len(areas) or
+                yie > len(areas[0]))
+    xis = max(xis, 0)
+    yis = max(yis, 0)
+    xie = min(xie, len(areas))
+    yie = min(yie, len(areas[0]))
+
+    if use_void:
+        queries[1] += len(void)
+        for obj in void:
+            yield obj
+
+    for xi in six.moves.range(xis, xie):
+        column = areas[xi]
+        left = areas[xi - 1] if xi > xis else None
+        for yi in six.moves.range(yis, yie):
+            area = column[yi]
+            queries[1] += len(area)
+            for obj in area:
+                if ((use_void and None in obj._object_areas) or
+                        (left is not None and obj in left[yi]) or
+                        (yi > yis and obj in column[yi - 1])):
+                    continue
+                yield obj
+
+
+def r_get_nearest_objects(self, x, y, k, radius, other, tangible):
+    # Return up to k objects matching other and tangible whose bounding
+    # boxes are closest to (x, y), searching the object areas in rings
+    # around the point until no closer object can be found.
+    areas, void = r_get_area_index(self, other)
+    best = []
+    serial = 0
+    seen = set()
+    aw = self.object_area_width
+    ah = self.object_area_height
+    ci = int(math.floor(x / aw))
+    cj = int(math.floor(y / ah))
+    cols = len(areas)
+    rows = len(areas[0]) if cols else 0
+    last_ring = max(abs(ci), abs(cols - 1 - ci), abs(cj), abs(rows - 1 - cj))
+
+    n = -1
+    while n <= last_ring:
+        if n < 0:
+            # The void is searched first since it has no location.
+            candidates = [void]
+        else:
+            bound = (n - 1) * min(aw, ah)
+            if ((len(best) >= k and bound > -best[0][0]) or
+                    (radius is not None and bound > radius)):
+                break
 
+            candidates = []
+            for i in six.moves.range(max(ci - n, 0), min(ci + n + 1, cols)):
+                if abs(i - ci) == n:
+                    js = six.moves.range(max(cj - n, 0),
+                                         min(cj + n + 1, rows))
+                else:
+                    js = [j for j in (cj - n, cj + n) if 0 <= j < rows]
+                for j in js:
+                    candidates.append(areas[i][j])
+
+        for area in candidates:
+            for obj in area:
+                if (obj in seen or
+                        (tangible is not None and obj.tangible != tangible)
+                        or not o_is_other(obj, other)):
+                    continue
+
+                seen.add(obj)
+                dx = max(obj.bbox_left - x, 0, x - obj.bbox_right)
+                dy = max(obj.bbox_top - y, 0, y - obj.bbox_bottom)
+                dist = math.hypot(dx, dy)
+                if radius is not None and dist > radius:
+                    continue
+
+                serial += 1
+                if len(best) < k:
+                    heapq.heappush(best, (-dist, serial, obj))
+                elif dist < -best[0][0]:
+                    heapq.heapreplace(best, (-dist, serial, obj))
+
+        n += 1
+
+    best.sort(key=lambda item: (-item[0], item[1]))
+    return [item[2] for item in best]
+
+
+def _ray_box(x, y, dx, dy, left, top, right, bottom):
+    # Return (t, xnormal, ynormal) for where the segment from (x, y) to
+    # (x + dx, y + dy) enters a box, where t is the fraction of the
+    # segment travelled, or None if it doesn't.  A segment starting
+    # inside of the box hits it at t=0 with no normal.
+    tmin = 0
+    tmax = 1
+    xnormal = 0
+    ynormal = 0
+
+    if dx:
+        t1 = (left - x) / dx
+        t2 = (right - x) / dx
+        normal = -1
+        if t1 > t2:
+            t1, t2 = t2, t1
+            normal = 1
+        if t1 > tmin:
+            tmin = t1
+            xnormal, ynormal = normal, 0
+        tmax = min(tmax, t2)
+    elif not left <= x < right:
+        return None
+
+    if dy:
+        t1 = (top - y) / dy
+        t2 = (bottom - y) / dy
+        normal = -1
+        if t1 > t2:
+            t1, t2 = t2, t1
+            normal = 1
+        if t1 > tmin:
+            tmin = t1
+            xnormal, ynormal = 0, normal
+        tmax = min(tmax, t2)
+    elif not top <= y < bottom:
+        return None
+
+    if tmin > tmax or (tmin == tmax and tmin > 0):
+        return None
+
+    return (tmin, xnormal, ynormal)
+
+
+def _ray_circle(x, y, dx, dy, cx, cy, radius):
+    # Return (t, xnormal, ynormal) for where the segment from (x, y) to
+    # (x + dx, y + dy) enters a circle, or None if it doesn't.
+    ox = x - cx
+    oy = y - cy
+    c = ox ** 2 + oy ** 2 - radius ** 2
+    if c <= 0:
+        return (0, 0, 0)
+
+    a = dx ** 2 + dy ** 2
+    b = ox * dx + oy * dy
+    if not a or b >= 0:
+        return None
+
+    disc = b ** 2 - a * c
+    if disc < 0:
+        return None
+
+    t = (-b - math.sqrt(disc)) / a
+    if t > 1:
+        return None
+
+    return (t, (ox + dx * t) / radius, (oy + dy * t) / radius)
+
+
+def _ray_mask(x, y, dx, dy, mx, my, mask):
+    # Return (t, xnormal, ynormal) for where the segment from (x, y) to
+    # (x + dx, y + dy) first touches a solid pixel of a mask positioned
+    # at (mx, my), or None if it doesn't.  The pixels are walked in
+    # order along the segment.
+    w = len(mask)
+    h = len(mask[0]) if w else 0
+    hit = _ray_box(x, y, dx, dy, mx, my, mx + w, my + h)
+    if hit is None:
+        return None
+
+    t, xnormal, ynormal = hit
+    px = x + dx * t - mx
+    py = y + dy * t - my
+    i = min(max(int(math.floor(px)), 0), w - 1)
+    j = min(max(int(math.floor(py)), 0), h - 1)
+
+    if dx > 0:
+        stepi = 1
+        tnext_x = t + (i + 1 - px) / dx
+        tdelta_x = 1 / dx
+    elif dx < 0:
+        stepi = -1
+        tnext_x = t + (i - px) / dx
+        tdelta_x = -1 / dx
+    else:
+        stepi = 0
+        tnext_x = tdelta_x = float("inf")
+
+    if dy > 0:
+        stepj = 1
+        tnext_y = t + (j + 1 - py) / dy
+        tdelta_y = 1 / dy
+    elif dy < 0:
+        stepj = -1
+        tnext_y = t + (j - py) / dy
+        tdelta_y = -1 / dy
+    else:
+        stepj = 0
+        tnext_y = tdelta_y = float("inf")
+
+    while 0 <= i < w and 0 <= j < h and t <= 1:
+        if mask[i][j]:
+            return (t, xnormal, ynormal)
+
+        if tnext_x < tnext_y:
+            t = tnext_x
+            tnext_x += tdelta_x
+            i += stepi
+            xnormal, ynormal = -stepi, 0
+        else:
+            t = tnext_y
+            tnext_y += tdelta_y
+            j += stepj
+            xnormal, ynormal = 0, -stepj
+
+    return None
+
+
+def _sweep_rect(left, top, right, bottom, x, y, dx, dy, hw, hh, radius):
+    # Return (t, xnormal, ynormal) for where a point, box, or circle
+    # centered at (x, y) moving by (dx, dy) first touches a rectangle,
+    # or None.
+    if radius is not None:
+        # A rectangle with rounded corners: two boxes and four circles.
+        hits = [_ray_box(x, y, dx, dy, left - radius, top, right + radius,
+                         bottom),
+                _ray_box(x, y, dx, dy, left, top - radius, right,
+                         bottom + radius)]
+        for cx in (left, right):
+            for cy in (top, bottom):
+                hits.append(_ray_circle(x, y, dx, dy, cx, cy, radius))
+
+        hits = [hit for hit in hits if hit is not None]
+        return min(hits, key=lambda hit: hit[0]) if hits else None
+    else:
+        return _ray_box(x, y, dx, dy, left - hw, top - hh, right + hw,
+                        bottom + hh)
+
+
+def _sweep_hit(obj, x, y, dx, dy, hw, hh, radius):
+    # Return (t, xnormal, ynormal) for where a point, box, or circle
+    # centered at (x, y) moving by (dx, dy) first touches obj, or None.
+    if (radius is None and not hw and not hh and
+            (obj.collision_precise or obj.collision_ellipse)):
+        return _ray_mask(x, y, dx, dy, int(round(obj.mask_x)),
+                         int(round(obj.mask_y)), obj.mask)
+    else:
+        return _sweep_rect(obj.bbox_left, obj.bbox_top, obj.bbox_right,
+                           obj.bbox_bottom, x, y, dx, dy, hw, hh, radius)
+
+
+def _sweep_tiles(obj, grid, x, y, dx, dy, hw, hh, radius, skip_start):
+    # Return (t, xnormal, ynormal, tile) for where a point, box, or
+    # circle centered at (x, y) moving by (dx, dy) first touches a solid
+    # tile of obj's tile grid, or None.  Only the tiles along the path
+    # are looked at: for each column of tiles the shape passes over,
+    # the rows it covers while it is over that column.  If skip_start
+    # is true, tiles already touched at the start are left out.
+    tw = grid.tile_width
+    th = grid.tile_height
+    n = grid.section_length
+    solid = grid.solid
+    rows = -(-len(solid) // n)
+
+    # Work relative to the grid.
+    gx = obj.x - obj.image_origin_x
+    gy = obj.y - obj.image_origin_y
+    x -= gx
+    y -= gy
+
+    imin = max(int(math.floor((min(x, x + dx) - hw) / tw)), 0)
+    imax = min(int(math.ceil((max(x, x + dx) + hw) / tw)), n)
+    best = None
+    for i in six.moves.range(imin, imax):
+        left = i * tw
+        right = left + tw
+        if dx:
+            t1 = (left - hw - x) / dx
+            t2 = (right + hw - x) / dx
+            if t1 > t2:
+                t1, t2 = t2, t1
+            t1 = max(t1, 0)
+            t2 = min(t2, 1)
+            if t1 > t2:
+                continue
+        else:
+            t1 = 0
+            t2 = 1
+
+        ya = y + dy * t1
+        yb = y + dy * t2
+        jmin = max(int(math.floor((min(ya, yb) - hh) / th)), 0)
+        jmax = min(int(math.ceil((max(ya, yb) + hh) / th)), rows)
+        for j in six.moves.range(jmin, jmax):
+            tile = j * n + i
+            if tile >= len(solid) or not solid[tile]:
+                continue
+
+            top = j * th
+            hit = _sweep_rect(left, top, right, top + th, x, y, dx, dy, hw,
+                              hh, radius)
+            if (hit is not None and not (skip_start and hit[0] <= 0) and
+                    (best is None or hit[0] < best[0])):
+                best = (hit[0], hit[1], hit[2], tile)
+
+    return best
+
+
+def r_sweep(self, x, y, dx, dy, hw=0, hh=0, radius=None, other=None,
+            first=False, exclude=None, skip_start=False):
+    # Return a list of (t, obj, xnormal, ynormal, tile) for the tangible
+    # objects touched by a point, box (with half-extents hw and hh), or
+    # circle centered at (x, y) moving by (dx, dy), sorted by t.  Tile
+    # grids with solid tiles are only touched at their solid tiles, and
+    # tile is the index of the first one touched (None for other
+    # objects).  The
+    # object areas along the way are walked in order (DDA traversal),
+    # along with enough neighboring areas to cover the size of the
+    # shape, so if first is true, the search stops at the first hit.
+    # If skip_start is true, objects already touched at the start are
+    # left out.
+    if radius is not None:
+        hw = hh = radius
+
+    areas, void = r_get_area_index(self, other)
+    aw = self.object_area_width
+    ah = self.object_area_height
+    cols = len(areas)
+    rows = len(areas[0]) if cols else 0
+    pi = int(hw // aw) + 1 if hw else 0
+    pj = int(hh // ah) + 1 if hh else 0
+
+    hits = []
+    seen = set()
+    best = float("inf")
+
+    def test(area):
+        for obj in area:
+            if (obj in seen or obj is exclude or not obj.tangible or
+                    not o_is_other(obj, other)):
+                continue
+
+            seen.add(obj)
+            grid = o_get_tile_grid(obj)
+            if grid is not None:
+                hit = _sweep_tiles(obj, grid, x, y, dx, dy, hw, hh, radius,
+                                   skip_start)
+                if hit is not None:
+                    hits.append((hit[0], obj, hit[1], hit[2], hit[3]))
+            else:
+                hit = _sweep_hit(obj, x, y, dx, dy, hw, hh, radius)
+                if hit is not None and not (skip_start and hit[0] <= 0):
+                    hits.append((hit[0], obj, hit[1], hit[2], None))
+
+    if (min(x, x + dx) - hw < 0 or min(y, y + dy) - hh < 0 or
+            max(x, x + dx) + hw > cols * aw or
+            max(y, y + dy) + hh > rows * ah):
+        test(void)
+
+    # Only the part of the path near the grid needs to be walked.
+    grid_box = (-(pi + 1) * aw, -(pj + 1) * ah, (cols + pi + 1) * aw,
+                (rows + pj + 1) * ah)
+    clip = _ray_box(x, y, dx, dy, *grid_box)
+    if clip is not None and cols and rows:
+        t = clip[0]
+        back = _ray_box(x + dx, y + dy, -dx, -dy, *grid_box)
+        t_end = 1 - back[0] if back is not None else t
+        i = int(math.floor((x + dx * t) / aw))
+        j = int(math.floor((y + dy * t) / ah))
+        iend = int(math.floor((x + dx) / aw))
+        jend = int(math.floor((y + dy) / ah))
+
+        if dx:
+            stepi = 1 if dx > 0 else -1
+            edge = (i + 1) * aw if dx > 0 else i * aw
+            tnext_x = (edge - x) / dx
+            tdelta_x = aw / abs(dx)
+        else:
+            stepi = 0
+            tnext_x = tdelta_x = float("inf")
+
+        if dy:
+            stepj = 1 if dy > 0 else -1
+            edge = (j + 1) * ah if dy > 0 else j * ah
+            tnext_y = (edge - y) / dy
+            tdelta_y = ah / abs(dy)
+        else:
+            stepj = 0
+            tnext_y = tdelta_y = float("inf")
+
+        while t <= t_end:
+            if first:
+                if hits:
+                    best = min(best, min(hit[0] for hit in hits))
+                if t > best:
+                    break
+
+            for ni in six.moves.range(max(i - pi, 0), min(i + pi + 1, cols)):
+                column = areas[ni]
+                for nj in six.moves.range(max(j - pj, 0),
+                                          min(j + pj + 1, rows)):
+                    test(column[nj])
+
+            if i == iend and j == jend:
+                break
+
+            if tnext_x < tnext_y:
+                t = tnext_x
+                tnext_x += tdelta_x
+                i += stepi
+            else:
+                t = tnext_y
+                tnext_y += tdelta_y
+                j += stepj
+
+    hits.sort(key=lambda hit: hit[0])
+    if first:
+        del hits[1:]
+
+    return hits
+
+
+def r_set_object_areas(self, update_objects=True):
+    cols = len(six.moves.range(0, self.width, self.object_area_width))
+    rows = len(six.moves.range(0, self.height, self.object_area_height))
+    sparse = (self.chunk_width is not None or
+              cols * rows > SPARSE_AREA_THRESHOLD)
+    self.object_areas = _new_object_areas(cols, rows, sparse)
     self.object_area_void = set()
+    self.rd["area_queries"] = [0, 0]
+
+    for cls in self.rd["class_areas"]:
+        self.rd["class_areas"][cls] = [_new_object_areas(cols, rows, sparse),
+                                       set()]
 
-    if update_objects:
+    if update_objects and self is sge.game.current_room:
         for obj in self.objects:
+            # The old object areas no longer exist, so every object has
+            # to be added to the new ones from scratch.
+            obj._object_areas = set()
             o_update_object_areas(obj)
 
 
+def r_get_object_area_stats(self):
+    # Return the statistics of a room's object areas; see
+    # sge.dsp.Room.get_object_area_stats.
+    objects = 0
+    void = 0
+    memberships = 0
+    cells = set()
+    for obj in self.objects:
+        areas = obj._object_areas
+        if areas:
+            objects += 1
+            if None in areas:
+                void += 1
+                areas = areas - {None}
+            memberships += len(areas)
+            cells |= areas
+
+    queries, candidates = self.rd["area_queries"]
+    return {"objects": objects, "void": void, "cells": len(cells),
+            "objects_per_cell": memberships / len(cells) if cells else 0,
+            "cells_per_object": memberships / objects if objects else 0,
+            "queries": queries,
+            "candidates_per_query": candidates / queries if queries else 0}
+
+
+def r_tune_object_areas(self):
+    # Set the object area size of a room with object_area_auto enabled
+    # to the average size of the objects other than the mouse which
+    # check for collisions (or of all tangible objects if none do).
+    # The object areas are only rebuilt when the size is off by more
+    # than a factor of AUTO_AREA_TOLERANCE, and this is only checked
+    # every AUTO_AREA_INTERVAL frames; rd["area_tune_timer"] is set to
+    # 0 when the room starts so that it is checked right away.
+    if not self.object_area_auto:
+        return
+
+    self.rd["area_tune_timer"] -= 1
+    if self.rd["area_tune_timer"] > 0:
+        return
+    self.rd["area_tune_timer"] = AUTO_AREA_INTERVAL
+
+    mouse = sge.game.mouse
+    objects = [obj for obj in _collision_checkers if obj is not mouse]
+    if not objects:
+        objects = [obj for obj in _colliders if obj is not mouse]
+        if not objects:
+            return
+
+    width = 0
+    height = 0
+    for obj in objects:
+        width += obj.bbox_width
+        height += obj.bbox_height
+    width = max(int(round(width / len(objects))), AUTO_AREA_MIN_SIZE)
+    height = max(int(round(height / len(objects))), AUTO_AREA_MIN_SIZE)
+
+    aw = self.object_area_width
+    ah = self.object_area_height
+    if (max(width / aw, aw / width) > AUTO_AREA_TOLERANCE or
+            max(height / ah, ah / height) > AUTO_AREA_TOLERANCE):
+        # Both sizes are set before the object areas are rebuilt so
+        # that they are only rebuilt once.
+        self._object_area_width = width
+        self._object_area_height = height
+        r_set_object_areas(self)
+
+
+def r_update_activation(self):
+    # Put objects outside of the activation region to sleep and wake
+    # sleeping objects inside of it.  rd["asleep"] maps each object the
+    # SGE put to sleep to whether or not it was tangible.  Objects are
+    # only added after they are made inactive and removed before they
+    # are made active, since the active setter drops the entries of
+    # objects whose activity is changed by anything else.
+    asleep = self.rd["asleep"]
+    margin = self.activation_margin
+    if margin is None:
+        if asleep:
+            for obj in list(asleep):
+                r_wake_object(self, obj)
+        return
+
+    near = set()
+    for view in self.views:
+        near |= self.get_objects_at(view.x - margin, view.y - margin,
+                                    view.width + 2 * margin,
+                                    view.height + 2 * margin)
+
+    for obj in list(_active_objects):
+        if obj not in near and obj is not sge.game.mouse:
+            obj.active = False
+            asleep.setdefault(obj, obj.tangible)
+            if self.activation_untangible:
+                obj.tangible = False
+
+    if asleep:
+        for obj in near:
+            if obj in asleep:
+                r_wake_object(self, obj)
+
+
+def r_wake_object(self, obj):
+    # Restore an object put to sleep by r_update_activation.
+    tangible = self.rd["asleep"].pop(obj)
+    obj.active = True
+    obj.tangible = tangible
+
+
+def r_update_chunks(self):
+    # Load the chunks of a streaming room near the views and unload the
+    # others.  rd["chunks"] maps unloaded chunks to the snapshot records
+    # of their objects, and rd["chunk_sprites"] holds on to the sprites
+    # the records refer to.  rd["loaded_chunks"] is None until the
+    # first update, when all objects in the room count as loaded.
+    cw = self.chunk_width
+    if cw is None:
+        return
+
+    ch = self.chunk_height
+    margin = self.chunk_margin
+    near = set()
+    for view in self.views:
+        cis = int(math.floor((view.x - margin) / cw))
+        cie = int(math.floor((view.x + view.width + margin) / cw))
+        cjs = int(math.floor((view.y - margin) / ch))
+        cje = int(math.floor((view.y + view.height + margin) / ch))
+        for i in six.moves.range(cis, cie + 1):
+            for j in six.moves.range(cjs, cje + 1):
+                near.add((i, j))
+
+    loaded = self.rd["loaded_chunks"]
+    if loaded is None:
+        gone = set()
+        new = near
+    else:
+        gone = loaded - near
+        new = near - loaded
+        if not gone and not new:
+            return
+
+    chunks = self.rd["chunks"]
+    chunk_sprites = self.rd["chunk_sprites"]
+    for chunk in sorted(gone):
+        self.event_chunk_unload(*chunk)
+
+    if gone or loaded is None:
+        # Every object outside of the near chunks is unloaded, including
+        # ones which have wandered into chunks that were never loaded.
+        asleep = self.rd["asleep"]
+        new_objects = self.rd["new_objects"]
+        mouse = sge.game.mouse
+        sprite_i = _snapshot_index["sprite"]
+        for obj in list(self.objects):
+            if obj is mouse or not obj.streamed or obj in new_objects:
+                continue
+
+            chunk = (int(math.floor(obj.x / cw)), int(math.floor(obj.y / ch)))
+            if chunk in near:
+                continue
+
+            _due_object_alarms.pop(obj, None)
+            record = o_get_snapshot(obj, asleep)
+            chunks.setdefault(chunk, []).append(record)
+            if obj.sprite is not None:
+                chunk_sprites[record[2][sprite_i]] = obj.sprite
+
+            asleep.pop(obj, None)
+            self.objects.remove(obj)
+            o_update_object_areas(obj)
+            o_update_collision_lists(obj)
+            _active_objects.discard(obj)
+            obj.alarms.suspend()
+
+    for chunk in sorted(new):
+        for record in chunks.pop(chunk, ()):
+            obj, kwargs = _find_snapshot_object(record, chunk_sprites)
+            o_set_snapshot(obj, record, kwargs)
+            self.objects.append(obj)
+            obj._object_areas = set()
+            o_update_object_areas(obj)
+            o_update_collision_lists(obj)
+            if obj.active:
+                _active_objects.add(obj)
+                obj.alarms.resume()
+
+        self.event_chunk_load(*chunk)
+
+    if not chunks:
+        chunk_sprites.clear()
+
+    self.rd["loaded_chunks"] = near
+
+
+def _get_snapshot_sprite_ref(sprite):
+    # Return the name a sprite is stored under in snapshots.  Sprites
+    # are referred to by their names; one which has the same name as a
+    # different sprite seen before is given a numbered name instead.
+    global _snapshot_serial
+    if sprite is None:
+        return None
+
+    ref = sprite.rd.get("snapshot_ref")
+    if ref is None:
+        ref = sprite.name or ""
+        known = _snapshot_sprites.get(ref)
+        if known is not None and known is not sprite:
+            _snapshot_serial += 1
+            ref = "{}#{}".format(ref, _snapshot_serial)
+        sprite.rd["snapshot_ref"] = ref
+        _snapshot_sprites[ref] = sprite
+
+    return ref
+
+
+def _get_snapshot_sprite(ref, sprites):
+    # Return the sprite a snapshot refers to as ``ref``.
+    if ref is None:
+        return None
+
+    if sprites is not None:
+        sprite = sprites.get(ref)
+        if sprite is None:
+            sprite = sprites.get(ref.split("#", 1)[0])
+        if sprite is not None:
+            return sprite
+
+    sprite = _snapshot_sprites.get(ref)
+    if sprite is None:
+        raise ValueError("Sprite {!r} not found.".format(ref))
+    return sprite
+
+
+def _get_snapshot_class(path):
+    # Return the class at the given "module:name" path.
+    cls = _snapshot_classes.get(path)
+    if cls is None:
+        module_name, name = path.split(":", 1)
+        cls = importlib.import_module(module_name)
+        for part in name.split("."):
+            cls = getattr(cls, part)
+        _snapshot_classes[path] = cls
+    return cls
+
+
+def o_get_snapshot(self, asleep):
+    # Return the snapshot record of the object.  ``asleep`` is the
+    # room's rd["asleep"]; sleeping objects are stored as awake.
+    global _snapshot_serial
+    serial = self.rd.get("snapshot_id")
+    if serial is None:
+        _snapshot_serial += 1
+        serial = self.rd["snapshot_id"] = _snapshot_serial
+        _snapshot_objects[serial] = self
+
+    cls = self.__class__
+    path = _snapshot_paths.get(cls)
+    if path is None:
+        path = "{}:{}".format(cls.__module__,
+                              getattr(cls, "__qualname__", cls.__name__))
+        _snapshot_paths[cls] = path
+
+    values = list(_get_snapshot_init_values(self))
+    i = _snapshot_index
+    sprite = values[i["sprite"]]
+    values[i["sprite"]] = _get_snapshot_sprite_ref(sprite)
+    if self in asleep:
+        values[i["active"]] = True
+        values[i["tangible"]] = asleep[self]
+    if values[i["image_blend"]] is not None:
+        values[i["image_blend"]] = tuple(values[i["image_blend"]])
+
+    # Values which follow the sprite are left that way.
+    if sprite is not None:
+        if values[i["image_origin_x"]] == sprite.origin_x:
+            values[i["image_origin_x"]] = None
+        if values[i["image_origin_y"]] == sprite.origin_y:
+            values[i["image_origin_y"]] = None
+        if values[i["image_fps"]] == sprite.fps:
+            values[i["image_fps"]] = None
+
+    alarms = self.alarms
+    return (serial, path, tuple(values), _get_snapshot_extra_values(self),
+            dict(alarms) if alarms else {}, self.get_snapshot_state())
+
+
+def _find_snapshot_object(record, sprites):
+    # Return the object a snapshot record is for and the arguments to
+    # pass to sge.dsp.Object.__init__ for it.  The object is the one
+    # the record was made from if it still exists, or else a new one
+    # created without calling its constructor.
+    serial, path, values = record[:3]
+    obj = _snapshot_objects.get(serial)
+    if obj is None:
+        cls = _get_snapshot_class(path)
+        obj = cls.__new__(cls)
+    kwargs = dict(zip(SNAPSHOT_INIT_FIELDS, values))
+    kwargs["sprite"] = _get_snapshot_sprite(kwargs["sprite"], sprites)
+    if kwargs["image_blend"] is not None:
+        kwargs["image_blend"] = sge.gfx.Color(kwargs["image_blend"])
+    return (obj, kwargs)
+
+
+def o_set_snapshot(self, record, kwargs):
+    # Put the object into the state in a snapshot record, with kwargs
+    # as returned by _find_snapshot_object.  The object must not be in
+    # a room.
+    serial, path, values, extras, alarms, state = record
+    sge.dsp.Object.__init__(self, **kwargs)
+    self.rd["snapshot_id"] = serial
+    _snapshot_objects[serial] = self
+    for name, value in zip(SNAPSHOT_EXTRA_FIELDS, extras):
+        setattr(self, name, value)
+    self.alarms.update(alarms)
+    self.set_snapshot_state(state)
+    self.alive = True
+
+
+def r_get_snapshot(self):
+    # Return a snapshot of the room; see sge.dsp.Room.get_snapshot.
+    asleep = self.rd["asleep"]
+    new_objects = self.rd["new_objects"]
+    mouse = sge.game.mouse
+    objects = []
+    pending = []
+    for obj in self.objects:
+        if obj is not mouse:
+            record = o_get_snapshot(obj, asleep)
+            objects.append(record)
+            if obj in new_objects:
+                pending.append(record[0])
+
+    views = [(view.x, view.y, view.xport, view.yport, view.width,
+              view.height, view.wport, view.hport) for view in self.views]
+
+    snapshot = {"objects": objects, "pending": pending, "views": views,
+                "alarms": dict(self.alarms),
+                "background": (self.background_x, self.background_y)}
+
+    if self.chunk_width is not None:
+        # Records are never modified, so they can be shared.
+        loaded = self.rd["loaded_chunks"]
+        snapshot["chunks"] = dict((chunk, list(records)) for chunk, records
+                                  in self.rd["chunks"].items())
+        snapshot["loaded_chunks"] = (sorted(loaded) if loaded is not None
+                                     else None)
+
+    return snapshot
+
+
+def r_restore_snapshot(self, snapshot, sprites=None):
+    # Restore a snapshot of the room; see sge.dsp.Room.restore_snapshot.
+    mouse = sge.game.mouse
+    current = self is sge.game.current_room
+
+    # Find or create the objects first so that nothing is changed if
+    # a class or sprite can't be found.
+    objects = [(record,) + _find_snapshot_object(record, sprites)
+               for record in snapshot["objects"]]
+
+    chunks = {}
+    chunk_sprites = {}
+    sprite_i = _snapshot_index["sprite"]
+    for chunk, records in snapshot.get("chunks", {}).items():
+        chunks[tuple(chunk)] = list(records)
+        for record in records:
+            ref = record[2][sprite_i]
+            if ref is not None and ref not in chunk_sprites:
+                chunk_sprites[ref] = _get_snapshot_sprite(ref, sprites)
+
+    # Take out the current objects without calling any events.  The
+    # object areas are rebuilt from scratch at the end.
+    for obj in list(self.rd["asleep"]):
+        r_wake_object(self, obj)
+
+    for obj in self.objects:
+        if obj is not mouse:
+            self.objects.remove(obj)
+            obj._object_areas = set()
+            if current:
+                o_update_collision_lists(obj)
+                _active_objects.discard(obj)
+                obj.alarms.suspend()
+
+    self.rd["new_objects"] = _ObjectList()
+
+    pending = set(snapshot["pending"])
+    for record, obj, kwargs in objects:
+        o_set_snapshot(obj, record, kwargs)
+        self.objects.append(obj)
+        if record[0] in pending:
+            self.rd["new_objects"].append(obj)
+        elif current and self.rd["started"]:
+            o_update_collision_lists(obj)
+            if obj.active:
+                _active_objects.add(obj)
+                obj.alarms.resume()
+
+    r_set_object_areas(self)
+
+    for view, values in zip(self.views, snapshot["views"]):
+        (view.x, view.y, view.xport, view.yport, view.width, view.height,
+         view.wport, view.hport) = values
+
+    self.alarms = snapshot["alarms"]
+    self.background_x, self.background_y = snapshot["background"]
+
+    if self.chunk_width is not None:
+        loaded = snapshot.get("loaded_chunks")
+        self.rd["chunks"] = chunks
+        self.rd["chunk_sprites"] = chunk_sprites
+        self.rd["loaded_chunks"] = (set(tuple(chunk) for chunk in loaded)
+                                    if loaded is not None else None)
+
+
+def r_start_transition(self, transition, duration, arg):
+    # Set up the transition for the room from the current display.
+    # The full-screen buffers are shared by all transitions and are
+    # only reallocated when the size of the game changes.
+    update = room_transitions.get(transition)
+    if update is None or not duration or duration <= 0:
+        self.rd["t_update"] = None
+        return
+
+    w = sge.game.width
+    h = sge.game.height
+    source = _get_transition_buffer("source", w, h)
+    dest = _get_transition_buffer("dest", w, h)
+
+    if (game_x == 0 and game_y == 0 and game_xscale == 1 and
+            game_yscale == 1):
+        display_surface = game_window
+    else:
+        display_surface = game_display_surface
+
+    source_surf = source.rd["baseimages"][0]
+    dest_surf = dest.rd["baseimages"][0]
+    source_surf.fill(pygame.Color(0, 0, 0, 0))
+    source_surf.blit(display_surface, (0, 0))
+    dest_surf.fill(pygame.Color(0, 0, 0, 0))
+    dest_surf.blit(source_surf, (0, 0))
+    s_refresh(source)
+    s_refresh(dest)
+
+    if update in _builtin_transitions:
+        self.rd["t_update"] = update
+        self.rd["t_function"] = None
+    else:
+        self.rd["t_update"] = r_update_custom
+        self.rd["t_function"] = update
+
+    self.rd["t_source"] = source
+    self.rd["t_sprite"] = dest
+    self.rd["t_duration"] = duration
+    self.rd["t_arg"] = arg
+    self.rd["t_time_passed"] = 0
+    self.rd["t_complete_last"] = 0
+    self.rd["t_matrix_remaining"] = None
+    self.rd["t_levels"] = None
+
+
+def _get_transition_buffer(name, width, height):
+    # Return the reusable full-screen sprite called ``name``.
+    sprite = _transition_buffers.get(name)
+    if sprite is None or sprite.width != width or sprite.height != height:
+        sprite = sge.gfx.Sprite(width=width, height=height)
+        _transition_buffers[name] = sprite
+
+    return sprite
+
+
+def r_update_custom(self, complete):
+    self.rd["t_function"](self.rd["t_source"], self.rd["t_sprite"], complete,
+                          self.rd["t_complete_last"], self.rd["t_arg"])
+
+
 def r_update_fade(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
+    source_surf = self.rd["t_source"].rd["baseimages"][0]
+    dest_surf = self.rd["t_sprite"].rd["baseimages"][0]
     if complete < 0.5:
-        diff = (complete - self.rd["t_complete_last"]) * 2
-        c = sge.gfx.Color([int(round(diff * 255))] * 3)
-        darkener = sge.gfx.Sprite(width=w, height=h)
-        darkener.draw_rectangle(0, 0, w, h, c)
-        transition_sprite.draw_sprite(darkener, 0, 0, 0,
-                                      blend_mode=sge.BLEND_RGB_SUBTRACT)
+        c = int(round(complete * 2 * 255))
+        dest_surf.blit(source_surf, (0, 0))
+        dest_surf.fill(pygame.Color(c, c, c, 0), None, pygame.BLEND_RGB_SUB)
     else:
         complete = (complete - 0.5) * 2
-        c = sge.gfx.Color((0, 0, 0, int(round(255 - complete * 255))))
-        transition_sprite.draw_clear()
-        transition_sprite.draw_rectangle(0, 0, w, h, fill=c)
+        dest_surf.fill(pygame.Color(0, 0, 0, int(round(255 - complete * 255))))
 
 
 def r_update_dissolve(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
-    diff = complete - self.rd["t_complete_last"]
-    c = sge.gfx.Color((0, 0, 0, int(round(diff * 255))))
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser.draw_rectangle(0, 0, w, h, c)
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+    source_surf = self.rd["t_source"].rd["baseimages"][0]
+    dest_surf = self.rd["t_sprite"].rd["baseimages"][0]
+    dest_surf.fill(pygame.Color(0, 0, 0, 0))
+    dest_surf.blit(source_surf, (0, 0))
+    dest_surf.fill(pygame.Color(0, 0, 0, int(round(complete * 255))), None,
+                   pygame.BLEND_RGBA_SUB)
 
 
 def r_update_pixelate(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
-    scale_method = sge.game.scale_method
-    sge.game.scale_method = None
+    source_surf = self.rd["t_source"].rd["baseimages"][0]
+    dest_surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = dest_surf.get_size()
+
+    # Each level is half the size of the previous one, so that every
+    # frame only has to shrink an image which is already small.
+    levels = self.rd["t_levels"]
+    if levels is None:
+        levels = [source_surf]
+        while levels[-1].get_width() > 1 or levels[-1].get_height() > 1:
+            lw, lh = levels[-1].get_size()
+            levels.append(pygame.transform.scale(
+                levels[-1], (max(1, lw // 2), max(1, lh // 2))))
+        self.rd["t_levels"] = levels
 
     if complete < 0.8:
         complete *= 1.25
-        swidth = max(1, w * (1 - complete))
-        sheight = max(1, h * (1 - complete))
-        transition_sprite.width = swidth
-        transition_sprite.height = sheight
-        transition_sprite.width = w
-        transition_sprite.height = h
-    else:
-        diff = (complete - self.rd["t_complete_last"]) * 5
-        c = sge.gfx.Color((0, 0, 0, int(round(diff * 255))))
-        eraser = sge.gfx.Sprite(width=w, height=h)
-        eraser.draw_rectangle(0, 0, w, h, c)
-        transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                      blend_mode=sge.BLEND_RGBA_SUBTRACT)
+        swidth = max(1, int(w * (1 - complete)))
+        sheight = max(1, int(h * (1 - complete)))
+        level = levels[0]
+        for surf in levels:
+            if surf.get_width() < swidth or surf.get_height() < sheight:
+                break
+            level = surf
 
-    sge.game.scale_method = scale_method
+        if level.get_size() != (swidth, sheight):
+            level = pygame.transform.scale(level, (swidth, sheight))
+        pygame.transform.scale(level, (w, h), dest_surf)
+    else:
+        complete = (complete - 0.8) * 5
+        color = levels[-1].get_at((0, 0))
+        color.a = max(0, int(round(color.a - complete * 255)))
+        dest_surf.fill(color)
 
 
 def r_update_wipe_left(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width * complete
-    x = transition_sprite.width - w
-    h = transition_sprite.height
-    transition_sprite.draw_erase(x, 0, w, h)
+    dest_surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = dest_surf.get_size()
+    ew = int(math.ceil(w * complete))
+    dest_surf.fill(pygame.Color(0, 0, 0, 0), pygame.Rect(w - ew, 0, ew, h))
 
 
 def r_update_wipe_right(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width * complete
-    h = transition_sprite.height
-    transition_sprite.draw_erase(0, 0, w, h)
+    dest_surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = dest_surf.get_size()
+    ew = int(math.ceil(w * complete))
+    dest_surf.fill(pygame.Color(0, 0, 0, 0), pygame.Rect(0, 0, ew, h))
 
 
 def r_update_wipe_up(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height * complete
-    y = transition_sprite.height - h
-    transition_sprite.draw_erase(0, y, w, h)
+    dest_surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = dest_surf.get_size()
+    eh = int(math.ceil(h * complete))
+    dest_surf.fill(pygame.Color(0, 0, 0, 0), pygame.Rect(0, h - eh, w, eh))
 
 
 def r_update_wipe_down(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height * complete
-    transition_sprite.draw_erase(0, 0, w, h)
+    dest_surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = dest_surf.get_size()
+    eh = int(math.ceil(h * complete))
+    dest_surf.fill(pygame.Color(0, 0, 0, 0), pygame.Rect(0, 0, w, eh))
+
+
+def _wipe_corner(self, complete, corner_x, corner_y):
+    # Erase the triangle in the given corner of the transition image.
+    # Erasing is cumulative, so only the newly covered area matters.
+    dest_surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = dest_surf.get_size()
+    ew = w * complete * 2
+    eh = h * complete * 2
+    x = int(round(w - ew if corner_x else ew))
+    y = int(round(h - eh if corner_y else eh))
+    cx = w if corner_x else 0
+    cy = h if corner_y else 0
+    pygame.draw.polygon(dest_surf, pygame.Color(0, 0, 0, 0),
+                        [(cx, cy), (x, cy), (cx, y)])
 
 
 def r_update_wipe_upleft(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
-    x = w - w * complete * 2
-    y = h - h * complete * 2
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser.draw_polygon([(w, h), (x, h), (w, y)],
-                        fill=sge.gfx.Color((0, 0, 0, 255)), anti_alias=True)
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+    _wipe_corner(self, complete, True, True)
 
 
 def r_update_wipe_upright(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
-    x = w * complete * 2
-    y = h - h * complete * 2
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser.draw_polygon([(0, h), (x, h), (0, y)],
-                        fill=sge.gfx.Color((0, 0, 0, 255)), anti_alias=True)
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+    _wipe_corner(self, complete, False, True)
 
 
 def r_update_wipe_downleft(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
-    x = w - w * complete * 2
-    y = h * complete * 2
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser.draw_polygon([(w, 0), (x, 0), (w, y)],
-                        fill=sge.gfx.Color((0, 0, 0, 255)), anti_alias=True)
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+    _wipe_corner(self, complete, True, False)
 
 
 def r_update_wipe_downright(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
-    x = w * complete * 2
-    y = w * complete * 2
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser.draw_polygon([(0, 0), (x, 0), (0, y)],
-                        fill=sge.gfx.Color((0, 0, 0, 255)), anti_alias=True)
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+    _wipe_corner(self, complete, False, False)
 
 
 def r_update_wipe_matrix(self, complete):
-    transition_sprite = self.rd["t_sprite"]
+    dest_surf = self.rd["t_sprite"].rd["baseimages"][0]
 
     if self.rd["t_arg"]:
         pw, ph = self.rd["t_arg"]
@@ -943,73 +3092,65 @@ def r_update_wipe_matrix(self, complete):
         pw = 4
         ph = 4
 
-    w = transition_sprite.width
-    h = transition_sprite.height
+    w, h = dest_surf.get_size()
     mw = int(w / pw)
     mh = int(h / ph)
 
+    # The squares are shuffled once so that each one can then be taken
+    # from the end of the list.
     remaining = self.rd["t_matrix_remaining"]
     if remaining is None:
-        remaining = []
-        for x in six.moves.range(mw):
-            for y in six.moves.range(mh):
-                remaining.append((x, y))
+        remaining = [(x, y) for x in six.moves.range(mw)
+                     for y in six.moves.range(mh)]
+        random.shuffle(remaining)
+        self.rd["t_matrix_remaining"] = remaining
 
     diff = complete - self.rd["t_complete_last"]
     new_erase = int(mw * mh * diff)
-    transition_sprite.draw_lock()
+    color = pygame.Color(0, 0, 0, 0)
     while new_erase > 0 and remaining:
         new_erase -= 1
-        x, y = remaining.pop(random.randrange(len(remaining)))
-        transition_sprite.draw_erase(x * pw, y * ph, pw, ph)
-    transition_sprite.draw_unlock()
-    self.rd["t_matrix_remaining"] = remaining
-
+        x, y = remaining.pop()
+        dest_surf.fill(color, pygame.Rect(x * pw, y * ph, pw, ph))
 
-def r_update_iris_in(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
 
+def _get_iris_center(self):
     if self.rd["t_arg"]:
-        x, y = self.rd["t_arg"]
+        return self.rd["t_arg"]
     else:
-        x = w / 2
-        y = h / 2
-
-    r = int(math.hypot(max(x, sge.game.width - x),
-                       max(y, sge.game.height - y)) * (1 - complete))
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser_eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser_eraser.draw_circle(x, y, r, fill=sge.gfx.Color((0, 0, 0, 255)))
+        return (sge.game.width / 2, sge.game.height / 2)
 
-    eraser.draw_lock()
-    eraser.draw_rectangle(0, 0, w, h, fill=sge.gfx.Color((0, 0, 0, 255)))
-    eraser.draw_sprite(eraser_eraser, 0, 0, 0,
-                       blend_mode=sge.BLEND_RGBA_SUBTRACT)
-    eraser.draw_unlock()
 
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+def r_update_iris_in(self, complete):
+    source_surf = self.rd["t_source"].rd["baseimages"][0]
+    dest_surf = self.rd["t_sprite"].rd["baseimages"][0]
+    mask = _get_transition_buffer("mask", *dest_surf.get_size())
+    mask_surf = mask.rd["baseimages"][0]
+    x, y = _get_iris_center(self)
+    radius = int(math.hypot(max(x, sge.game.width - x),
+                            max(y, sge.game.height - y)) * (1 - complete))
+
+    # Only the bounding box of the iris has to be masked; everything
+    # outside of it is simply cleared.
+    rect = pygame.Rect(int(x) - radius, int(y) - radius, radius * 2 + 1,
+                       radius * 2 + 1).clip(dest_surf.get_rect())
+    dest_surf.fill(pygame.Color(0, 0, 0, 0))
+    if radius > 0 and rect.width > 0 and rect.height > 0:
+        dest_surf.blit(source_surf, rect, rect)
+        mask_surf.fill(pygame.Color(0, 0, 0, 0), rect)
+        pygame.draw.circle(mask_surf, pygame.Color(255, 255, 255, 255),
+                           (int(x), int(y)), radius)
+        dest_surf.blit(mask_surf, rect, rect, pygame.BLEND_RGBA_MULT)
 
 
 def r_update_iris_out(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
-
-    if self.rd["t_arg"]:
-        x, y = self.rd["t_arg"]
-    else:
-        x = w / 2
-        y = h / 2
-
-    r = int(math.hypot(max(x, sge.game.width - x),
-                       max(y, sge.game.height - y)) * complete)
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser.draw_circle(x, y, r, fill=sge.gfx.Color((0, 0, 0, 255)))
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+    dest_surf = self.rd["t_sprite"].rd["baseimages"][0]
+    x, y = _get_iris_center(self)
+    radius = int(math.hypot(max(x, sge.game.width - x),
+                            max(y, sge.game.height - y)) * complete)
+    if radius > 0:
+        pygame.draw.circle(dest_surf, pygame.Color(0, 0, 0, 0),
+                           (int(x), int(y)), radius)
 
 
 def s_set_size(self):
@@ -1053,12 +3194,29 @@ def s_refresh(self):
         self.rd["drawcycle"] %= 999999999999999
 
 
+def s_get_rgba_image(self, num):
+    # Return base image ``num``, first replacing it with an equivalent
+    # 32-bit surface whose pixel bytes are in RGBA order if it isn't
+    # one already, so that its pixels can be exposed directly.
+    img = self.rd["baseimages"][num]
+    if (img.get_bitsize() != 32 or not img.get_flags() & pygame.SRCALPHA or
+            tuple(img.get_masks()) != RGBA_MASKS or
+            img.get_pitch() != img.get_width() * 4):
+        new_img = pygame.Surface(img.get_size(), pygame.SRCALPHA, 32,
+                                 RGBA_MASKS)
+        new_img.fill(pygame.Color(0, 0, 0, 0))
+        new_img.blit(img, (0, 0))
+        self.rd["baseimages"][num] = img = new_img
+
+    return img
+
+
 def s_set_transparency(self, image):
     # Return a copy of the surface with transparency properly set
     # for this sprite's settings.
     if isinstance(self.transparent, sge.gfx.Color):
         img = image.convert()
-        color = pygame.Color(*self.transparent)
+        color = self.transparent._value
         img.set_colorkey(color, pygame.RLEACCEL)
         return img
     elif self.transparent:
@@ -1080,7 +3238,7 @@ def s_get_image(self, num, xscale=1, yscale=1, rotation=0, alpha=255,
 
         i = ("s_image", weakref.ref(self), self.rd["drawcycle"], num, xscale,
              yscale, rotation, alpha,
-             tuple(blend) if blend is not None else None, blend_mode)
+             _get_color_value(blend), blend_mode)
         img = cache.get(i)
         if img is None:
             if xscale != 0 and yscale != 0:
@@ -1105,7 +3263,7 @@ def s_get_image(self, num, xscale=1, yscale=1, rotation=0, alpha=255,
 
                 if blend is not None:
                     pygame_flags = _get_blend_flags(blend_mode)
-                    img.fill(pygame.Color(*blend), None, pygame_flags)
+                    img.fill(blend._value, None, pygame_flags)
             else:
                 img = pygame.Surface((1, 1))
                 img.set_colorkey((0, 0, 0), pygame.RLEACCEL)
@@ -1159,8 +3317,8 @@ def s_from_text(cls, font, text, width, height, color, halign, valign,
     # projections.
     f_name = tuple(font.name) if font.name is not None else None
     i = ("text_sprite", cls, f_name, font.size, font.underline, font.bold,
-         font.italic, text, width, height, str(color), halign, valign,
-         anti_alias)
+         font.italic, text, width, height, _get_color_value(color), halign,
+         valign, anti_alias)
     s = cache.get(i)
     if s is None:
         w = font.get_width(text, width, height)
@@ -1237,3 +3395,22 @@ def v_limit(self):
             self.rd["y"] = 0
         elif self.y + self.height > sge.game.current_room.height:
             self.rd["y"] = sge.game.current_room.height - self.height
+
+
+_builtin_transitions = {
+    r_update_fade, r_update_dissolve, r_update_pixelate, r_update_wipe_left,
+    r_update_wipe_right, r_update_wipe_up, r_update_wipe_down,
+    r_update_wipe_upleft, r_update_wipe_upright, r_update_wipe_downleft,
+    r_update_wipe_downright, r_update_wipe_matrix, r_update_iris_in,
+    r_update_iris_out}
+
+room_transitions = {
+    "fade": r_update_fade, "dissolve": r_update_dissolve,
+    "pixelate": r_update_pixelate, "wipe_left": r_update_wipe_left,
+    "wipe_right": r_update_wipe_right, "wipe_up": r_update_wipe_up,
+    "wipe_down": r_update_wipe_down, "wipe_upleft": r_update_wipe_upleft,
+    "wipe_upright": r_update_wipe_upright,
+    "wipe_downleft": r_update_wipe_downleft,
+    "wipe_downright": r_update_wipe_downright,
+    "wipe_matrix": r_update_wipe_matrix, "iris_in": r_update_iris_in,
+    "iris_out": r_update_iris_out}
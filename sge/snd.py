@@ -24,19 +24,21 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import functools
 import os
-import random
 import warnings
+import weakref
 
 import pygame
 import six
 
 import sge
 from sge import r
-from sge.r import _get_channel, _release_channel
+from sge.r import _get_voice, _reclaim_voices
 
 
-__all__ = ["Sound", "Music", "stop_all"]
+__all__ = ["Sound", "Music", "stop_all", "get_max_voices", "set_max_voices",
+           "get_listener", "set_listener"]
 
 
 class Sound(object):
@@ -60,9 +62,17 @@ class Sound(object):
 
        The maximum number of instances of this sound playing permitted.
        If a sound is played while this number of the instances of the
-       same sound are already playing, one of the already playing sounds
-       will be stopped before playing the new instance.  Set to
-       :const:`None` for no limit.
+       same sound are already playing, the oldest of the already
+       playing instances will be stopped before playing the new
+       instance.  Set to :const:`None` for no limit.
+
+    .. attribute:: priority
+
+       The importance of the sound relative to other sounds.  When all
+       voices (see :func:`sge.snd.set_max_voices`) are in use, playing
+       a sound stops the oldest of the playing sounds with the lowest
+       priority, provided that priority is not higher than this sound's
+       priority; otherwise, the sound is not played.
 
     .. attribute:: parent
 
@@ -91,6 +101,34 @@ class Sound(object):
 
        The length of the sound in milliseconds.  (Read-only)
 
+       .. note::
+
+          For a lazily loaded sound which is not currently loaded,
+          reading this loads the sound.
+
+    .. attribute:: lazy
+
+       Whether or not the sound is loaded lazily.  (Read-only)
+
+       A sound which is loaded lazily is not decoded when it is
+       created, but when it is first played.  The decoded sound is
+       kept in a cache shared by all lazily loaded sounds, so sounds
+       using the same file share the same decoded data; sounds which
+       have not been played recently are dropped from the cache when
+       it becomes too large and are decoded again when needed.
+
+    .. attribute:: threaded
+
+       Whether or not lazily loaded sounds are decoded in a background
+       thread.  (Read-only)
+
+       If this is :const:`True`, playing the sound while it is not
+       loaded starts decoding it in the background and returns
+       immediately; the sound then starts playing in the first frame
+       after it has been decoded.  Otherwise, playing the sound while
+       it is not loaded decodes it right away, which can cause a
+       noticeable pause for long sounds.
+
     .. attribute:: playing
 
        The number of instances of this sound playing.  (Read-only)
@@ -102,21 +140,13 @@ class Sound(object):
 
     @property
     def max_play(self):
-        return len(self.rd["channels"]) if self.rd["channels"] else None
+        if self.parent is not None:
+            return self.parent.max_play
+        return self.__max_play or None
 
     @max_play.setter
     def max_play(self, value):
-        self.__max_play = value
-
-        if value is None:
-            value = 0
-
-        if self.__sound is not None and self.parent is None:
-            value = max(0, value)
-            while len(self.rd["channels"]) < value:
-                self.rd["channels"].append(_get_channel())
-            while len(self.rd["channels"]) > value:
-                _release_channel(self.rd["channels"].pop(-1))
+        self.__max_play = max(0, value) if value is not None else None
 
     @property
     def parent(self):
@@ -127,37 +157,47 @@ class Sound(object):
         if value != self.__parent:
             self.__parent = value
             if value is None:
-                self.rd["channels"] = []
-                self.max_play = self.__max_play
+                self.rd["voices"] = []
             else:
-                while self.rd["channels"]:
-                    _release_channel(self.rd["channels"].pop(-1))
-                self.rd["channels"] = value.rd["channels"]
+                self.rd["voices"] = value.rd["voices"]
 
     @property
     def length(self):
-        if self.__sound is not None:
-            return self.__sound.get_length() * 1000
+        data = self.__get_data()
+        if data is not None:
+            return data.get_length() * 1000
         else:
             return 0
 
     @property
-    def playing(self):
-        n = 0
-        for channel in self.rd["channels"] + self.__temp_channels:
-            if channel.get_busy():
-                n += 1
+    def lazy(self):
+        return self.__lazy
+
+    @property
+    def threaded(self):
+        return self.__threaded
 
-        return n
+    @property
+    def playing(self):
+        _reclaim_voices(self.rd["voices"])
+        return len(self.rd["voices"])
 
-    def __init__(self, fname, volume=1, max_play=1, parent=None):
+    def __init__(self, fname, volume=1, max_play=1, parent=None,
+                 priority=0, lazy=False, threaded=False):
         """
         Arguments:
 
         - ``fname`` -- The path to the sound file.  If set to
           :const:`None`, this object will not actually play any sound.
           If this is neither a valid sound file nor :const:`None`,
-          :exc:`OSError` is raised.
+          :exc:`OSError` is raised.  For a lazily loaded sound, only
+          the existence of the file is checked at this point; if the
+          file turns out not to be a valid sound file, :exc:`OSError`
+          is raised when the sound is first loaded instead.
+        - ``lazy`` -- Whether or not to load the sound lazily.
+        - ``threaded`` -- Whether or not to decode the sound in a
+          background thread.  Setting this to :const:`True` implies
+          ``lazy``.
 
         All other arguments set the respective initial attributes of the
         sound.  See the documentation for :class:`sge.snd.Sound` for
@@ -165,29 +205,35 @@ class Sound(object):
         """
         self.rd = {}
         errlist = []
+        self.__sound = None
+        self.__lazy = False
+        self.__threaded = False
+        self.__data_ref = None
 
         if fname is not None and pygame.mixer.get_init():
-            try:
-                self.__sound = pygame.mixer.Sound(fname)
-            except pygame.error as e:
-                raise OSError(e)
-
-        else:
-            self.__sound = None
+            if lazy or threaded:
+                if not os.path.isfile(fname):
+                    e = "Sound file not found: {}".format(fname)
+                    raise OSError(e)
+                self.__lazy = True
+                self.__threaded = bool(threaded)
+            else:
+                try:
+                    self.__sound = pygame.mixer.Sound(fname)
+                except pygame.error as e:
+                    raise OSError(e)
 
-        self.rd["channels"] = []
-        self.__temp_channels = []
+        # Voices of the sound, shared with the parent sound if any.
+        self.rd["voices"] = []
         self.fname = fname
         self.volume = volume
+        self.max_play = max_play
+        self.priority = priority
         self.__parent = None
-        if parent is None:
-            self.max_play = max_play
-        else:
-            self.__max_play = max_play
-            self.parent = parent
+        self.parent = parent
 
     def play(self, loops=1, volume=1, balance=0, maxtime=None,
-             fade_time=None, force=True):
+             fade_time=None, force=True, emitter=None):
         """
         Play the sound.
 
@@ -210,49 +256,78 @@ class Sound(object):
         - ``force`` -- Whether or not the sound should be played even if
           it is already playing the maximum number of times.  If set to
           :const:`True` and the sound is already playing the maximum
-          number of times, one of the instances of the sound already
+          number of times, the oldest instance of the sound already
           playing will be stopped.
+        - ``emitter`` -- The object the sound comes from, usually a
+          :class:`sge.dsp.Object`; any object with ``x`` and ``y``
+          attributes can be used.  If set, ``balance`` is ignored, and
+          the volume and balance of the sound are instead updated each
+          frame based on the emitter's position relative to the
+          listener.  If the sound cannot be heard when it is played and
+          it does not loop indefinitely, it is not played at all.  See
+          the documentation for :func:`sge.snd.set_listener` for more
+          information.
+
+        If the sound is loaded lazily and is not currently loaded, it is
+        loaded first.  See the documentation for :attr:`threaded` for
+        more information.
         """
         if self.__sound is not None:
-            if not loops:
-                loops = 0
-            if maxtime is None:
-                maxtime = 0
-            if fade_time is None:
-                fade_time = 0
-
-            # Adjust for the way Pygame does repeats
-            loops -= 1
-
-            # Calculate volume for each speaker
-            left_volume = min(1, self.volume * volume)
+            self.__play(loops, volume, balance, maxtime, fade_time, force,
+                        emitter, self.__sound)
+        elif self.__lazy:
+            data = r._get_sound_data(self.fname, not self.__threaded)
+            if data is not None:
+                self.__play(loops, volume, balance, maxtime, fade_time,
+                            force, emitter, data)
+            else:
+                play = functools.partial(
+                    self.__play, loops, volume, balance, maxtime, fade_time,
+                    force, emitter)
+                r._pending_sound_plays.append((self.fname, play))
+
+    def __play(self, loops, volume, balance, maxtime, fade_time, force,
+               emitter, data):
+        # Play the decoded sound ``data`` with the arguments of play.
+        if not loops:
+            loops = 0
+        if maxtime is None:
+            maxtime = 0
+        if fade_time is None:
+            fade_time = 0
+
+        # Adjust for the way Pygame does repeats
+        loops -= 1
+
+        # Calculate volume for each speaker
+        base_volume = min(1, self.volume * volume)
+        if emitter is not None:
+            lx, ly = r._get_listener_position()
+            left_volume, right_volume = r._get_positional_gains(
+                base_volume, emitter, lx, ly)
+            if not (left_volume or right_volume) and loops >= 0:
+                # Inaudible; don't take up a voice for it.
+                return
+        else:
+            left_volume = base_volume
             right_volume = left_volume
             if balance < 0:
                 right_volume *= 1 - abs(balance)
             elif balance > 0:
                 left_volume *= 1 - abs(balance)
 
-            if self.max_play:
-                for channel in self.rd["channels"]:
-                    if not channel.get_busy():
-                        channel.play(self.__sound, loops, maxtime, fade_time)
-                        channel.set_volume(left_volume, right_volume)
-                        break
-                else:
-                    if force:
-                        channel = random.choice(self.rd["channels"])
-                        channel.play(self.__sound, loops, maxtime, fade_time)
-                        channel.set_volume(left_volume, right_volume)
-            else:
-                channel = _get_channel()
-                channel.play(self.__sound, loops, maxtime, fade_time)
-                channel.set_volume(left_volume, right_volume)
-                self.__temp_channels.append(channel)
-
-            # Clean up old temporary channels
-            while (self.__temp_channels and
-                   not self.__temp_channels[0].get_busy()):
-                _release_channel(self.__temp_channels.pop(0))
+        voice = _get_voice(self.rd["voices"], self.max_play,
+                           self.priority, force)
+        if voice is not None:
+            voice.channel.play(data, loops, maxtime, fade_time)
+            voice.channel.set_volume(left_volume, right_volume)
+            if self.__lazy:
+                self.__data_ref = weakref.ref(data)
+            if emitter is not None:
+                voice.emitter = emitter
+                voice.volume = base_volume
+                voice.gains = (left_volume, right_volume)
+                r._positional_voices.append(voice)
 
     def stop(self, fade_time=None):
         """
@@ -263,19 +338,47 @@ class Sound(object):
         - ``fade_time`` -- The time in milliseconds over which to fade
           the sound out before stopping; set to :const:`None` or ``0``
           to immediately stop the sound.
+
+        Plays of a threaded sound which are still waiting for the sound
+        to be loaded are cancelled.
         """
         if self.__sound is not None:
             self.__sound.stop()
+        elif self.__lazy:
+            # Lazily loaded sounds share their samples with other sounds
+            # loaded from the same file, so only this sound's own voices
+            # are stopped.  The cache may have dropped the samples
+            # since, but then they are only still alive if something is
+            # playing them.
+            data = self.__data_ref() if self.__data_ref is not None else None
+            if data is not None:
+                for voice in self.rd["voices"]:
+                    if voice.channel.get_sound() is data:
+                        voice.channel.stop()
+
+            r._pending_sound_plays[:] = [
+                (fname, play) for fname, play in r._pending_sound_plays
+                if play.func.__self__ is not self]
+
+    def __get_data(self):
+        # Return the decoded sound, loading it if necessary, or None if
+        # this is a null sound.
+        if self.__sound is not None:
+            return self.__sound
+        elif self.__lazy:
+            return r._get_sound_data(self.fname)
+        else:
+            return None
 
     def pause(self):
         """Pause playback of the sound."""
-        for channel in self.rd["channels"]:
-            channel.pause()
+        for voice in self.rd["voices"]:
+            voice.channel.pause()
 
     def unpause(self):
         """Resume playback of the sound if paused."""
-        for channel in self.rd["channels"]:
-            channel.unpause()
+        for voice in self.rd["voices"]:
+            voice.channel.unpause()
 
 
 class Music(object):
@@ -354,8 +457,8 @@ class Music(object):
 
     @property
     def position(self):
-        if self.playing:
-            return self.__start + pygame.mixer.music.get_pos()
+        if r.music is self:
+            return r._get_music_position()
         else:
             return 0
 
@@ -383,10 +486,10 @@ class Music(object):
         self.volume = volume
         self.rd["timeout"] = None
         self.rd["fade_time"] = None
-        self.__start = 0
         self.__length = None
 
-    def play(self, start=0, loops=1, maxtime=None, fade_time=None):
+    def play(self, start=0, loops=1, maxtime=None, fade_time=None,
+             fade_out_time=None):
         """
         Play the music.
 
@@ -394,22 +497,41 @@ class Music(object):
 
         - ``start`` -- The number of milliseconds from the beginning to
           start playing at.
+        - ``fade_out_time`` -- If set to a value greater than zero and
+          other music is currently playing, the time in milliseconds
+          over which to fade out the currently playing music before
+          this music starts.  Combined with ``fade_time``, this produces
+          a crossfade-like transition.
 
         See the documentation for :meth:`sge.snd.Sound.play` for more
         information.
         """
         if self.fname is not None:
+            if (fade_out_time and fade_out_time > 0 and
+                    r.music is not None and r.music is not self and
+                    r._music_pause_ticks is None and
+                    pygame.mixer.music.get_busy()):
+                now = pygame.time.get_ticks()
+                if r._music_fade_out is not None:
+                    volume = r._music_fade_out[2]
+                else:
+                    volume = pygame.mixer.music.get_volume()
+                r._music_fade_out = (now, fade_out_time, volume,
+                                     (self, start, loops, maxtime, fade_time))
+                r._schedule_music(now)
+                return
+
             if not self.playing:
                 try:
                     pygame.mixer.music.load(self.fname)
                 except pygame.error as e:
                     warnings.warn(str(e))
                     return
+                r._music_preloaded = None
 
             if not loops:
                 loops = -1
 
-            r.music = self
             self.rd["timeout"] = maxtime
             self.rd["fade_time"] = fade_time
 
@@ -422,26 +544,31 @@ class Music(object):
                 # MOD music is handled differently in Pygame: it uses
                 # the pattern order number rather than the time to
                 # indicate the start time.
-                self._start = 0
                 pygame.mixer.music.play(loops, start)
+                r._music_started(self, 0)
             else:
-                self.__start = start
                 try:
                     pygame.mixer.music.play(loops, start / 1000)
                 except NotImplementedError:
                     pygame.mixer.music.play(loops)
+                    start = 0
+                r._music_started(self, start)
 
     def queue(self, start=0, loops=1, maxtime=None, fade_time=None):
         """
         Queue the music for playback.
 
         This will cause the music to be added to a list of music to play
-        in order, after the previous music has finished playing.
+        in order, after the previous music has finished playing.  If
+        the music is queued to start from the beginning without fading
+        in, it is prepared in advance so that it begins without a gap.
 
         See the documentation for :meth:`sge.snd.Music.play` for more
         information.
         """
         r.music_queue.append((self, start, loops, maxtime, fade_time))
+        if r.music is not None:
+            r._preload_music()
 
     @staticmethod
     def stop(fade_time=None):
@@ -451,6 +578,9 @@ class Music(object):
         See the documentation for :meth:`sge.snd.Sound.stop` for more
         information.
         """
+        r._music_preloaded = None
+        r._music_fade_out = None
+        r._music_wake = None
         if fade_time:
             pygame.mixer.music.fadeout(fade_time)
         else:
@@ -460,19 +590,103 @@ class Music(object):
     def pause():
         """Pause playback of the currently playing music."""
         pygame.mixer.music.pause()
+        if r.music is not None and r._music_pause_ticks is None:
+            r._music_pause_ticks = pygame.time.get_ticks()
+            r._music_wake = None
 
     @staticmethod
     def unpause():
         """Resume playback of the currently playing music if paused."""
         pygame.mixer.music.unpause()
+        if r._music_pause_ticks is not None:
+            now = pygame.time.get_ticks()
+            paused_time = now - r._music_pause_ticks
+            r._music_play_ticks += paused_time
+            if r._music_fade_out is not None:
+                start, duration, volume, entry = r._music_fade_out
+                r._music_fade_out = (start + paused_time, duration, volume,
+                                     entry)
+            r._music_pause_ticks = None
+            r._schedule_music(now)
 
     @staticmethod
     def clear_queue():
         """Clear the music queue."""
         r.music_queue = []
+        if r._music_preloaded is not None:
+            # Pygame can't unqueue music, so stop it when it starts.
+            r._music_preload_cancelled = True
 
 
 def stop_all():
     """Stop playback of all sounds."""
     pygame.mixer.stop()
 
+
+def get_max_voices():
+    """
+    Return the number of sounds which can play at the same time.
+
+    See the documentation for :func:`sge.snd.set_max_voices` for more
+    information.
+    """
+    if r._voices_pending is not None:
+        return r._voices_pending
+    else:
+        return len(r._voices)
+
+
+def set_max_voices(num):
+    """
+    Set the number of sounds which can play at the same time.
+
+    Arguments:
+
+    - ``num`` -- The number of voices to allocate.
+
+    Sounds are played on a fixed pool of voices allocated when the
+    first sound is played.  When all voices are in use, playing a sound stops
+    one of the sounds already playing, chosen based on
+    :attr:`sge.snd.Sound.priority`, or if that isn't possible, the new
+    sound is not played.  Calling this function stops all sounds.
+    """
+    if pygame.mixer.get_init():
+        r._init_voices(max(0, int(num)))
+
+
+def get_listener():
+    """
+    Return the object positional sounds are heard from.
+
+    See the documentation for :func:`sge.snd.set_listener` for more
+    information.
+    """
+    return r._sound_listener
+
+
+def set_listener(listener=None, near=0, far=None):
+    """
+    Set where positional sounds are heard from.
+
+    Arguments:
+
+    - ``listener`` -- The object sounds played with an emitter (see
+      :meth:`sge.snd.Sound.play`) are heard from.  If this is a
+      :class:`sge.dsp.View`, sounds are heard from the center of the
+      view; otherwise, sounds are heard from the object's ``x`` and
+      ``y`` attributes.  Set to :const:`None` to use the first view of
+      the current room.
+    - ``near`` -- The distance from the listener within which sounds
+      play at full volume.
+    - ``far`` -- The distance from the listener at and beyond which
+      sounds can no longer be heard.  Set to :const:`None` to use the
+      width of the game.
+
+    Between ``near`` and ``far``, the volume of a sound decreases
+    linearly with its distance from the listener.  The balance of a
+    sound depends on how far to the left or right of the listener its
+    emitter is, relative to ``far``.
+    """
+    r._sound_listener = listener
+    r._sound_near = near
+    r._sound_far = far